@@ -1,7 +1,12 @@
 from flask import Flask
 import os
+import multiprocessing
 
 def create_app():
+    # Logs estructurados en lugar de print
+    from services.metrics import configure_logging
+    configure_logging()
+    
     app = Flask(__name__)
     
     # Configuración
@@ -18,6 +23,16 @@ def create_app():
     from routes import routes
     app.register_blueprint(routes)
     
+    # Calentamiento, reposición de stock y barrido de almacenamiento en segundo plano (solo en el proceso
+    # principal, no en los procesos de trabajo que importan la aplicación al arrancar)
+    if multiprocessing.parent_process() is None:
+        from services.lifecycle import lifecycle
+        from services.stock_service import stock_pool
+        from services.storage_manager import storage_manager
+        lifecycle.start()
+        stock_pool.start()
+        storage_manager.start()
+    
     return app
 
 if __name__ == '__main__':
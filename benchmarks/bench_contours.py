@@ -0,0 +1,183 @@
+"""
+Compara la vectorización de contornos de PatternService con la versión original.
+
+La versión original elimina duplicados con un bucle de np.allclose por punto,
+conserva los 2 * N puntos remuestreados del spline y formatea el path con una
+f-string por punto (con la validación de atributos de svgwrite activada). Para
+cada tolerancia se reporta:
+
+- tiempo de construcción del SVG,
+- número de nodos de los paths y tamaño del SVG (y del PDF si CairoSVG está disponible),
+- desviación máxima en mm entre los puntos originales y el contorno simplificado.
+
+Uso:
+    python benchmarks/bench_contours.py
+    python benchmarks/bench_contours.py --image static/tallas/size_m_recta_1700000000_ab12cd34.png --tolerances 0 0.25 0.5 1
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+import svgwrite
+from skimage import measure
+from scipy.interpolate import splprep, splev
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.pattern_service import PatternService
+
+
+def legacy_smooth_contour(contour, smooth_factor=0.1):
+    """smooth_contour original, con el bucle de duplicados por punto."""
+    contour = np.array(contour)
+    if len(contour) < 3:
+        return contour
+    x, y = contour[:, 1], contour[:, 0]
+    mask = np.ones(len(x), dtype=bool)
+    for i in range(1, len(x)):
+        if np.allclose([x[i], y[i]], [x[i-1], y[i-1]], atol=1e-6):
+            mask[i] = False
+    x, y = x[mask], y[mask]
+    x = np.append(x, x[0])
+    y = np.append(y, y[0])
+    if len(x) < 3:
+        return contour
+    try:
+        tck, u = splprep([x, y], s=smooth_factor, per=True)
+        u_fine = np.linspace(0, 1, len(contour) * 2)
+        x_smooth, y_smooth = splev(u_fine, tck)
+        return np.column_stack((y_smooth, x_smooth))
+    except ValueError:
+        return contour
+
+
+def legacy_svg(service, img):
+    """SVG tal como lo generaba la versión original."""
+    gray = cv2.GaussianBlur(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8), iterations=2)
+    height, width = binary.shape
+    scaled_width_mm = width * service.pixel_to_mm * service.scale_factor
+    scaled_height_mm = height * service.pixel_to_mm * service.scale_factor
+    dwg = svgwrite.Drawing('legacy.svg', size=(f"{scaled_width_mm}mm", f"{scaled_height_mm}mm"),
+                           viewBox=f"0 0 {scaled_width_mm} {scaled_height_mm}")
+    dwg.add(dwg.line(start=(0, 0), end=(scaled_width_mm, 0), stroke='gray', stroke_width=0.5))
+    dwg.add(dwg.line(start=(0, 0), end=(0, scaled_height_mm), stroke='gray', stroke_width=0.5))
+    service.draw_ruler(dwg, scaled_width_mm, service.scale_factor, axis='x', interval=10, size=2.5)
+    service.draw_ruler(dwg, scaled_height_mm, service.scale_factor, axis='y', interval=10, size=2.5)
+
+    for contour in measure.find_contours(binary, level=0.8):
+        smoothed_contour = legacy_smooth_contour(contour, smooth_factor=0.5)
+        points = [(x * service.pixel_to_mm * service.scale_factor, y * service.pixel_to_mm * service.scale_factor)
+                  for y, x in smoothed_contour]
+        path_data = "M " + " L ".join([f"{x:.2f},{y:.2f}" for x, y in points]) + " Z"
+        dwg.add(dwg.path(d=path_data, fill='none', stroke='black', stroke_width=0.3))
+    return dwg.tostring()
+
+
+def paths_of(svg):
+    """Contornos (arrays de puntos) de los paths de un SVG generado por PatternService."""
+    paths = []
+    for chunk in svg.split(' d="M ')[1:]:
+        data = chunk.split(' Z"')[0]
+        paths.append(np.array([[float(v) for v in point.split(',')] for point in data.split(' L ')]))
+    return paths
+
+
+def max_deviation(legacy_paths, new_paths):
+    """Distancia máxima (mm) de los puntos originales al contorno simplificado correspondiente."""
+    deviation = 0.0
+    for original, simplified in zip(legacy_paths, new_paths):
+        polygon = simplified.astype(np.float32).reshape(-1, 1, 2)
+        if len(simplified) < 2:
+            continue
+        for x, y in original:
+            deviation = max(deviation, abs(cv2.pointPolygonTest(polygon, (float(x), float(y)), True)))
+    return deviation
+
+
+def pdf_size(svg):
+    try:
+        import cairosvg
+        return len(cairosvg.svg2pdf(bytestring=svg.encode('utf-8')))
+    except (ImportError, OSError):
+        return None
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def sample_image():
+    """Silueta de falda sintética de 128x192 con bordes curvos."""
+    img = np.full((192, 128, 3), 255, dtype=np.uint8)
+    t = np.linspace(0, 1, 60)
+    left = np.column_stack((40 - 30 * t ** 1.5 + 2 * np.sin(12 * t), 10 + 170 * t))
+    right = np.column_stack((88 + 30 * t ** 1.5 - 2 * np.sin(12 * t), 10 + 170 * t))[::-1]
+    cv2.polylines(img, [np.vstack((left, right)).astype(np.int32)], True, (0, 0, 0), 2)
+    cv2.ellipse(img, (64, 100), (14, 30), 0, 0, 360, (0, 0, 0), 1)
+    return img
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', help='Imagen de talla (por defecto, una silueta sintética)')
+    parser.add_argument('--tolerances', nargs='+', type=float, default=[0.0, 0.25, 0.5, 1.0],
+                        help='Tolerancias de simplificación en mm')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='Ruta opcional para guardar los resultados en JSON')
+    args = parser.parse_args()
+
+    img = cv2.imread(args.image) if args.image else sample_image()
+    if img is None:
+        sys.exit(f"No se pudo cargar la imagen {args.image}")
+
+    service = PatternService()
+    legacy_seconds, original_svg = timed(lambda: legacy_svg(service, img), args.repeat)
+    legacy_paths = paths_of(original_svg)
+    results = [{
+        'implementation': 'original',
+        'tolerance_mm': None,
+        'seconds': legacy_seconds,
+        'nodes': sum(len(p) for p in legacy_paths),
+        'svg_bytes': len(original_svg),
+        'pdf_bytes': pdf_size(original_svg),
+        'max_deviation_mm': 0.0
+    }]
+
+    for tolerance in args.tolerances:
+        service.contour_tolerance_mm = tolerance
+        seconds, svg = timed(lambda: service.build_svg(img).tostring(), args.repeat)
+        paths = paths_of(svg)
+        results.append({
+            'implementation': 'vectorizada',
+            'tolerance_mm': tolerance,
+            'seconds': seconds,
+            'nodes': sum(len(p) for p in paths),
+            'svg_bytes': len(svg),
+            'pdf_bytes': pdf_size(svg),
+            'max_deviation_mm': max_deviation(legacy_paths, paths)
+        })
+
+    print(f"{'implementación':<15}{'tol. (mm)':>10}{'ms':>9}{'nodos':>8}{'SVG (B)':>10}{'PDF (B)':>10}{'desv. (mm)':>12}")
+    for r in results:
+        tolerance = '-' if r['tolerance_mm'] is None else f"{r['tolerance_mm']:g}"
+        pdf = '-' if r['pdf_bytes'] is None else r['pdf_bytes']
+        print(f"{r['implementation']:<15}{tolerance:>10}{r['seconds'] * 1000:>9.1f}{r['nodes']:>8}"
+              f"{r['svg_bytes']:>10}{pdf:>10}{r['max_deviation_mm']:>12.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Mide el tiempo de carga y la memoria por proceso de cada formato de modelo.
+
+Lanza N procesos (como los procesos de trabajo de EXECUTION_MODE=process) que
+cargan a la vez el mismo modelo en el formato indicado y, con todos los
+modelos cargados, reportan:
+
+- segundos de importación de diffusers y de carga del modelo,
+- RSS: memoria residente del proceso (cuenta las páginas compartidas enteras),
+- USS: memoria exclusiva del proceso,
+- PSS: memoria proporcional (las páginas compartidas se dividen entre procesos).
+
+Con safetensors mapeado en memoria, USS y PSS por proceso bajan al crecer N
+porque los pesos son páginas compartidas de la caché del sistema.
+
+Uso:
+    python benchmarks/bench_model_load.py --model-type pattern --skirt-type patrones_varios_disenos --workers 4
+    python benchmarks/bench_model_load.py --formats checkpoint safetensors --forward
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+import psutil
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+FORMATS = ('checkpoint', 'safetensors', 'exported')
+
+
+def load_worker(model_format, model_type, skirt_type, forward, barrier, results):
+    sys.path.insert(0, ROOT)
+    import torch
+    torch.set_num_threads(1)
+    from services import diffusion_service as ds
+
+    loaders = {
+        'checkpoint': ds.load_checkpoint_model,
+        'safetensors': ds.load_safetensors_model,
+        'exported': ds.load_exported_model
+    }
+    # La importación de diffusers (necesaria para .pth y .safetensors) se mide aparte
+    start = time.perf_counter()
+    if model_format != 'exported':
+        import diffusers.models.unets.unet_2d  # noqa: F401
+    import_seconds = time.perf_counter() - start
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    model = loaders[model_format](model_type, skirt_type)
+    seconds = time.perf_counter() - start
+
+    if model is not None and forward:
+        with torch.no_grad():
+            model(torch.zeros(1, 3, 192, 128), torch.full((1,), 999, dtype=torch.long))
+
+    # Se mide con todos los procesos cargados para que PSS refleje el reparto real
+    barrier.wait()
+    memory = process.memory_full_info()
+    results.put({
+        'ok': model is not None,
+        'seconds': seconds,
+        'import_seconds': import_seconds,
+        'rss_mb': (memory.rss - rss_before) / 1024 / 1024,
+        'uss_mb': memory.uss / 1024 / 1024,
+        'pss_mb': getattr(memory, 'pss', 0) / 1024 / 1024
+    })
+    barrier.wait()
+
+
+def run_format(model_format, args):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    processes = [context.Process(target=load_worker,
+                                 args=(model_format, args.model_type, args.skirt_type, args.forward, barrier, results))
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    if not all(m['ok'] for m in measurements):
+        return None
+    mean = lambda key: sum(m[key] for m in measurements) / len(measurements)
+    return {
+        'format': model_format,
+        'workers': args.workers,
+        'load_seconds': mean('seconds'),
+        'import_seconds': mean('import_seconds'),
+        'rss_mb': mean('rss_mb'),
+        'uss_mb': mean('uss_mb'),
+        'pss_mb': mean('pss_mb')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-type', default='pattern', choices=['design', 'pattern'])
+    parser.add_argument('--skirt-type', default='patrones_varios_disenos')
+    parser.add_argument('--workers', type=int, default=2, help='Procesos que cargan el modelo a la vez')
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=FORMATS)
+    parser.add_argument('--forward', action='store_true',
+                        help='Ejecutar una pasada del UNet tras cargar (toca todas las páginas de los pesos)')
+    parser.add_argument('--output', help='Ruta opcional para guardar los resultados en JSON')
+    args = parser.parse_args()
+
+    results = []
+    for model_format in args.formats:
+        print(f"Formato {model_format} con {args.workers} procesos...")
+        result = run_format(model_format, args)
+        if result is None:
+            print(f"  No se pudo cargar el modelo en formato {model_format}, se omite")
+            continue
+        results.append(result)
+
+    print(f"{'formato':<13}{'import (s)':>11}{'carga (s)':>10}{'RSS MB':>9}{'USS MB':>9}{'PSS MB':>9}")
+    for r in results:
+        print(f"{r['format']:<13}{r['import_seconds']:>11.2f}{r['load_seconds']:>10.2f}"
+              f"{r['rss_mb']:>9.1f}{r['uss_mb']:>9.1f}{r['pss_mb']:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
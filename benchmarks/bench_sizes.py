@@ -0,0 +1,128 @@
+"""
+Compara el escalado de tallas vectorizado de size_service con la versión
+original de bucles por píxel.
+
+Para cada imagen se generan las tallas S, M y L con ambas implementaciones y se
+reporta el tiempo medio y la diferencia máxima entre sus salidas, además del
+tiempo de generar toda la tabla de tallas (XS-XXL) en una sola llamada.
+
+Uso:
+    python benchmarks/bench_sizes.py
+    python benchmarks/bench_sizes.py --image static/downloads/pattern_recta_1.png --repeat 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.size_config import SIZE_TABLE, resolve_sizes
+from services.size_service import grade_sizes
+
+
+def legacy_smooth_center_join(img):
+    """smooth_center_join original, con bucles por fila y columna."""
+    height, width = img.shape[:2]
+    center = width // 2
+    blend_width = 4
+    if center - blend_width >= 0 and center + blend_width < width:
+        for i in range(height):
+            left_pixels = img[i, center - blend_width:center]
+            right_pixels = img[i, center:center + blend_width]
+            for j in range(blend_width):
+                alpha = j / blend_width
+                img[i, center - blend_width + j] = (1 - alpha) * left_pixels[j] + alpha * left_pixels[-1]
+                img[i, center + j] = (1 - alpha) * right_pixels[0] + alpha * right_pixels[j]
+    return img
+
+
+def legacy_clone_edge_pixels(img):
+    """clone_edge_pixels original, con bucles por fila y columna."""
+    height, width = img.shape[:2]
+    clone_rows = 2
+    for i in range(clone_rows):
+        img[i] = np.mean([img[i], img[clone_rows]], axis=0).astype(np.uint8)
+    for i in range(height - clone_rows, height):
+        img[i] = np.mean([img[i], img[height - clone_rows - 1]], axis=0).astype(np.uint8)
+    smooth_width = 3
+    for i in range(height):
+        for j in range(smooth_width):
+            if j > 0:
+                img[i, j] = (img[i, j] + img[i, j-1]) // 2
+        for j in range(width - smooth_width, width):
+            if j < width - 1:
+                img[i, j] = (img[i, j] + img[i, j+1]) // 2
+    return img
+
+
+def legacy_sizes(img):
+    """Tallas S, M y L con la implementación original."""
+    height, width = img.shape[:2]
+    mid_point = width // 2
+    left_half, right_half = img[:, :mid_point], img[:, mid_point:]
+
+    def resize(delta):
+        left = cv2.resize(left_half, (mid_point + delta, height), interpolation=cv2.INTER_LINEAR)
+        right = cv2.resize(right_half, (mid_point + delta, height), interpolation=cv2.INTER_LINEAR)
+        return np.concatenate([left, right], axis=1)
+
+    return [legacy_smooth_center_join(resize(-4)), img.copy(), legacy_clone_edge_pixels(resize(4))]
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', help='Imagen de la talla base (por defecto, una imagen aleatoria de 128x192)')
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--output', help='Ruta opcional para guardar los resultados en JSON')
+    args = parser.parse_args()
+
+    if args.image:
+        img = cv2.imread(args.image)
+        if img is None:
+            sys.exit(f"No se pudo cargar la imagen {args.image}")
+    else:
+        img = np.random.default_rng(0).integers(0, 256, (192, 128, 3), dtype=np.uint8)
+
+    sml_deltas = [info['delta_px'] for info in resolve_sizes(['s', 'm', 'l'])]
+    all_deltas = [info['delta_px'] for info in resolve_sizes(list(SIZE_TABLE))]
+
+    legacy_seconds, legacy = timed(lambda: legacy_sizes(img), args.repeat)
+    vectorized_seconds, vectorized = timed(lambda: grade_sizes(img, sml_deltas), args.repeat)
+    table_seconds, _ = timed(lambda: grade_sizes(img, all_deltas), args.repeat)
+
+    max_diff = max(int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max()) for a, b in zip(legacy, vectorized))
+    results = {
+        'image_shape': list(img.shape),
+        'legacy_ms': legacy_seconds * 1000,
+        'vectorized_ms': vectorized_seconds * 1000,
+        'speedup': legacy_seconds / vectorized_seconds,
+        'size_table_ms': table_seconds * 1000,
+        'size_table': list(SIZE_TABLE),
+        'max_diff': max_diff
+    }
+
+    print(f"S/M/L original:     {results['legacy_ms']:8.3f} ms")
+    print(f"S/M/L vectorizado:  {results['vectorized_ms']:8.3f} ms ({results['speedup']:.1f}x)")
+    print(f"XS-XXL vectorizado: {results['size_table_ms']:8.3f} ms")
+    print(f"Diferencia máxima entre implementaciones: {max_diff}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Compara los backends de inferencia del UNet (INFERENCE_BACKEND) con la
+referencia fp32 en modo eager.
+
+Todos los backends parten del mismo ruido inicial (misma semilla) y del mismo
+sampler, así que las diferencias en la imagen final se deben solo al backend.
+Para cada uno se reportan la latencia media por paso (sin contar el primer
+paso, que incluye la compilación o el calentamiento) y PSNR, SSIM y error
+absoluto medio respecto a fp32.
+
+Uso:
+    python benchmarks/compare_backends.py --model-type pattern --skirt-type patrones_varios_disenos
+    python benchmarks/compare_backends.py --random-init --steps 10 --backends channels_last bf16 int8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.diffusion_service import (
+    build_model, create_noise_scheduler, load_checkpoint_model, sample_images, to_uint8_images, device
+)
+from services.inference_backends import apply_backend, parse_backend
+from compare_samplers import compare
+
+DEFAULT_BACKENDS = ['channels_last', 'bf16', 'channels_last,bf16', 'int8', 'compile']
+
+
+def load_reference_model(args):
+    if args.random_init:
+        torch.manual_seed(args.seed)
+        return build_model().eval()
+    return load_checkpoint_model(args.model_type, args.skirt_type)
+
+
+def run_backend(model, args, noise):
+    noise_scheduler = create_noise_scheduler(args.sampler)
+    generator = torch.Generator(device=device).manual_seed(args.seed)
+    step_times = []
+    last = [time.perf_counter()]
+
+    def callback(step, sample, denoised):
+        now = time.perf_counter()
+        step_times.append(now - last[0])
+        last[0] = now
+
+    start = time.perf_counter()
+    sample = sample_images(model, noise_scheduler, noise.clone(), args.steps, generator=generator, callback=callback)
+    elapsed = time.perf_counter() - start
+    steady = step_times[1:] or step_times
+    return to_uint8_images(sample), {
+        'seconds': elapsed,
+        'first_step_seconds': step_times[0],
+        'step_seconds': sum(steady) / len(steady)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-type', default='pattern', choices=['design', 'pattern'])
+    parser.add_argument('--skirt-type', default='patrones_varios_disenos')
+    parser.add_argument('--random-init', action='store_true',
+                        help='Usar un UNet con pesos aleatorios (la precisión solo es orientativa)')
+    parser.add_argument('--num-images', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sampler', default='ddim')
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--backends', nargs='+', default=DEFAULT_BACKENDS,
+                        help='Backends a comparar (opciones separadas por comas)')
+    parser.add_argument('--output', help='Ruta opcional para guardar los resultados en JSON')
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        parse_backend(backend)
+
+    model = load_reference_model(args)
+    if model is None:
+        sys.exit("No se pudo cargar el checkpoint; usa --random-init para medir solo latencia")
+
+    generator = torch.Generator(device=device).manual_seed(args.seed)
+    noise = torch.randn(args.num_images, 3, 192, 128, generator=generator, device=device)
+
+    print(f"Referencia: fp32 eager, {args.sampler} con {args.steps} pasos ({args.num_images} imágenes)...")
+    reference, timing = run_backend(model, args, noise)
+    results = [dict(backend='fp32', speedup=1.0, psnr=None, ssim=1.0, mae=0.0, **timing)]
+    baseline_step = timing['step_seconds']
+
+    for backend in args.backends:
+        # Cada backend modifica el modelo (cuantización, channels_last): se parte de una copia nueva
+        print(f"Backend {backend}...")
+        optimized = apply_backend(load_reference_model(args), backend, device)
+        images, timing = run_backend(optimized, args, noise)
+        result = dict(backend=backend, speedup=baseline_step / timing['step_seconds'], **timing)
+        result.update(compare(reference, images))
+        results.append(result)
+        del optimized
+
+    print(f"{'backend':<22}{'s/paso':>9}{'1er paso':>10}{'acel.':>8}{'PSNR':>8}{'SSIM':>7}{'MAE':>7}")
+    for r in results:
+        psnr = f"{r['psnr']:.2f}" if r['psnr'] is not None else '-'
+        print(f"{r['backend']:<22}{r['step_seconds']:>9.3f}{r['first_step_seconds']:>10.2f}{r['speedup']:>7.2f}x"
+              f"{psnr:>8}{r['ssim']:>7.3f}{r['mae']:>7.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
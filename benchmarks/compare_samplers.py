@@ -0,0 +1,116 @@
+"""
+Compara la calidad y la latencia de los samplers rápidos frente al muestreo
+DDPM de 1000 pasos usado originalmente por generate_image.
+
+Para cada combinación (sampler, pasos) se parte del mismo ruido inicial que la
+referencia y se reportan PSNR, SSIM y error absoluto medio respecto a ella,
+junto con el tiempo total y la aceleración obtenida.
+
+Uso:
+    python benchmarks/compare_samplers.py --model-type pattern --skirt-type patrones_varios_disenos
+    python benchmarks/compare_samplers.py --random-init --baseline-steps 100 --configs ddim:20 ddim:50
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import torch
+from skimage.metrics import peak_signal_noise_ratio, structural_similarity
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.diffusion_service import (
+    build_model, create_noise_scheduler, load_checkpoint_model, sample_images, to_uint8_images, device
+)
+
+DEFAULT_CONFIGS = ['ddim:20', 'ddim:50', 'ddim:100', 'dpmsolver++:20', 'dpmsolver++:50']
+
+
+def run_sampler(model, sampler, steps, noise, seed):
+    noise_scheduler = create_noise_scheduler(sampler)
+    generator = torch.Generator(device=device).manual_seed(seed)
+    start = time.perf_counter()
+    sample = sample_images(model, noise_scheduler, noise.clone(), steps, generator=generator)
+    elapsed = time.perf_counter() - start
+    return to_uint8_images(sample), elapsed
+
+
+def compare(reference, images):
+    psnr, ssim, mae = [], [], []
+    for ref, img in zip(reference, images):
+        psnr.append(peak_signal_noise_ratio(ref, img, data_range=255))
+        ssim.append(structural_similarity(ref, img, channel_axis=2, data_range=255))
+        mae.append(float(np.abs(ref.astype(np.int16) - img.astype(np.int16)).mean()))
+    return {
+        'psnr': float(np.mean(psnr)),
+        'ssim': float(np.mean(ssim)),
+        'mae': float(np.mean(mae))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-type', default='pattern', choices=['design', 'pattern'])
+    parser.add_argument('--skirt-type', default='patrones_varios_disenos')
+    parser.add_argument('--random-init', action='store_true',
+                        help='Usar un UNet con pesos aleatorios (solo mide latencia)')
+    parser.add_argument('--num-images', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline-steps', type=int, default=1000)
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS,
+                        help='Combinaciones sampler:pasos a comparar')
+    parser.add_argument('--output', help='Ruta opcional para guardar los resultados en JSON')
+    args = parser.parse_args()
+
+    if args.random_init:
+        torch.manual_seed(args.seed)
+        model = build_model().eval()
+    else:
+        model = load_checkpoint_model(args.model_type, args.skirt_type)
+        if model is None:
+            sys.exit("No se pudo cargar el checkpoint; usa --random-init para medir solo latencia")
+
+    generator = torch.Generator(device=device).manual_seed(args.seed)
+    noise = torch.randn(args.num_images, 3, 192, 128, generator=generator, device=device)
+
+    print(f"Referencia: ddpm con {args.baseline_steps} pasos ({args.num_images} imágenes)...")
+    reference, baseline_time = run_sampler(model, 'ddpm', args.baseline_steps, noise, args.seed)
+    results = [{
+        'sampler': 'ddpm',
+        'steps': args.baseline_steps,
+        'seconds': baseline_time,
+        'speedup': 1.0,
+        'psnr': None,
+        'ssim': 1.0,
+        'mae': 0.0
+    }]
+
+    for config in args.configs:
+        sampler, steps = config.split(':')
+        images, elapsed = run_sampler(model, sampler, int(steps), noise, args.seed)
+        result = {
+            'sampler': sampler,
+            'steps': int(steps),
+            'seconds': elapsed,
+            'speedup': baseline_time / elapsed
+        }
+        result.update(compare(reference, images))
+        results.append(result)
+
+    print(f"{'sampler':<14}{'pasos':>6}{'segundos':>11}{'acel.':>8}{'PSNR':>8}{'SSIM':>7}{'MAE':>7}")
+    for r in results:
+        psnr = f"{r['psnr']:.2f}" if r['psnr'] is not None else '-'
+        print(f"{r['sampler']:<14}{r['steps']:>6}{r['seconds']:>11.2f}{r['speedup']:>7.1f}x"
+              f"{psnr:>8}{r['ssim']:>7.3f}{r['mae']:>7.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
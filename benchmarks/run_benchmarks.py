@@ -0,0 +1,334 @@
+"""
+Suite de benchmarks de todas las etapas de la aplicación, sin red y en CPU.
+
+Solo se distribuye un checkpoint, así que el UNet se construye con pesos
+aleatorios (misma configuración que load_model) y las imágenes de entrada son
+siluetas de falda sintéticas. Cada etapa se mide por separado:
+
+- model_build / model_load: construcción del UNet y carga de un checkpoint .pth,
+- unet_step: latencia de un paso del UNet,
+- sampling: muestreo completo (sampler y pasos por defecto de DIFFUSION_SAMPLER),
+- process_sizes, smooth_contour, png_to_svg, svg_to_pdf y create_svg_preview,
+- pattern_geometry, draw_pdf y draw_preview (renderizado directo con Cairo),
+- end_to_end: diseño -> tallas -> patrones por disco, como en la web,
+- pipeline: el mismo flujo en memoria (sample_design y run_pipeline).
+
+Los artefactos, el índice y la caché de una ejecución van a un directorio
+temporal (la caché de resultados queda desactivada para que cada muestreo
+ejecute el UNet). Los resultados se guardan en JSON con el commit y el entorno,
+y --compare los contrasta con los de otra ejecución.
+
+Uso:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --stages unet_step sampling --steps 10 --threads 4
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/a5e01cd.json
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+import cv2
+import numpy as np
+import torch
+from skimage import measure
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# Los servicios leen su configuración al importarse: el directorio de trabajo se fija antes
+WORK_DIR = tempfile.mkdtemp(prefix='patrones_bench_')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ['RESULT_CACHE_DIR'] = ''
+os.environ['ARTIFACT_INDEX_PATH'] = os.path.join(WORK_DIR, 'artifacts.db')
+os.environ['TALLAS_DIR'] = os.path.join(WORK_DIR, 'tallas')
+os.environ['PATTERNS_DIR'] = os.path.join(WORK_DIR, 'patterns')
+# El pipeline genera con el planificador: sin ventana de agrupación, que solo añadiría espera
+os.environ['INFERENCE_BATCH_WINDOW_MS'] = '0'
+
+from services.generation_config import resolve_sampler_options
+from services.diffusion_service import build_model, create_noise_scheduler, sample_images, generate_image, device
+from services.inference_backends import INFERENCE_BACKEND, apply_backend
+from services.model_registry import model_registry
+from services.artifact_store import artifact_store
+from services.size_service import process_sizes
+# pattern_service importa CairoSVG y cairocffi, que necesitan libcairo: él y el
+# pipeline se importan en las etapas que los usan, y sin libcairo esas etapas
+# quedan como error sin impedir medir las demás
+
+artifact_store.roots['downloads'] = os.path.join(WORK_DIR, 'downloads')
+
+STAGES = ['model_build', 'model_load', 'unet_step', 'sampling', 'process_sizes', 'smooth_contour',
+          'png_to_svg', 'svg_to_pdf', 'create_svg_preview', 'pattern_geometry', 'draw_pdf', 'draw_preview',
+          'end_to_end', 'pipeline']
+# Etapas lentas (construyen el UNet o muestrean): se repiten --heavy-repeat veces y sin calentamiento
+HEAVY_STAGES = ('model_build', 'model_load', 'sampling', 'end_to_end', 'pipeline')
+SILHOUETTES = ('recta', 'campana', 'sirena')
+RESULTS_DIR = os.path.normpath(os.path.join(ROOT, 'benchmarks', 'results'))
+
+
+def skirt_silhouette(kind, width=128, height=192):
+    """Contorno sintético de una falda (líneas negras sobre blanco, como las imágenes generadas)."""
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    t = np.linspace(0, 1, 80)
+    center = width / 2
+    waist = 0.18 * width
+    if kind == 'recta':
+        half = waist + 0.12 * width * np.sqrt(t)
+    elif kind == 'campana':
+        half = waist + 0.28 * width * t ** 1.3
+    else:
+        # Ajustada hasta la rodilla y con vuelo en el bajo
+        half = (waist + 0.08 * width * np.sin(np.pi * np.minimum(t / 0.7, 1))
+                + 0.25 * width * np.maximum(t - 0.7, 0) / 0.3)
+    top, bottom = 0.06 * height, 0.94 * height
+    y = top + (bottom - top) * t
+    left = np.column_stack((center - half, y))
+    right = np.column_stack((center + half, y))[::-1]
+    cv2.polylines(img, [np.vstack((left, right)).astype(np.int32)], True, (0, 0, 0), 2)
+    # Pinza y cintura
+    cv2.line(img, (int(center - waist), int(top + 8)), (int(center + waist), int(top + 8)), (0, 0, 0), 1)
+    cv2.line(img, (int(center - waist / 2), int(top + 8)), (int(center - waist / 2.5), int(top + 40)), (0, 0, 0), 1)
+    return img
+
+
+def binary_contours(img):
+    """Contornos de una imagen binarizada como en PatternService.pattern_geometry."""
+    gray = cv2.GaussianBlur(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8), iterations=2)
+    return measure.find_contours(binary, level=0.8)
+
+
+def summarize(times):
+    """Estadísticas en milisegundos de una lista de tiempos en segundos."""
+    ms = [t * 1000 for t in times]
+    return {
+        'runs': len(ms),
+        'mean_ms': statistics.fmean(ms),
+        'median_ms': statistics.median(ms),
+        'min_ms': min(ms),
+        'max_ms': max(ms),
+        'stdev_ms': statistics.stdev(ms) if len(ms) > 1 else 0.0
+    }
+
+
+def expect(value, stage):
+    """Los servicios informan de los fallos con False o None en lugar de excepciones."""
+    if value is None or value is False:
+        raise RuntimeError(f"{stage} no produjo resultado")
+    return value
+
+
+class Cycle:
+    """Entradas que se alternan entre repeticiones (una silueta distinta en cada una)."""
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.index = 0
+
+    def next(self):
+        item = self.items[self.index % len(self.items)]
+        self.index += 1
+        return item
+
+
+def run_stage(name, function, repeat, warmup):
+    """
+    Mide una etapa.
+
+    Returns:
+        dict: Estadísticas de summarize, o {'error': mensaje} si la etapa falló
+            (p. ej. sin libcairo para CairoSVG)
+    """
+    print(f"{name}...", flush=True)
+    try:
+        for _ in range(warmup):
+            function()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    except Exception as e:
+        # Algunos errores (p. ej. el de cairocffi sin libcairo) ocupan varias líneas
+        message = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+        print(f"  error: {message}")
+        return {'error': message}
+    return summarize(times)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'device': device,
+        'inference_backend': INFERENCE_BACKEND,
+        'pattern_renderer': os.environ.get('PATTERN_RENDERER', 'cairo')
+    }
+
+
+def build_stages(args, model):
+    """Funciones sin argumentos de cada etapa, con sus entradas ya preparadas."""
+    sampler, steps = resolve_sampler_options(args.sampler, args.steps)
+    images = {kind: skirt_silhouette(kind) for kind in SILHOUETTES}
+    designs = Cycle(SILHOUETTES)
+    contours = Cycle([contour for img in images.values() for contour in binary_contours(img)])
+    svg_cycle = Cycle(SILHOUETTES)
+
+    design_paths = {}
+    for kind, img in images.items():
+        _, png = cv2.imencode('.png', img)
+        design_paths[kind] = artifact_store.write('downloads', f"bench_{kind}.png", png.tobytes())
+    svg_paths = {kind: os.path.join(WORK_DIR, f"bench_{kind}.svg") for kind in SILHOUETTES}
+    prepared = {}
+
+    def patterns():
+        """pattern_service, con sus entradas (geometrías y SVG) preparadas la primera vez que se usa."""
+        if not prepared:
+            from services.pattern_service import pattern_service
+            for kind in SILHOUETTES:
+                pattern_service.build_svg(images[kind], svg_paths[kind]).save()
+            prepared['geometries'] = Cycle(pattern_service.pattern_geometry(img) for img in images.values())
+            prepared['service'] = pattern_service
+        return prepared['service']
+
+    checkpoint_path = os.path.join(WORK_DIR, 'checkpoint.pth')
+    torch.save({'model_state_dict': model.state_dict()}, checkpoint_path)
+
+    def load_checkpoint():
+        # Como load_checkpoint_model, pero desde el checkpoint aleatorio
+        loaded = build_model()
+        loaded.load_state_dict(torch.load(checkpoint_path, map_location=device)['model_state_dict'])
+        return loaded.eval()
+
+    generator = torch.Generator(device=device).manual_seed(args.seed)
+    noise = torch.randn(args.batch_size, 3, 192, 128, generator=generator, device=device)
+    timestep = torch.full((args.batch_size,), 999, device=device, dtype=torch.long)
+
+    def unet_step():
+        with torch.no_grad():
+            model(noise, timestep)
+
+    def sampling():
+        sample_images(model, create_noise_scheduler(sampler), noise.clone(), steps,
+                      generator=torch.Generator(device=device).manual_seed(args.seed))
+
+    def end_to_end():
+        generation = expect(generate_image(args.model_type, args.skirt_type, sampler, steps, seeds=[args.seed],
+                                           encode_base64=False), 'generate_image')
+        filename = generation['images'][0]['filename']
+        expect(process_sizes(filename, args.skirt_type, encode_base64=False), 'process_sizes')
+        expect(patterns().process_pattern_sizes(filename, args.skirt_type)['success'], 'process_pattern_sizes')
+
+    def pipeline():
+        from services.pipeline import sample_design, run_pipeline
+        design = expect(sample_design(args.model_type, args.skirt_type, sampler, steps, args.seed), 'sample_design')
+        expect(run_pipeline(design), 'run_pipeline')
+
+    def pdf_stage():
+        kind = svg_cycle.next()
+        expect(patterns().svg_to_pdf(svg_paths[kind], os.path.join(WORK_DIR, f"bench_{kind}.pdf")), 'svg_to_pdf')
+
+    return {
+        'model_build': lambda: build_model().eval(),
+        'model_load': load_checkpoint,
+        'unet_step': unet_step,
+        'sampling': sampling,
+        'process_sizes': lambda: expect(process_sizes(f"bench_{designs.next()}.png", args.skirt_type),
+                                        'process_sizes'),
+        'smooth_contour': lambda: patterns().smooth_contour(contours.next(), smooth_factor=0.5),
+        'png_to_svg': lambda: expect(patterns().png_to_svg(design_paths[designs.next()],
+                                                           os.path.join(WORK_DIR, 'png_to_svg.svg')),
+                                     'png_to_svg'),
+        'svg_to_pdf': pdf_stage,
+        'create_svg_preview': lambda: expect(patterns().create_svg_preview(svg_paths[svg_cycle.next()]),
+                                             'create_svg_preview'),
+        'pattern_geometry': lambda: patterns().pattern_geometry(images[designs.next()]),
+        'draw_pdf': lambda: patterns().draw_pdf(prepared['geometries'].next()),
+        'draw_preview': lambda: patterns().draw_preview(prepared['geometries'].next()),
+        'end_to_end': end_to_end,
+        'pipeline': pipeline
+    }, {'sampler': sampler, 'steps': steps}
+
+
+def print_results(results, baseline=None):
+    print(f"{'etapa':<20}{'media (ms)':>12}{'mediana':>10}{'mín.':>10}{'ejec.':>7}{'vs. base':>10}")
+    for name, r in results.items():
+        if 'error' in r:
+            print(f"{name:<20}{'-':>12}  {r['error']}")
+            continue
+        ratio = '-'
+        if baseline is not None and 'mean_ms' in baseline.get(name, {}):
+            ratio = f"{r['mean_ms'] / baseline[name]['mean_ms']:.2f}x"
+        print(f"{name:<20}{r['mean_ms']:>12.2f}{r['median_ms']:>10.2f}{r['min_ms']:>10.2f}{r['runs']:>7}{ratio:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--model-type', default='pattern', choices=['design', 'pattern'])
+    parser.add_argument('--skirt-type', default='recta')
+    parser.add_argument('--sampler', help='Sampler del muestreo (por defecto DIFFUSION_SAMPLER)')
+    parser.add_argument('--steps', type=int, help='Pasos del muestreo (por defecto los del sampler)')
+    parser.add_argument('--batch-size', type=int, default=1, help='Imágenes por paso en unet_step y sampling')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=10, help='Repeticiones de las etapas ligeras')
+    parser.add_argument('--heavy-repeat', type=int, default=2,
+                        help='Repeticiones de la carga del modelo, el muestreo y los flujos completos')
+    parser.add_argument('--threads', type=int, help='Hilos de PyTorch (por defecto los de la máquina)')
+    parser.add_argument('--output', help='Ruta del JSON (por defecto benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='JSON de otra ejecución con el que comparar las medias')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    model = apply_backend(build_model().eval(), INFERENCE_BACKEND, device)
+    # generate_image y run_pipeline toman el modelo del registro en lugar de cargar el checkpoint
+    model_registry.get((args.model_type, args.skirt_type), lambda: model)
+    stages, sampling = build_stages(args, model)
+
+    results = {}
+    for name in args.stages:
+        heavy = name in HEAVY_STAGES
+        results[name] = run_stage(name, stages[name], args.heavy_repeat if heavy else args.repeat,
+                                  warmup=0 if heavy else 1)
+
+    print_results(results, baseline)
+
+    env = environment()
+    output = args.output or os.path.join(RESULTS_DIR, f"{env['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'args': vars(args), 'sampling': sampling, 'environment': env, 'results': results}, f, indent=2)
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == '__main__':
+    main()
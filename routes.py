@@ -1,26 +1,438 @@
 import os
-from flask import Blueprint, render_template, request, jsonify, send_from_directory, send_file
-from services.diffusion_service import generate_image
-from services.size_service import process_sizes
-from services.pattern_service import pattern_service
+import json
+import time
+import queue
+import logging
+from flask import Blueprint, render_template, request, jsonify, send_file, Response, g
+from services.generation_config import resolve_sampler_options, validate_num_images, validate_seed, validate_preview_every, GenerationCancelled
+from services.model_registry import model_registry
+from services.inference_scheduler import inference_scheduler
+from services.job_service import job_manager, QueueFull, JobCancelled
+from services.worker_pool import worker_pool, execute
+from services.preview_service import preview_encoder
+from services.stock_service import stock_pool
+from services.result_cache import result_cache
+from services.lifecycle import lifecycle
+from services.size_config import resolve_sizes
+from services.print_config import resolve_print_options
+from services.pipeline import artifact_writer, sample_design, publish_result
+from services.artifact_index import artifact_index
+from services.artifact_delivery import artifact_delivery, ARTIFACT_MAX_AGE
+from services.artifact_store import artifact_store
+from services.storage_manager import storage_manager
+from services.metrics import metrics
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
 
 # Crear la variable routes
 routes = Blueprint('routes', __name__)
 
-# Configuración de directorios
-DOWNLOADS_DIR = os.path.join('static', 'downloads')
-TALLAS_DIR = os.path.join('static', 'tallas')
+# Cadencia por defecto (en pasos) de las previews en /api/generate/stream
+DEFAULT_PREVIEW_EVERY = int(os.environ.get('PREVIEW_EVERY', 5))
+# Segundos sin eventos tras los que se envía un comentario keep-alive
+SSE_KEEPALIVE_SECONDS = 15
+# Formato de las respuestas de generación: 'base64' (imágenes dentro del JSON)
+# o 'urls' (solo URLs versionadas de los artefactos y sus metadatos)
+RESPONSE_MODES = ('base64', 'urls')
+DEFAULT_RESPONSE_MODE = os.environ.get('RESPONSE_MODE', 'base64')
+
+# El gestor de almacenamiento no borra las entradas de los trabajos pendientes ni el stock
+storage_manager.add_protector(job_manager.referenced_filenames)
+storage_manager.add_protector(stock_pool.filenames)
+
+def service_gauges():
+    """Indicadores de /metrics leídos del estado de los servicios: [(nombre, etiquetas, valor), ...]."""
+    scheduler = inference_scheduler.stats()
+    gauges = [
+        ('inference_queue_depth', {}, scheduler['queue_depth']),
+        ('inference_in_flight', {}, scheduler['in_flight']),
+        ('job_queue_depth', {}, job_manager.stats()['queue_depth']),
+        ('worker_pool_in_flight', {}, worker_pool.stats()['in_flight']),
+        ('artifact_writes_pending', {}, artifact_writer.stats()['pending']),
+        ('resident_models', {}, len(lifecycle.resident_models()))
+    ]
+    for name, directory in storage_manager.stats()['directories'].items():
+        gauges.append(('storage_bytes', {'directory': name}, directory['bytes']))
+        gauges.append(('storage_files', {'directory': name}, directory['files']))
+    if psutil is not None:
+        process = psutil.Process()
+        gauges.append(('process_resident_memory_bytes', {'process': 'web'}, process.memory_info().rss))
+        children = 0
+        for child in process.children(recursive=True):
+            try:
+                children += child.memory_info().rss
+            except psutil.Error:
+                pass
+        gauges.append(('process_resident_memory_bytes', {'process': 'children'}, children))
+    return gauges
 
-# Crear directorios si no existen
-for directory in [DOWNLOADS_DIR, TALLAS_DIR]:
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+metrics.add_collector(service_gauges)
+
+@routes.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@routes.after_app_request
+def record_request_metrics(response):
+    # La ruta (no la URL) como etiqueta: los nombres de archivo no crean series nuevas
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe('http_request_seconds', time.perf_counter() - started, endpoint=endpoint)
+    return response
 
 @routes.route('/', methods=['GET'])
 def index():
     """Página principal"""
     return render_template('index.html')
 
+def run_generate(params, job=None):
+    """Genera imágenes con el planificador de inferencia. Devuelve (respuesta, código HTTP)."""
+    model_type = params['model_type']
+    skirt_type = params['skirt_type']
+    
+    progress_callback = None
+    preview_callback = None
+    cancel_event = None
+    if job is not None:
+        progress_callback = lambda step, total: job.set_progress(100.0 * step / total, f'Paso {step} de {total}')
+        cancel_event = job.cancel_event
+        if params.get('preview_every'):
+            # La codificación de la preview se hace fuera del bucle de muestreo
+            preview_callback = lambda step, total, previews: preview_encoder.submit(job, step, total, previews)
+    
+    result = None
+    if stock_pool.matches(params):
+        result = stock_pool.take(model_type, skirt_type)
+    
+    try:
+        if not result:
+            result = inference_scheduler.submit(model_type, skirt_type, params['sampler'], params['steps'],
+                                                params['num_images'], progress_callback, cancel_event,
+                                                preview_callback, params.get('preview_every', 0),
+                                                seed=params.get('seed'))
+    except GenerationCancelled:
+        raise JobCancelled()
+    
+    if not result:
+        return {'success': False, 'error': 'Error al generar la imagen'}, 500
+    
+    if params.get('response') == 'urls':
+        images = [{
+            'filename': image['filename'],
+            'seed': image['seed'],
+            'url': artifact_url('/downloads', 'downloads', image['filename'])
+        } for image in result['images']]
+        return {
+            'success': True,
+            'image_url': images[0]['url'],
+            'images': images,
+            'seed': result['seed'],
+            'model_type': model_type,
+            'skirt_type': skirt_type,
+            'sampler': result['sampler'],
+            'steps': result['steps'],
+            'from_stock': result.get('from_stock', False)
+        }, 200
+    
+    return {
+        'success': True,
+        'image_base64': result['image_base64'],
+        'image_url': result['image_path'],
+        'images': result['images'],
+        'seed': result['seed'],
+        'model_type': model_type,
+        'skirt_type': skirt_type,
+        'sampler': result['sampler'],
+        'steps': result['steps'],
+        'from_stock': result.get('from_stock', False)
+    }, 200
+
+def run_generate_sizes(params, job=None):
+    """Genera las tallas (S, M y L por defecto) de una imagen existente. Devuelve (respuesta, código HTTP)."""
+    logger.info("Procesando tallas localmente...")
+    if job is not None:
+        job.set_progress(0, 'Procesando tallas')
+    
+    urls = params.get('response') == 'urls'
+    with storage_manager.hold(params['filename']):
+        sizes_result = execute('services.size_service:process_sizes', params['filename'], params['skirt_type'],
+                               params.get('sizes'), encode_base64=not urls)
+    if not sizes_result:
+        return {'success': False, 'error': 'Error al procesar las tallas'}, 500
+    
+    response = {'success': True, 'sizes': sizes_result['sizes'], 'sizes_token': sizes_result['token']}
+    for size in sizes_result['sizes']:
+        filename = sizes_result[f"size_{size['size']}_filename"]
+        if urls:
+            size['url'] = artifact_url('/tallas', 'tallas', filename)
+            response[f"size_{size['size']}_url"] = size['url']
+        else:
+            response[f"size_{size['size']}_base64"] = sizes_result[f"size_{size['size']}_base64"]
+        response[f"size_{size['size']}_filename"] = filename
+    return response, 200
+
+def run_generate_patterns(params, job=None):
+    """Genera los patrones PDF de las tallas de una imagen. Devuelve (respuesta, código HTTP)."""
+    progress_callback = None
+    if job is not None:
+        def progress_callback(done, total):
+            job.check_cancelled()
+            job.set_progress(100.0 * done / total, f'Talla {done} de {total}')
+    
+    # Procesar las tallas y generar patrones
+    urls = params.get('response') == 'urls'
+    with storage_manager.hold(params['filename']):
+        result = execute('services.pattern_service:pattern_service.process_pattern_sizes',
+                         params['filename'], params['skirt_type'], progress_callback=progress_callback,
+                         svg=params.get('svg', False), combined=params.get('combined', False),
+                         preview_files=urls, sizes_token=params.get('sizes_token'), **params.get('print', {}))
+    
+    if not result['success']:
+        return {'success': False, 'error': result.get('error', 'Error procesando patrones')}, 200
+    
+    response_data = {
+        'success': True,
+        'pattern_s_preview': None,
+        'pattern_s_filename': None,
+        'pattern_m_preview': None, 
+        'pattern_m_filename': None,
+        'pattern_l_preview': None,
+        'pattern_l_filename': None
+    }
+    
+    # Organizar los datos por talla
+    for pattern in result['patterns']:
+        size = pattern['size'].lower()
+        if urls:
+            if pattern.get('preview_filename'):
+                response_data[f'pattern_{size}_preview_url'] = artifact_url('/patterns', 'patterns',
+                                                                            pattern['preview_filename'])
+            response_data[f'pattern_{size}_url'] = artifact_url('/patterns', 'patterns', pattern['pdf_filename'])
+            if pattern['svg_filename'] is not None:
+                response_data[f'pattern_{size}_svg_url'] = artifact_url('/patterns', 'patterns',
+                                                                        pattern['svg_filename'])
+        else:
+            response_data[f'pattern_{size}_preview'] = pattern['preview_base64']
+        response_data[f'pattern_{size}_filename'] = pattern['pdf_filename']
+        response_data[f'pattern_{size}_pages'] = pattern['pages']
+    
+    if urls:
+        # Sin previews en base64 en la respuesta
+        for size in ('s', 'm', 'l'):
+            del response_data[f'pattern_{size}_preview']
+    
+    if 'combined_pdf_filename' in result:
+        response_data['combined_pdf_filename'] = result['combined_pdf_filename']
+        response_data['combined_pages'] = result.get('combined_pages', len(result['patterns']))
+        if urls:
+            response_data['combined_pdf_url'] = artifact_url('/patterns', 'patterns',
+                                                             result['combined_pdf_filename'])
+    
+    return response_data, 200
+
+def run_pipeline(params, job=None):
+    """Genera un diseño, sus tallas y sus patrones en memoria. Devuelve (respuesta, código HTTP)."""
+    progress_callback = None
+    generation_progress = None
+    cancel_event = None
+    if job is not None:
+        def progress_callback(percent, message):
+            job.check_cancelled()
+            job.set_progress(percent, message)
+        generation_progress = lambda step, total: job.set_progress(60.0 * step / total, 'Generando diseño')
+        cancel_event = job.cancel_event
+    persist = params.get('persist', True)
+    
+    try:
+        # El diseño pasa por el planificador como cualquier otra generación (micro-lotes y cola)
+        design = sample_design(params['model_type'], params['skirt_type'], params['sampler'], params['steps'],
+                               params.get('seed'), generation_progress, cancel_event, persist)
+        if not design:
+            return {'success': False, 'error': 'Error al generar la imagen'}, 500
+        result = execute('services.pipeline:run_pipeline', design, params.get('sizes'),
+                         svg=params.get('svg', False), combined=params.get('combined', False),
+                         progress_callback=progress_callback)
+    except GenerationCancelled:
+        raise JobCancelled()
+    
+    # Los archivos se escriben en segundo plano; la respuesta no espera al disco
+    return publish_result(result, persist, params.get('response') == 'urls'), 200
+
+job_manager.register_task('generate', run_generate)
+job_manager.register_task('generate_sizes', run_generate_sizes)
+job_manager.register_task('generate_patterns', run_generate_patterns)
+job_manager.register_task('pipeline', run_pipeline)
+
+def artifact_url(prefix, namespace, filename):
+    """URL versionada por contenido de un artefacto ya escrito (o en cola de escritura)."""
+    artifact_writer.wait(artifact_store.path(namespace, filename))
+    return artifact_delivery.url(prefix, filename, artifact_store.resolve(namespace, filename))
+
+def send_artifact(namespace, filename):
+    """
+    Sirve un artefacto con la huella de su contenido como ETag fuerte, GET
+    condicional (304) y rangos (206). SVG y PDF se envían comprimidos con gzip
+    si el cliente lo acepta y no pide un rango. Si la URL lleva la versión
+    actual del archivo (?v=), la respuesta se marca como inmutable; si no, el
+    cliente debe revalidarla con el ETag.
+
+    Returns:
+        Response, o None si el archivo no existe o el nombre no es válido
+    """
+    try:
+        artifact_writer.wait(artifact_store.path(namespace, filename))
+    except ValueError:
+        return None
+    path = artifact_store.resolve(namespace, filename)
+    if path is None:
+        return None
+    digest = artifact_delivery.digest(path)
+    if digest is None:
+        return None
+    storage_manager.touch(path)
+    
+    compressible = artifact_delivery.compressible(path)
+    if compressible and not request.range and request.accept_encodings['gzip'] > 0:
+        response = send_file(artifact_delivery.compressed_path(path, digest), as_attachment=True,
+                             download_name=filename, etag=f"{digest}-gzip", conditional=True)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_file(path, as_attachment=True, download_name=filename, etag=digest, conditional=True)
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    
+    if request.args.get('v') == digest:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ARTIFACT_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def parse_response_mode(data):
+    """
+    Valida el formato de respuesta pedido ('response': 'base64' o 'urls').
+
+    Returns:
+        tuple: (modo, None) si es válido, o (None, respuesta de error 400)
+    """
+    mode = data.get('response', DEFAULT_RESPONSE_MODE)
+    if mode not in RESPONSE_MODES:
+        return None, (jsonify({'success': False, 'error': f"Formato de respuesta inválido: {mode}. Opciones: {', '.join(RESPONSE_MODES)}"}), 400)
+    return mode, None
+
+def dispatch(task, params, data):
+    """
+    Ejecuta la tarea en la petición actual o, si data['async'] es verdadero,
+    la encola como trabajo y responde 202 con su identificador.
+    """
+    if not data.get('async'):
+        payload, status_code = job_manager.run_task(task, params)
+        return jsonify(payload), status_code
+    
+    try:
+        job = job_manager.submit(task, params)
+    except QueueFull:
+        return jsonify({'success': False, 'error': 'Demasiados trabajos en cola, inténtalo más tarde'}), 429
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'state': job.state,
+        'status_url': f'/api/jobs/{job.id}',
+        'result_url': f'/api/jobs/{job.id}/result'
+    }), 202
+
+def parse_generate_params(data):
+    """
+    Valida los parámetros de generación de una petición.
+
+    Returns:
+        tuple: (params, None) si son válidos, o (None, respuesta de error 400)
+    """
+    model_type = data.get('model_type')
+    skirt_type = data.get('skirt_type')
+    sampler = data.get('sampler')
+    steps = data.get('steps')
+    num_images = data.get('num_images', 1)
+    preview_every = data.get('preview_every', 0)
+    seed = data.get('seed')
+    response_mode, error = parse_response_mode(data)
+    if error:
+        return None, error
+    
+    # VALIDAR DATOS
+    valid_types = ['recta', 'con_volante', 'con_bolsillo', 'campana', 'sirena', 'con_canesu', 'varios_disenos', 'patrones_varios_disenos']
+    valid_models = ['design', 'pattern']
+    
+    if skirt_type not in valid_types:
+        return None, (jsonify({'success': False, 'error': f'Tipo de falda inválido: {skirt_type}'}), 400)
+    if model_type not in valid_models:
+        return None, (jsonify({'success': False, 'error': f'Tipo de modelo inválido: {model_type}'}), 400)
+    
+    try:
+        sampler, steps = resolve_sampler_options(sampler, steps)
+        num_images = validate_num_images(num_images)
+        seed = validate_seed(seed, num_images)
+        preview_every = validate_preview_every(preview_every)
+    except ValueError as e:
+        return None, (jsonify({'success': False, 'error': str(e)}), 400)
+    
+    return {
+        'model_type': model_type,
+        'skirt_type': skirt_type,
+        'sampler': sampler,
+        'steps': steps,
+        'num_images': num_images,
+        'preview_every': preview_every,
+        'seed': seed,
+        'response': response_mode
+    }, None
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(job, cancel_on_disconnect):
+    """Respuesta text/event-stream con los eventos de un trabajo hasta que termina."""
+    events = job.subscribe()
+    
+    def generate():
+        try:
+            yield sse_message('job', job.to_dict())
+            while True:
+                if job.finished and events.empty():
+                    yield sse_message('done', dict(job.to_dict(), result=job.result))
+                    return
+                try:
+                    event, data = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield sse_message(event, data)
+                if event == 'done':
+                    return
+        except GeneratorExit:
+            if cancel_on_disconnect and not job.finished:
+                logger.warning(f"Cliente desconectado, cancelando trabajo {job.id}")
+                job_manager.cancel(job.id)
+            raise
+        finally:
+            job.unsubscribe(events)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'X-Job-Id': job.id
+    })
+
 @routes.route('/api/generate', methods=['POST'])
 def api_generate():
     """Endpoint principal para generar imágenes"""
@@ -29,36 +441,65 @@ def api_generate():
         if not data:
             return jsonify({'success': False, 'error': 'No se recibieron datos'}), 400
         
-        model_type = data.get('model_type')
-        skirt_type = data.get('skirt_type')
+        logger.info(f"Generando: {data.get('model_type')} - {data.get('skirt_type')}")
         
-        print(f"Generando: {model_type} - {skirt_type}")
+        params, error = parse_generate_params(data)
+        if error:
+            return error
         
-        # VALIDAR DATOS
-        valid_types = ['recta', 'con_volante', 'con_bolsillo', 'campana', 'sirena', 'con_canesu', 'varios_disenos', 'patrones_varios_disenos']
-        valid_models = ['design', 'pattern']
+        return dispatch('generate', params, data)
+            
+    except Exception as e:
+        logger.error(f"Error en api_generate: {str(e)}")
+        return jsonify({'success': False, 'error': f'Error interno: {str(e)}'}), 500
+
+@routes.route('/api/pipeline', methods=['POST'])
+def api_pipeline():
+    """Genera diseño, tallas y patrones PDF en una sola petición, sin pasar por el disco"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No se recibieron datos'}), 400
         
-        if skirt_type not in valid_types:
-            return jsonify({'success': False, 'error': f'Tipo de falda inválido: {skirt_type}'}), 400
-        if model_type not in valid_models:
-            return jsonify({'success': False, 'error': f'Tipo de modelo inválido: {model_type}'}), 400
+        params, error = parse_generate_params(data)
+        if error:
+            return error
+        if params['num_images'] != 1:
+            return jsonify({'success': False, 'error': 'El pipeline genera una sola imagen'}), 400
         
-        result = generate_image(model_type, skirt_type)
-        if not result:
-            return jsonify({'success': False, 'error': 'Error al generar la imagen'}), 500
+        try:
+            resolve_sizes(data.get('sizes'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        params['sizes'] = data.get('sizes')
+        params['persist'] = bool(data.get('persist', True))
+        params['svg'] = bool(data.get('svg', False))
+        params['combined'] = bool(data.get('combined', False))
         
-        return jsonify({
-            'success': True,
-            'image_base64': result['image_base64'],
-            'image_url': result['image_path'],
-            'model_type': model_type,
-            'skirt_type': skirt_type
-        })
+        return dispatch('pipeline', params, data)
             
     except Exception as e:
-        print(f"Error en api_generate: {str(e)}")
+        logger.error(f"Error en api_pipeline: {str(e)}")
         return jsonify({'success': False, 'error': f'Error interno: {str(e)}'}), 500
 
+@routes.route('/api/generate/stream', methods=['GET'])
+def api_generate_stream():
+    """Genera imágenes emitiendo el progreso y previews intermedias como Server-Sent Events"""
+    data = request.args.to_dict()
+    data.setdefault('preview_every', DEFAULT_PREVIEW_EVERY)
+    
+    params, error = parse_generate_params(data)
+    if error:
+        return error
+    
+    try:
+        job = job_manager.submit('generate', params)
+    except QueueFull:
+        return jsonify({'success': False, 'error': 'Demasiados trabajos en cola, inténtalo más tarde'}), 429
+    
+    # Si el cliente cierra la conexión, el trabajo se cancela y libera capacidad de inferencia
+    return event_stream(job, cancel_on_disconnect=True)
+
 @routes.route('/api/generate_sizes', methods=['POST'])
 def api_generate_sizes():
     """Endpoint para generar tallas de un patrón existente"""
@@ -76,31 +517,26 @@ def api_generate_sizes():
         if not skirt_type:
             return jsonify({'success': False, 'error': 'Tipo de falda no proporcionado'}), 400
         
-        print(f"Generando tallas para: {filename} - {skirt_type}")
+        logger.info(f"Generando tallas para: {filename} - {skirt_type}")
         
         # Verificar si el archivo existe
-        original_path = os.path.join(DOWNLOADS_DIR, filename)
-        if not os.path.exists(original_path):
+        if not artifact_store.exists('downloads', filename):
             return jsonify({'success': False, 'error': f'Archivo no encontrado: {filename}'}), 404
         
-        # Procesar tallas localmente
-        print("Procesando tallas localmente...")
-        sizes_result = process_sizes(filename, skirt_type)
-        if not sizes_result:
-            return jsonify({'success': False, 'error': 'Error al procesar las tallas'}), 500
+        sizes = data.get('sizes')
+        try:
+            resolve_sizes(sizes)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        response_mode, error = parse_response_mode(data)
+        if error:
+            return error
         
-        return jsonify({
-            'success': True,
-            'size_s_base64': sizes_result['size_s_base64'],
-            'size_s_filename': sizes_result['size_s_filename'],
-            'size_m_base64': sizes_result['size_m_base64'],
-            'size_m_filename': sizes_result['size_m_filename'],
-            'size_l_base64': sizes_result['size_l_base64'],
-            'size_l_filename': sizes_result['size_l_filename']
-        })
+        params = {'filename': filename, 'skirt_type': skirt_type, 'sizes': sizes, 'response': response_mode}
+        return dispatch('generate_sizes', params, data)
             
     except Exception as e:
-        print(f"Error en api_generate_sizes: {str(e)}")
+        logger.error(f"Error en api_generate_sizes: {str(e)}")
         return jsonify({'success': False, 'error': f'Error interno: {str(e)}'}), 500
 
 @routes.route('/api/generate_patterns', methods=['POST'])
@@ -117,76 +553,131 @@ def generate_patterns():
         if not skirt_type:
             return jsonify({'success': False, 'error': 'Tipo de falda no proporcionado'}), 400
         
-        print(f"Procesando patrones para: {filename} - {skirt_type}")
+        logger.info(f"Procesando patrones para: {filename} - {skirt_type}")
         
         # Verificar si el archivo base existe
-        base_path = os.path.join(DOWNLOADS_DIR, filename)
-        if not os.path.exists(base_path):
-            print(f"Archivo base no encontrado: {base_path}")
+        if not artifact_store.exists('downloads', filename):
+            logger.warning(f"Archivo base no encontrado: {filename}")
             return jsonify({'success': False, 'error': f'Archivo base no encontrado: {filename}'}), 404
         
-        # Listar archivos en static/tallas/ para depuración
-        tallas_files = os.listdir(TALLAS_DIR)
-        print(f"Archivos en {TALLAS_DIR}: {tallas_files}")
-        
-        # Procesar las tallas y generar patrones
-        result = pattern_service.process_pattern_sizes(filename, skirt_type)
-        
-        if result['success']:
-            response_data = {
-                'success': True,
-                'pattern_s_preview': None,
-                'pattern_s_filename': None,
-                'pattern_m_preview': None, 
-                'pattern_m_filename': None,
-                'pattern_l_preview': None,
-                'pattern_l_filename': None
-            }
-            
-            # Organizar los datos por talla
-            for pattern in result['patterns']:
-                size = pattern['size'].lower()
-                response_data[f'pattern_{size}_preview'] = pattern['preview_base64']
-                response_data[f'pattern_{size}_filename'] = pattern['pdf_filename']
-            
-            return jsonify(response_data)
-        else:
-            return jsonify({'success': False, 'error': result.get('error', 'Error procesando patrones')})
+        try:
+            print_options = resolve_print_options(data.get('page_size'), data.get('overlap_mm'), data.get('scale'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        response_mode, error = parse_response_mode(data)
+        if error:
+            return error
+        
+        # Las tallas del diseño se buscan en el índice de artefactos: las de la petición
+        # de tallas indicada (sizes_token) o, sin ella, las últimas generadas para el diseño
+        sizes_token = data.get('sizes_token')
+        if sizes_token is not None and not isinstance(sizes_token, str):
+            return jsonify({'success': False, 'error': f'sizes_token inválido: {sizes_token}'}), 400
+        if not artifact_index.sizes_for(filename, sizes_token):
+            return jsonify({'success': False, 'error': f'No hay tallas generadas para {filename}'}), 404
+        
+        params = {
+            'filename': filename,
+            'skirt_type': skirt_type,
+            'svg': bool(data.get('svg', False)),
+            'combined': bool(data.get('combined', False)),
+            'sizes_token': sizes_token,
+            'print': print_options,
+            'response': response_mode
+        }
+        return dispatch('generate_patterns', params, data)
             
     except Exception as e:
-        print(f"Error en generate_patterns: {e}")
+        logger.error(f"Error en generate_patterns: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@routes.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Estado y progreso de un trabajo asíncrono"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify({'success': True, **job.to_dict()})
+
+@routes.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Resultado de un trabajo asíncrono terminado"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    
+    if not job.finished:
+        return jsonify({'success': False, **job.to_dict()}), 202
+    if job.state == 'cancelled':
+        return jsonify({'success': False, 'error': 'Trabajo cancelado', **job.to_dict()}), 409
+    if job.result is None:
+        return jsonify({'success': False, 'error': f'Error interno: {job.error}'}), 500
+    
+    return jsonify(job.result), job.status_code
+
+@routes.route('/api/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """Eventos de progreso y previews de un trabajo como Server-Sent Events"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    
+    return event_stream(job, cancel_on_disconnect=False)
+
+@routes.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancela un trabajo en cola o en ejecución"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify({'success': True, **job.to_dict()})
+
+@routes.route('/api/artifacts/<filename>/pin', methods=['POST'])
+def pin_artifact(filename):
+    """Fija un diseño para que el gestor de almacenamiento no borre ni él ni sus tallas y patrones"""
+    if not artifact_store.exists('downloads', filename):
+        return jsonify({'success': False, 'error': f'Archivo no encontrado: {filename}'}), 404
+    
+    artifact_index.pin(filename)
+    return jsonify({'success': True, 'filename': filename, 'pinned': True})
+
+@routes.route('/api/artifacts/<filename>/pin', methods=['DELETE'])
+def unpin_artifact(filename):
+    """Quita la fijación de un diseño"""
+    if not artifact_index.unpin(filename):
+        return jsonify({'success': False, 'error': f'El diseño no está fijado: {filename}'}), 404
+    
+    return jsonify({'success': True, 'filename': filename, 'pinned': False})
+
 @routes.route('/downloads/<filename>', methods=['GET'])
 def download_file(filename):
     """Descargar archivos generados"""
-    try:
-        return send_from_directory(DOWNLOADS_DIR, filename, as_attachment=True)
-    except FileNotFoundError:
+    response = send_artifact('downloads', filename)
+    if response is None:
         return jsonify({'success': False, 'error': 'Archivo no encontrado'}), 404
+    return response
 
 @routes.route('/tallas/<filename>', methods=['GET'])
 def download_size_file(filename):
     """Descargar archivos de tallas"""
-    try:
-        return send_from_directory(TALLAS_DIR, filename, as_attachment=True)
-    except FileNotFoundError:
+    response = send_artifact('tallas', filename)
+    if response is None:
         return jsonify({'success': False, 'error': 'Archivo de talla no encontrado'}), 404
+    return response
 
 @routes.route('/patterns/<filename>')
 def download_pattern(filename):
     """Ruta para descargar archivos PDF de patrones"""
     try:
-        patterns_path = os.path.join(os.getcwd(), 'static', 'patterns')
-        file_path = os.path.join(patterns_path, filename)
-        
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True, download_name=filename)
-        else:
+        response = send_artifact('patterns', filename)
+        if response is None:
             return jsonify({'error': 'Archivo no encontrado'}), 404
+        return response
             
     except Exception as e:
-        print(f"Error descargando patrón: {e}")
+        logger.error(f"Error descargando patrón: {e}")
         return jsonify({'error': str(e)}), 500
 
 @routes.route('/generate_design/<skirt_type>', methods=['GET'])
@@ -197,7 +688,7 @@ def generate_design(skirt_type):
         return render_template('index.html', error=f'Tipo de falda inválido: {skirt_type}')
     
     try:
-        result = generate_image('design', skirt_type)
+        result = stock_pool.take('design', skirt_type) or inference_scheduler.submit('design', skirt_type)
         if not result:
             return render_template('index.html', error='Error al generar el diseño')
         
@@ -216,7 +707,7 @@ def generate_pattern(skirt_type):
         return render_template('index.html', error=f'Tipo de falda inválido: {skirt_type}')
     
     try:
-        result = generate_image('pattern', skirt_type)
+        result = stock_pool.take('pattern', skirt_type) or inference_scheduler.submit('pattern', skirt_type)
         if not result:
             return render_template('index.html', error='Error al generar el patrón')
         
@@ -227,10 +718,43 @@ def generate_pattern(skirt_type):
     except Exception as e:
         return render_template('index.html', error=f'Error al generar el patrón: {str(e)}')
 
+@routes.route('/api/stats', methods=['GET'])
+def api_stats():
+    """Estadísticas de los servicios de inferencia"""
+    return jsonify({
+        'model_cache': model_registry.stats(),
+        'inference_scheduler': inference_scheduler.stats(),
+        'jobs': job_manager.stats(),
+        'worker_pool': worker_pool.stats(),
+        'stock': stock_pool.stats(),
+        'result_cache': result_cache.stats(),
+        'artifact_writer': artifact_writer.stats(),
+        'artifact_index': artifact_index.stats(),
+        'artifact_delivery': artifact_delivery.stats(),
+        'storage': storage_manager.stats(),
+        'metrics': metrics.snapshot()
+    })
+
+@routes.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas en formato Prometheus"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @routes.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'environment': 'local'
-    })
\ No newline at end of file
+    })
+
+@routes.route('/health/live', methods=['GET'])
+def health_live():
+    """Liveness: el proceso responde (aunque aún no esté listo para inferencia)"""
+    return jsonify({'status': 'alive'})
+
+@routes.route('/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness: 200 cuando los modelos configurados están cargados y calentados, 503 mientras tanto"""
+    status = lifecycle.status()
+    return jsonify(status), 200 if status['ready'] else 503
\ No newline at end of file
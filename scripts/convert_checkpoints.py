@@ -0,0 +1,89 @@
+"""
+Convierte los checkpoints .pth de models/ a safetensors.
+
+Solo se guarda model_state_dict (los pesos que usa la inferencia), junto al
+.pth con el mismo nombre y extensión .safetensors. Con MODEL_FORMAT=auto o
+safetensors, diffusion_service mapea estos archivos en memoria en lugar de
+deserializar el checkpoint, y los procesos de trabajo de un mismo nodo
+comparten las mismas páginas.
+
+Tras convertir se comprueba que los tensores cargados con mmap son idénticos a
+los del checkpoint original.
+
+Uso:
+    python scripts/convert_checkpoints.py
+    python scripts/convert_checkpoints.py --models pattern:patrones_varios_disenos --force
+"""
+import os
+import sys
+import argparse
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.generation_config import (
+    DESIGN_MODELS, PATTERN_MODELS, get_checkpoint_filename, get_checkpoint_path, get_safetensors_path
+)
+from services.checkpoint_io import save_safetensors, load_safetensors_mmap
+
+
+def available_models():
+    models = []
+    for model_type, names in (('design', DESIGN_MODELS), ('pattern', PATTERN_MODELS)):
+        for skirt_type in names:
+            if os.path.exists(get_checkpoint_path(model_type, skirt_type)):
+                models.append((model_type, skirt_type))
+    return models
+
+
+def convert(model_type, skirt_type, force=False):
+    """
+    Convierte un checkpoint. Devuelve True si el resultado es correcto (o ya estaba al día).
+    """
+    checkpoint_path = get_checkpoint_path(model_type, skirt_type)
+    safetensors_path = get_safetensors_path(model_type, skirt_type)
+
+    if (not force and os.path.exists(safetensors_path)
+            and os.path.getmtime(safetensors_path) >= os.path.getmtime(checkpoint_path)):
+        print(f"{model_type}:{skirt_type} ya convertido en {safetensors_path}")
+        return True
+
+    try:
+        checkpoint = torch.load(checkpoint_path, map_location='cpu')
+    except Exception as e:
+        print(f"Error al leer {os.path.basename(checkpoint_path)}: {e}")
+        return False
+    state_dict = checkpoint["model_state_dict"]
+
+    tmp_path = f"{safetensors_path}.tmp"
+    save_safetensors(state_dict, tmp_path, metadata={'source': get_checkpoint_filename(model_type, skirt_type)})
+    os.replace(tmp_path, safetensors_path)
+
+    loaded = load_safetensors_mmap(safetensors_path)
+    identical = loaded.keys() == state_dict.keys() and all(
+        torch.equal(loaded[name], state_dict[name].cpu()) for name in state_dict
+    )
+    size_mb = os.path.getsize(safetensors_path) / 1024 / 1024
+    print(f"{model_type}:{skirt_type} -> {safetensors_path} ({size_mb:.1f} MB) "
+          f"{'OK' if identical else 'TENSORES DISTINTOS'}")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+',
+                        help='Modelos a convertir como model_type:skirt_type (por defecto, todos los disponibles)')
+    parser.add_argument('--force', action='store_true', help='Reconvertir aunque el archivo esté al día')
+    args = parser.parse_args()
+
+    models = [tuple(m.split(':')) for m in args.models] if args.models else available_models()
+    if not models:
+        sys.exit("No hay checkpoints en models/ para convertir")
+
+    results = [convert(model_type, skirt_type, args.force) for model_type, skirt_type in models]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
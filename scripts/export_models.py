@@ -0,0 +1,100 @@
+"""
+Exporta los checkpoints de models/ a artefactos TorchScript de inferencia.
+
+Cada checkpoint .pth de DESIGN_MODELS y PATTERN_MODELS que exista se carga con
+diffusers, se traza, se congela y se guarda en EXPORT_DIR (models/exported por
+defecto) con el mismo nombre y extensión .pt. En ejecución, diffusion_service
+carga el artefacto directamente (MODEL_FORMAT=auto o exported), sin construir
+el UNet de diffusers ni deserializar el checkpoint de entrenamiento.
+
+Tras exportar se compara la salida del artefacto con la del modelo original y
+se mide el tiempo de carga de ambos formatos.
+
+Uso:
+    python scripts/export_models.py
+    python scripts/export_models.py --models pattern:patrones_varios_disenos --force
+"""
+import os
+import sys
+import time
+import argparse
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from services.diffusion_service import (
+    DESIGN_MODELS, PATTERN_MODELS, device, get_checkpoint_filename, get_checkpoint_path, load_checkpoint_model
+)
+from services.model_export import export_model, get_exported_path, load_exported
+
+
+def available_models():
+    models = []
+    for model_type, names in (('design', DESIGN_MODELS), ('pattern', PATTERN_MODELS)):
+        for skirt_type in names:
+            if os.path.exists(get_checkpoint_path(model_type, skirt_type)):
+                models.append((model_type, skirt_type))
+    return models
+
+
+def check_export(model, exported, batch_size=2):
+    """Diferencia máxima entre el UNet original y el exportado para una misma entrada."""
+    sample = torch.randn(batch_size, 3, 192, 128, device=device)
+    timestep = torch.full((batch_size,), 500, device=device, dtype=torch.long)
+    with torch.no_grad():
+        reference = model(sample, timestep).sample
+        output = exported(sample, timestep).sample
+    return float((reference - output).abs().max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+',
+                        help='Modelos a exportar como model_type:skirt_type (por defecto, todos los disponibles)')
+    parser.add_argument('--force', action='store_true', help='Reexportar aunque el artefacto esté al día')
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help='Diferencia máxima admitida entre el modelo original y el exportado')
+    args = parser.parse_args()
+
+    models = [tuple(m.split(':')) for m in args.models] if args.models else available_models()
+    if not models:
+        sys.exit("No hay checkpoints en models/ para exportar")
+
+    failed = False
+    for model_type, skirt_type in models:
+        checkpoint_path = get_checkpoint_path(model_type, skirt_type)
+        exported_path = get_exported_path(get_checkpoint_filename(model_type, skirt_type))
+
+        if (not args.force and os.path.exists(exported_path)
+                and os.path.getmtime(exported_path) >= os.path.getmtime(checkpoint_path)):
+            print(f"{model_type}:{skirt_type} ya exportado en {exported_path}")
+            continue
+
+        start = time.perf_counter()
+        model = load_checkpoint_model(model_type, skirt_type)
+        checkpoint_seconds = time.perf_counter() - start
+        if model is None:
+            failed = True
+            continue
+
+        start = time.perf_counter()
+        export_model(model, exported_path, device)
+        export_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exported = load_exported(exported_path, device)
+        exported_seconds = time.perf_counter() - start
+
+        max_diff = check_export(model, exported)
+        status = 'OK' if max_diff <= args.tolerance else 'DIFERENCIA EXCESIVA'
+        failed = failed or max_diff > args.tolerance
+        print(f"{model_type}:{skirt_type} -> {exported_path} ({export_seconds:.1f} s) | "
+              f"carga .pth {checkpoint_seconds:.2f} s, exportado {exported_seconds:.2f} s | "
+              f"diferencia máx. {max_diff:.2e} {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from services.artifact_store import atomic_path
+
+# Segundos que el navegador o la CDN pueden guardar un artefacto pedido con su versión (?v=)
+ARTIFACT_MAX_AGE = 365 * 24 * 3600
+# Extensiones que se sirven comprimidas con gzip si el cliente lo acepta
+COMPRESSIBLE_EXTENSIONS = ('.svg', '.pdf')
+# Por debajo de este tamaño (bytes) no compensa comprimir
+GZIP_MIN_BYTES = 1024
+# Directorio de las copias comprimidas, indexadas por contenido
+GZIP_CACHE_DIR = os.environ.get('GZIP_CACHE_DIR', os.path.join('cache', 'gzip'))
+# Huellas guardadas en memoria (las de los archivos usados hace más tiempo se descartan)
+DIGEST_CACHE_SIZE = int(os.environ.get('DIGEST_CACHE_SIZE', 20000))
+
+
+class ArtifactDelivery:
+    """
+    Huella de contenido y copias comprimidas de los artefactos servidos.
+
+    La huella (SHA-256 del contenido) sirve de ETag fuerte y de versión en las
+    URLs (?v=): una URL versionada siempre apunta al mismo contenido y puede
+    guardarse como inmutable. Las huellas se calculan una vez por archivo y
+    versión (tamaño y fecha de modificación), y las copias gzip una vez por
+    contenido, de modo que servir un artefacto repetido no recalcula nada.
+    Se guardan como mucho max_digests huellas; al superarlo se descartan las
+    de los archivos usados hace más tiempo.
+    """
+
+    def __init__(self, gzip_dir=GZIP_CACHE_DIR, max_digests=DIGEST_CACHE_SIZE):
+        self.gzip_dir = gzip_dir
+        self.max_digests = max(1, max_digests)
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        self.hashed = 0
+        self.compressed = 0
+
+    def digest_bytes(self, data):
+        """Huella de unos bytes (la misma que tendrá el archivo que los contenga)."""
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    def digest(self, path):
+        """Huella del contenido de un archivo, o None si no existe."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_size, stat.st_mtime_ns)
+        path = os.path.abspath(path)
+
+        with self._lock:
+            cached = self._digests.get(path)
+            if cached is not None and cached[0] == key:
+                self._digests.move_to_end(path)
+                return cached[1]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()[:32]
+        with self._lock:
+            self._digests[path] = (key, digest)
+            self._digests.move_to_end(path)
+            while len(self._digests) > self.max_digests:
+                self._digests.popitem(last=False)
+            self.hashed += 1
+        return digest
+
+    def forget(self, path):
+        """Descarta la huella de un archivo borrado."""
+        with self._lock:
+            self._digests.pop(os.path.abspath(path), None)
+
+    def url(self, prefix, filename, path=None, data=None):
+        """
+        URL versionada de un artefacto: f"{prefix}/{filename}?v={huella}".
+
+        La huella se calcula de data si se da (p. ej. antes de que termine la
+        escritura en segundo plano) o del archivo path; sin ninguno de los dos,
+        o si el archivo no existe, la URL no lleva versión.
+        """
+        digest = self.digest_bytes(data) if data is not None else (self.digest(path) if path else None)
+        if digest is None:
+            return f"{prefix}/{filename}"
+        return f"{prefix}/{filename}?v={digest}"
+
+    def compressible(self, path):
+        return path.lower().endswith(COMPRESSIBLE_EXTENSIONS) and os.path.getsize(path) >= GZIP_MIN_BYTES
+
+    def compressed_path(self, path, digest):
+        """
+        Copia gzip del archivo de huella digest, creándola la primera vez.
+
+        Returns:
+            str: Ruta de la copia comprimida
+        """
+        gz_path = os.path.join(self.gzip_dir, f"{digest}.gz")
+        if os.path.exists(gz_path):
+            return gz_path
+
+        with atomic_path(gz_path) as tmp_path:
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as raw:
+                # mtime=0: la copia depende solo del contenido
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as dst:
+                    for chunk in iter(lambda: src.read(1 << 20), b''):
+                        dst.write(chunk)
+        with self._lock:
+            self.compressed += 1
+        return gz_path
+
+    def stats(self):
+        with self._lock:
+            return {
+                'digests_cached': len(self._digests),
+                'hashed': self.hashed,
+                'compressed': self.compressed
+            }
+
+# Instancia global de la entrega de artefactos
+artifact_delivery = ArtifactDelivery()
@@ -0,0 +1,191 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import nullcontext
+
+# Base de datos del índice de artefactos; ':memory:' lo mantiene solo en el
+# proceso actual (no sirve con EXECUTION_MODE=process)
+ARTIFACT_INDEX_PATH = os.environ.get('ARTIFACT_INDEX_PATH', os.path.join('cache', 'artifacts.db'))
+
+# Tipos de artefacto derivados de un diseño
+ARTIFACT_KINDS = ('size', 'pattern_svg', 'pattern_pdf', 'pattern_preview')
+
+
+class ArtifactIndex:
+    """
+    Índice de los artefactos derivados de cada diseño generado.
+
+    Relaciona el nombre de archivo del diseño base con sus tallas y sus
+    patrones, de modo que las etapas siguientes encuentran sus entradas con una
+    consulta por clave primaria en lugar de listar static/tallas y elegir por
+    fecha de modificación (que además podía devolver las tallas de otro usuario
+    con el mismo tipo de falda).
+
+    Cada petición registra sus artefactos con su propio identificador (token):
+    los diseños con semilla comparten nombre de archivo entre usuarios, y así
+    las tallas de una petición no se mezclan con las de otra del mismo diseño.
+
+    Usa SQLite en modo WAL: cada hilo y cada proceso de trabajo abre su propia
+    conexión y las escrituras concurrentes se serializan en la base de datos.
+    """
+
+    def __init__(self, path=ARTIFACT_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._memory_connection = None
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self.path == ':memory:':
+            # Una base en memoria solo existe en su conexión: se comparte entre hilos
+            with self._lock:
+                if self._memory_connection is None:
+                    self._memory_connection = sqlite3.connect(':memory:', check_same_thread=False)
+                    self._create_schema(self._memory_connection)
+            return self._memory_connection
+
+        # Las conexiones no se heredan entre procesos (fork): se abre una por hilo y proceso
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._create_schema(connection)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _create_schema(self, connection):
+        with connection:
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(artifacts)')]
+            if columns and 'token' not in columns:
+                # Índice anterior sin token: se reconstruye (los archivos siguen en disco)
+                connection.execute('DROP TABLE artifacts')
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    base TEXT NOT NULL,
+                    token TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    size TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (base, token, kind, size)
+                )
+            """)
+            connection.execute('CREATE INDEX IF NOT EXISTS artifacts_filename ON artifacts (filename)')
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS pins (
+                    base TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def _execute(self, sql, params=(), many=False):
+        connection = self._connect()
+        with self._lock if self.path == ':memory:' else nullcontext():
+            with connection:
+                if many:
+                    return connection.executemany(sql, params).fetchall()
+                return connection.execute(sql, params).fetchall()
+
+    def record(self, base, artifacts, token):
+        """
+        Registra artefactos de un diseño generados por una petición; los de la
+        misma petición, talla y tipo se sustituyen.
+
+        Args:
+            base (str): Nombre de archivo del diseño base
+            artifacts (list): [(kind, size, filename, path), ...]
+            token (str): Identificador de la petición que generó los artefactos
+        """
+        now = time.time()
+        for kind, *_ in artifacts:
+            if kind not in ARTIFACT_KINDS:
+                raise ValueError(f"Tipo de artefacto desconocido: {kind}")
+        self._execute(
+            'INSERT OR REPLACE INTO artifacts (base, token, kind, size, filename, path, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(base, token, kind, size, filename, path, now) for kind, size, filename, path in artifacts],
+            many=True
+        )
+
+    def find(self, base, kind, token=None):
+        """
+        Artefactos de un tipo de un diseño generados por una misma petición, en el
+        orden en que se registraron.
+
+        Args:
+            base (str): Nombre de archivo del diseño base
+            kind (str): Tipo de artefacto (ARTIFACT_KINDS)
+            token (str): Petición cuyos artefactos se buscan, o None para la última
+                que registró artefactos de ese tipo
+
+        Returns:
+            list: [{'size', 'filename', 'path', 'token'}, ...]
+        """
+        if token is None:
+            latest = self._execute(
+                'SELECT token FROM artifacts WHERE base = ? AND kind = ? ORDER BY created_at DESC, rowid DESC LIMIT 1',
+                (base, kind)
+            )
+            token = latest[0][0] if latest else None
+        rows = self._execute(
+            'SELECT size, filename, path FROM artifacts WHERE base = ? AND kind = ? AND token = ? '
+            'ORDER BY created_at, rowid',
+            (base, kind, token)
+        ) if token is not None else []
+        with self._lock:
+            self.lookups += 1
+            self.misses += not rows
+        return [{'size': size, 'filename': filename, 'path': path, 'token': token} for size, filename, path in rows]
+
+    def sizes_for(self, base, token=None):
+        """Tallas de un diseño registradas por una petición (por defecto, la última)."""
+        return self.find(base, 'size', token)
+
+    def patterns_for(self, base, token=None):
+        """PDF de patrones de un diseño registrados por una petición (por defecto, la última)."""
+        return self.find(base, 'pattern_pdf', token)
+
+    def filenames_for(self, base):
+        """Nombres de archivo de un diseño y de todos sus artefactos derivados."""
+        rows = self._execute('SELECT filename FROM artifacts WHERE base = ?', (base,))
+        return [base] + [filename for filename, in rows]
+
+    def pin(self, base):
+        """Fija un diseño: el gestor de almacenamiento no borra ni él ni sus artefactos."""
+        self._execute('INSERT OR REPLACE INTO pins (base, created_at) VALUES (?, ?)', (base, time.time()))
+
+    def unpin(self, base):
+        """Quita la fijación de un diseño. Devuelve False si no estaba fijado."""
+        pinned = base in self.pinned()
+        self._execute('DELETE FROM pins WHERE base = ?', (base,))
+        return pinned
+
+    def pinned(self):
+        """Diseños fijados."""
+        return [base for base, in self._execute('SELECT base FROM pins ORDER BY created_at')]
+
+    def forget(self, filename):
+        """Elimina del índice un archivo (p. ej. al borrarlo del disco)."""
+        self._execute('DELETE FROM artifacts WHERE filename = ? OR base = ?', (filename, filename))
+
+    def stats(self):
+        rows = self._execute('SELECT kind, COUNT(*) FROM artifacts GROUP BY kind')
+        pins = self._execute('SELECT COUNT(*) FROM pins')[0][0]
+        with self._lock:
+            return {
+                'path': self.path,
+                'artifacts': dict(rows),
+                'pinned': pins,
+                'lookups': self.lookups,
+                'misses': self.misses
+            }
+
+# Instancia global del índice de artefactos
+artifact_index = ArtifactIndex()
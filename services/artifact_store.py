@@ -0,0 +1,117 @@
+import os
+import uuid
+import hashlib
+from contextlib import contextmanager
+
+from services.generation_config import OUTPUT_DIR
+
+# Raíz de cada espacio de artefactos. Pueden apuntar a almacenamiento compartido
+# entre procesos de trabajo o nodos: los nombres no colisionan y las escrituras
+# son atómicas.
+ARTIFACT_STORE_ROOTS = {
+    'downloads': OUTPUT_DIR,
+    'tallas': os.environ.get('TALLAS_DIR', os.path.join('static', 'tallas')),
+    'patterns': os.environ.get('PATTERNS_DIR', os.path.join('static', 'patterns'))
+}
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Ruta temporal en la que escribir path: al salir del bloque sin errores se
+    renombra sobre path (os.replace, atómico en el mismo sistema de archivos) y
+    si hay un error se borra. Un lector nunca ve un archivo a medias.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # El uuid evita que dos procesos (o nodos) escriban el mismo temporal
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(path, data):
+    """Escribe data (bytes) en path de forma atómica."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+
+
+class ArtifactStore:
+    """
+    Almacén de los artefactos generados (diseños, tallas y patrones).
+
+    Cada artefacto se identifica por su espacio ('downloads', 'tallas',
+    'patterns') y su nombre de archivo, que lleva un hash del contenido o un
+    identificador aleatorio, así que dos peticiones concurrentes nunca
+    escriben el mismo archivo. Los archivos se reparten en subdirectorios por
+    los dos primeros caracteres del hash de su nombre, de modo que ningún
+    directorio crece sin límite aunque los nombres compartan prefijo.
+    """
+
+    def __init__(self, roots=ARTIFACT_STORE_ROOTS):
+        self.roots = dict(roots)
+
+    def unique_name(self, stem, extension):
+        """Nombre con un identificador aleatorio: f"{stem}_{uuid}{extension}"."""
+        return f"{stem}_{uuid.uuid4().hex[:12]}{extension}"
+
+    def content_name(self, stem, data, extension):
+        """Nombre con el hash del contenido: f"{stem}_{sha256}{extension}"."""
+        return f"{stem}_{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+    def path(self, namespace, filename):
+        """
+        Ruta de un artefacto en el almacén.
+
+        Raises:
+            ValueError: Si el espacio no existe o el nombre no es un nombre de archivo simple
+        """
+        if namespace not in self.roots:
+            raise ValueError(f"Espacio de artefactos desconocido: {namespace}")
+        if (not filename or os.path.basename(filename) != filename or filename.startswith('.')
+                or '/' in filename or '\\' in filename):
+            raise ValueError(f"Nombre de artefacto inválido: {filename}")
+        shard = hashlib.sha1(filename.encode('utf-8')).hexdigest()[:2]
+        return os.path.join(self.roots[namespace], shard, filename)
+
+    def resolve(self, namespace, filename):
+        """
+        Ruta de un artefacto existente, o None si no existe o el nombre no es válido.
+
+        Los archivos escritos antes de usar subdirectorios se siguen encontrando
+        en la raíz del espacio.
+        """
+        try:
+            path = self.path(namespace, filename)
+        except ValueError:
+            return None
+        if os.path.isfile(path):
+            return path
+        legacy_path = os.path.join(self.roots[namespace], filename)
+        if os.path.isfile(legacy_path):
+            return legacy_path
+        return None
+
+    def exists(self, namespace, filename):
+        return self.resolve(namespace, filename) is not None
+
+    def write(self, namespace, filename, data):
+        """
+        Escribe un artefacto de forma atómica.
+
+        Returns:
+            str: Ruta del artefacto
+        """
+        path = self.path(namespace, filename)
+        atomic_write(path, data)
+        return path
+
+# Instancia global del almacén de artefactos
+artifact_store = ArtifactStore()
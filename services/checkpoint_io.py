@@ -0,0 +1,79 @@
+import json
+import struct
+
+import torch
+
+# Tipos de safetensors soportados por el cargador
+SAFETENSORS_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool
+}
+
+
+def save_safetensors(state_dict, path, metadata=None):
+    """
+    Guarda un state_dict en formato safetensors.
+
+    Args:
+        state_dict (dict): Tensores del modelo
+        path (str): Ruta del archivo .safetensors
+        metadata (dict): Metadatos de texto opcionales (p. ej. checkpoint de origen)
+    """
+    from safetensors.torch import save_file
+    tensors = {name: tensor.detach().cpu().contiguous() for name, tensor in state_dict.items()}
+    save_file(tensors, path, metadata=metadata)
+
+
+def read_safetensors_header(path):
+    """
+    Lee la cabecera JSON de un archivo safetensors.
+
+    Returns:
+        tuple: (cabecera sin '__metadata__', desplazamiento en bytes del inicio de los datos)
+    """
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    header.pop('__metadata__', None)
+    return header, 8 + header_size
+
+
+def load_safetensors_mmap(path):
+    """
+    Carga un archivo safetensors como tensores que apuntan directamente al archivo
+    mapeado en memoria, sin copiarlo.
+
+    El archivo se mapea en modo privado (copy-on-write): mientras nadie escriba
+    en los pesos, todos los procesos que cargan el mismo archivo comparten las
+    mismas páginas de la caché de páginas del sistema operativo en lugar de tener
+    cada uno su propia copia.
+
+    Returns:
+        dict: {nombre: tensor} con almacenamiento compartido sobre el archivo
+    """
+    header, data_start = read_safetensors_header(path)
+    total_bytes = data_start + max((info['data_offsets'][1] for info in header.values()), default=0)
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=total_bytes)
+
+    tensors = {}
+    for name, info in header.items():
+        dtype = SAFETENSORS_DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        element_size = torch.empty((), dtype=dtype).element_size()
+        offset = data_start + begin
+        if offset % element_size:
+            raise ValueError(f"Tensor {name} no alineado en {path}")
+        tensor = torch.empty(0, dtype=dtype)
+        tensor.set_(storage, offset // element_size, info['shape'])
+        if tensor.numel() * element_size != end - begin:
+            raise ValueError(f"Tamaño incorrecto del tensor {name} en {path}")
+        tensors[name] = tensor
+    return tensors
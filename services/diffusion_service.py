@@ -1,43 +1,83 @@
 import os
+import logging
 import torch
 import numpy as np
 from PIL import Image
 from io import BytesIO
 import base64
-from diffusers import UNet2DModel, DDPMScheduler
+from services.generation_config import (
+    DESIGN_MODELS, PATTERN_MODELS, SAMPLERS, SCHEDULER_IMPL, DEFAULT_SAMPLER, DEFAULT_STEPS,
+    MAX_NUM_IMAGES, MAX_BATCH_SIZE, BYTES_PER_IMAGE, PREVIEW_SCALE, MAX_STEPS, MAX_SEED, GenerationCancelled,
+    resolve_sampler_options, validate_num_images, validate_seed, request_seeds, get_exported_path,
+    get_checkpoint_filename, get_checkpoint_path, get_safetensors_path, get_model_path
+)
+from services.model_registry import model_registry
+from services.samplers import NATIVE_SCHEDULERS
+from services.model_export import load_exported
+from services.checkpoint_io import load_safetensors_mmap
+from services.result_cache import result_cache
+from services.artifact_store import artifact_store
+from services.metrics import metrics
+from services.inference_backends import INFERENCE_BACKEND, apply_backend, parse_backend
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
 
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
-DESIGN_MODELS = {
-    'recta': 'checkpoint_design_recta.pth',
-    'con_volante': 'checkpoint_design_con_volante.pth',
-    'con_bolsillo': 'checkpoint_design_con_bolsillo.pth',
-    'campana': 'checkpoint_design_campana.pth',
-    'sirena': 'checkpoint_design_sirena.pth',
-    'con_canesu': 'checkpoint_design_con_canesu.pth',
-    'varios_disenos': 'checkpoint_design_varios_disenos.pth',
-    'patrones_varios_disenos': 'checkpoint_design_patrones_varios_disenos.pth'
-}
-
-PATTERN_MODELS = {
-    'recta': 'checkpoint_patron_recta.pth',
-    'con_volante': 'checkpoint_patron_con_volante.pth',
-    'con_bolsillo': 'checkpoint_patron_con_bolsillo.pth',
-    'campana': 'checkpoint_patron_campana.pth',
-    'sirena': 'checkpoint_patron_sirena.pth',
-    'con_canesu': 'checkpoint_patron_con_canesu.pth',
-    'varios_disenos': 'checkpoint_patron_varios_disenos.pth',
-    'patrones_varios_disenos': 'checkpoint_patron_patrones_varios_disenos.pth'
-}
-
-def load_model(model_type, skirt_type):
-    noise_scheduler = DDPMScheduler(
+def available_memory():
+    """Memoria disponible en el dispositivo de inferencia (bytes), o None si no se puede medir."""
+    if device == "cuda":
+        free, _ = torch.cuda.mem_get_info()
+        return free
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    return None
+
+def max_batch_size():
+    """Tamaño de lote máximo según MAX_BATCH_SIZE y la memoria disponible."""
+    memory = available_memory()
+    if memory is None:
+        return MAX_BATCH_SIZE
+    return max(1, min(MAX_BATCH_SIZE, int(memory // BYTES_PER_IMAGE)))
+
+def random_seeds(count):
+    """Genera semillas distintas para cada imagen del lote."""
+    seeds = []
+    while len(seeds) < count:
+        seed = int(torch.randint(0, MAX_SEED, (1,)).item())
+        if seed not in seeds:
+            seeds.append(seed)
+    return seeds
+
+def create_noise_scheduler(sampler='ddpm'):
+    config = SAMPLERS[sampler]
+    if SCHEDULER_IMPL == 'diffusers':
+        import diffusers
+        scheduler_class = getattr(diffusers, config['scheduler_class'])
+    else:
+        scheduler_class = NATIVE_SCHEDULERS[config['scheduler_class']]
+    return scheduler_class(
         num_train_timesteps=1000,
         beta_schedule="linear",
-        prediction_type="epsilon"
+        prediction_type="epsilon",
+        **config['options']
     )
-    
-    model = UNet2DModel(
+
+def build_model(device=device):
+    # diffusers solo hace falta para construir el UNet desde un checkpoint .pth o .safetensors
+    try:
+        from diffusers import UNet2DModel
+    except ImportError as e:
+        raise ImportError(
+            "diffusers no está instalado: exporta los modelos con scripts/export_models.py "
+            "o instala requirements-export.txt"
+        ) from e
+    return UNet2DModel(
         sample_size=(192, 128),
         in_channels=3,
         out_channels=3,
@@ -46,57 +86,262 @@ def load_model(model_type, skirt_type):
         down_block_types=("DownBlock2D", "DownBlock2D", "AttnDownBlock2D", "DownBlock2D"),
         up_block_types=("UpBlock2D", "AttnUpBlock2D", "UpBlock2D", "UpBlock2D")
     ).to(device)
-    
-    if model_type == 'design':
-        checkpoint_filename = DESIGN_MODELS[skirt_type]
-    else:
-        checkpoint_filename = PATTERN_MODELS[skirt_type]
-    
-    checkpoint_path = os.path.join(os.path.dirname(__file__), '../models', checkpoint_filename)
+
+def load_checkpoint_model(model_type, skirt_type):
+    """Construye el UNet y carga su checkpoint desde disco (sin pasar por el registro)."""
+    checkpoint_path = get_checkpoint_path(model_type, skirt_type)
     
     try:
+        model = build_model()
         checkpoint = torch.load(checkpoint_path, map_location=device)
         model.load_state_dict(checkpoint["model_state_dict"])
         model.eval()
-        return model, noise_scheduler
+        return model
     except Exception as e:
-        print(f"Error al cargar el modelo {checkpoint_filename}: {e}")
-        return None, None
+        logger.error(f"Error al cargar el modelo {os.path.basename(checkpoint_path)}: {e}")
+        return None
 
-def generate_image(model_type, skirt_type):
-    model, noise_scheduler = load_model(model_type, skirt_type)
+def load_safetensors_model(model_type, skirt_type):
+    """
+    Carga un checkpoint .safetensors sin copiar los pesos: el UNet se construye
+    sin memoria (dispositivo 'meta') y sus parámetros pasan a ser los tensores
+    mapeados sobre el archivo (load_state_dict con assign=True). Los procesos de
+    un mismo nodo comparten así las páginas del archivo en la caché del sistema.
+    """
+    safetensors_path = get_safetensors_path(model_type, skirt_type)
     
-    if model is None or noise_scheduler is None:
+    try:
+        state_dict = load_safetensors_mmap(safetensors_path)
+        if device != 'cpu':
+            state_dict = {name: tensor.to(device) for name, tensor in state_dict.items()}
+        with torch.device('meta'):
+            model = build_model('meta')
+        model.load_state_dict(state_dict, strict=True, assign=True)
+        model.eval()
+        return model
+    except Exception as e:
+        logger.error(f"Error al cargar el modelo {os.path.basename(safetensors_path)}: {e}")
         return None
+
+def load_exported_model(model_type, skirt_type):
+    """Carga el UNet exportado con scripts/export_models.py (no necesita diffusers)."""
+    exported_path = get_exported_path(get_checkpoint_filename(model_type, skirt_type))
+    
+    try:
+        return load_exported(exported_path, device)
+    except Exception as e:
+        logger.error(f"Error al cargar el modelo exportado {os.path.basename(exported_path)}: {e}")
+        return None
+
+@metrics.timed('model_load')
+def load_serving_model(model_type, skirt_type):
+    """Carga el modelo en el formato configurado y le aplica el backend de inferencia."""
+    model_path = get_model_path(model_type, skirt_type)
+    if model_path == get_safetensors_path(model_type, skirt_type):
+        model = load_safetensors_model(model_type, skirt_type)
+    elif model_path == get_checkpoint_path(model_type, skirt_type):
+        model = load_checkpoint_model(model_type, skirt_type)
+    else:
+        model = load_exported_model(model_type, skirt_type)
+    return apply_backend(model, INFERENCE_BACKEND, device)
+
+def load_model(model_type, skirt_type, sampler='ddpm'):
+    # Los modelos quedan residentes en el registro ya optimizados con el backend de
+    # inferencia; el scheduler se crea por petición porque guarda estado durante el muestreo
+    model = model_registry.get(
+        (model_type, skirt_type),
+        lambda: load_serving_model(model_type, skirt_type)
+    )
+    
+    if model is None:
+        return None, None
+    
+    return model, create_noise_scheduler(sampler)
+
+@metrics.timed('sampling')
+def sample_images(model, noise_scheduler, sample, steps, generator=None, callback=None):
+    """
+    Ejecuta el bucle de eliminación de ruido sobre un tensor de ruido inicial.
+
+    Args:
+        model: UNet2DModel cargado
+        noise_scheduler: Scheduler creado con create_noise_scheduler
+        sample (torch.Tensor): Ruido inicial (N, 3, 192, 128)
+        steps (int): Número de pasos de inferencia
+        generator (torch.Generator | list): Generador (o uno por imagen) para el ruido
+            de los pasos estocásticos
+        callback (callable): Función callback(step, sample, denoised) llamada tras cada
+            paso, donde denoised es la estimación de la imagen final si el scheduler la
+            ofrece (si no, la propia muestra); puede lanzar GenerationCancelled
+
+    Returns:
+        torch.Tensor: Muestras generadas en el rango [-1, 1]
+    """
+    noise_scheduler.set_timesteps(steps)
     
     with torch.no_grad():
-        sample = torch.randn(1, 3, 192, 128).to(device)
+        for i, t in enumerate(noise_scheduler.timesteps):
+            timestep = torch.full((sample.shape[0],), int(t), device=device, dtype=torch.long)
+            with metrics.timer('unet_step'):
+                model_output = model(sample, timestep).sample
+            step_output = noise_scheduler.step(model_output, t, sample, generator=generator)
+            sample = step_output.prev_sample
+            if callback is not None:
+                denoised = getattr(step_output, 'pred_original_sample', None)
+                callback(i + 1, sample, denoised if denoised is not None else sample)
+    
+    return sample
+
+def to_uint8_images(sample):
+    """Convierte un lote de muestras [-1, 1] en imágenes uint8 (N, H, W, 3)."""
+    img = (sample / 2 + 0.5).clamp(0, 1)
+    img = img.cpu().permute(0, 2, 3, 1).numpy()
+    return (img * 255).astype(np.uint8)
+
+def make_previews(sample):
+    """Reduce un lote de muestras a previews uint8 de baja resolución (PREVIEW_SCALE)."""
+    small = torch.nn.functional.interpolate(sample, scale_factor=PREVIEW_SCALE, mode='bilinear',
+                                            align_corners=False)
+    return to_uint8_images(small)
+
+def generate_image(model_type, skirt_type, sampler=None, steps=None, num_images=1, progress_callback=None,
+                   encode_base64=True, preview_callback=None, preview_every=0, seeds=None, persist=True,
+                   return_arrays=False):
+    """
+    Genera num_images imágenes con el modelo de difusión indicado.
+
+    Las imágenes con semilla explícita que ya están en la caché de resultados se
+    devuelven sin ejecutar el UNet; el resto se muestrea en un único bucle y se
+    guarda en la caché para futuras repeticiones.
+
+    Args:
+        model_type (str): 'design' o 'pattern'
+        skirt_type (str): Tipo de falda
+        sampler (str): Sampler a usar (por defecto DEFAULT_SAMPLER)
+        steps (int): Pasos de inferencia (por defecto según el sampler)
+        num_images (int): Número de imágenes a generar
+        progress_callback (callable): Función progress_callback(step, total_steps) llamada
+            tras cada paso de muestreo; puede lanzar GenerationCancelled
+        encode_base64 (bool): Si es False, cada imagen incluye los bytes PNG en 'png_bytes'
+            en lugar de 'image_base64' (para enviarlos entre procesos sin recodificar)
+        preview_callback (callable): Función preview_callback(step, total_steps, first_image,
+            previews) llamada cada preview_every pasos con previews uint8 de baja resolución
+            de las imágenes first_image... del lote; no debe bloquear el muestreo
+        preview_every (int): Cadencia de las previews en pasos (0 las desactiva)
+        seeds (list): Semilla de cada imagen; las que falten o sean None se eligen al azar
+        persist (bool): Si es False, las imágenes no se escriben en el almacén de artefactos (el
+            llamador decide si y cuándo guardarlas)
+        return_arrays (bool): Si es True, cada imagen incluye en 'array' la imagen
+            decodificada (uint8 RGB) para pasarla a la siguiente etapa sin releer el PNG
+
+    Returns:
+        dict: Imágenes generadas con sus rutas, base64 y semillas, o None si falló la carga
+    """
+    sampler, steps = resolve_sampler_options(sampler, steps)
+    # El límite por petición (MAX_NUM_IMAGES) se valida en las rutas; aquí pueden
+    # llegar lotes combinados por el planificador de inferencia, limitados a MAX_BATCH_SIZE
+    num_images = max(1, int(num_images))
+    seeds = list(seeds or [])[:num_images]
+    seeds += [None] * (num_images - len(seeds))
+    
+    # Solo se consulta la caché para las semillas pedidas; las aleatorias son nuevas
+    fresh = iter(random_seeds(seeds.count(None)))
+    requested = [seed is not None for seed in seeds]
+    seeds = [seed if seed is not None else next(fresh) for seed in seeds]
+    
+    model_path = get_model_path(model_type, skirt_type)
+    # El backend forma parte de la clave: bf16 o int8 no producen exactamente los mismos píxeles que fp32
+    backend = '+'.join(parse_backend(INFERENCE_BACKEND))
+    keys = [result_cache.make_key(model_path, model_type, skirt_type, sampler, steps, seed, backend)
+            for seed in seeds]
+    png_images = [result_cache.get(key) if was_requested else None for key, was_requested in zip(keys, requested)]
+    cached = [png_bytes is not None for png_bytes in png_images]
+    arrays = [None] * num_images
+    pending = [i for i, png_bytes in enumerate(png_images) if png_bytes is None]
+    
+    if pending:
+        model, noise_scheduler = load_model(model_type, skirt_type, sampler)
         
-        for t in range(noise_scheduler.config.num_train_timesteps - 1, -1, -1):
-            model_output = model(sample, torch.tensor([t], device=device)).sample
-            sample = noise_scheduler.step(model_output, t, sample).prev_sample
+        if model is None or noise_scheduler is None:
+            return None
         
-        img = (sample / 2 + 0.5).clamp(0, 1)
-        img = img.cpu().permute(0, 2, 3, 1).numpy()
-        img = (img * 255).astype(np.uint8)
-        pil_img = Image.fromarray(img[0])
+        batch_size = max_batch_size()
+        chunks = range(0, len(pending), batch_size)
+        total_steps = steps * len(chunks)
+        samples = []
         
-        filename = f"{model_type}_{skirt_type}_{int(torch.randint(0, 10000, (1,)).item())}.png"
+        # Todo el lote se procesa en un único bucle de muestreo, salvo que no quepa en memoria
+        for chunk_index, start in enumerate(chunks):
+            indices = pending[start:start + batch_size]
+            generators = [torch.Generator(device=device).manual_seed(seeds[i]) for i in indices]
+            sample = torch.cat([
+                torch.randn(1, 3, 192, 128, generator=generator, device=device)
+                for generator in generators
+            ])
+            if start > 0:
+                noise_scheduler = create_noise_scheduler(sampler)
+            
+            def callback(step, _, denoised, offset=chunk_index * steps, indices=indices):
+                if progress_callback is not None:
+                    progress_callback(offset + step, total_steps)
+                if preview_callback is not None and preview_every and step % preview_every == 0 and step < steps:
+                    previews = make_previews(denoised)
+                    # Las imágenes servidas desde la caché dejan huecos: una llamada por tramo contiguo
+                    run_start = 0
+                    for j in range(1, len(indices) + 1):
+                        if j == len(indices) or indices[j] != indices[j - 1] + 1:
+                            preview_callback(offset + step, total_steps, indices[run_start], previews[run_start:j])
+                            run_start = j
+            
+            samples.append(sample_images(model, noise_scheduler, sample, steps, generator=generators, callback=callback))
         
-        output_dir = os.path.join(os.path.dirname(__file__), '../static/downloads')
-        os.makedirs(output_dir, exist_ok=True)
+        img = to_uint8_images(torch.cat(samples))
         
-        output_path = os.path.join(output_dir, filename)
-        pil_img.save(output_path)
+        metrics.inc('images_generated_total', len(pending), model_type=model_type)
+        for i, array in zip(pending, img):
+            # Se codifica una sola vez: los mismos bytes se guardan, se cachean y se pasan a base64
+            with metrics.timer('png_encode'):
+                buffered = BytesIO()
+                Image.fromarray(array).save(buffered, format="PNG")
+                png_images[i] = buffered.getvalue()
+            arrays[i] = array
+            result_cache.put(keys[i], png_images[i])
+    
+    images = []
+    for png_bytes, array, seed, key, from_cache in zip(png_images, arrays, seeds, keys, cached):
+        # El prefijo de la clave distingue la misma semilla con otro sampler, pasos o checkpoint;
+        # sin clave, el hash del PNG: el mismo nombre siempre tiene el mismo contenido
+        if key:
+            filename = f"{model_type}_{skirt_type}_{seed}_{key[:8]}.png"
+        else:
+            filename = artifact_store.content_name(f"{model_type}_{skirt_type}_{seed}", png_bytes, '.png')
         
-        buffered = BytesIO()
-        pil_img.save(buffered, format="PNG")
-        image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+        if persist:
+            artifact_store.write('downloads', filename, png_bytes)
         
-        return {
-            'image_path': f'/static/downloads/{filename}',
-            'image_base64': image_base64
+        image = {
+            'filename': filename,
+            'image_path': f'/downloads/{filename}',
+            'seed': seed,
+            'cached': from_cache
         }
+        if encode_base64:
+            image['image_base64'] = base64.b64encode(png_bytes).decode('utf-8')
+        else:
+            image['png_bytes'] = png_bytes
+        if return_arrays:
+            # Solo las imágenes servidas desde la caché necesitan decodificarse
+            image['array'] = array if array is not None else np.asarray(Image.open(BytesIO(png_bytes)).convert('RGB'))
+        images.append(image)
+    
+    return {
+        'image_path': images[0]['image_path'],
+        'image_base64': images[0].get('image_base64'),
+        'images': images,
+        'seed': images[0]['seed'],
+        'sampler': sampler,
+        'steps': steps
+    }
 
 if __name__ == "__main__":
     result = generate_image('design', 'recta')
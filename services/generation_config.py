@@ -0,0 +1,221 @@
+"""
+Configuración y validación de las peticiones de generación.
+
+No importa torch ni diffusers: las rutas, el planificador y el stock la usan
+para validar peticiones sin cargar las dependencias pesadas de
+diffusion_service, que solo se importa al ejecutar la primera generación.
+"""
+import os
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '../static/downloads')
+
+DESIGN_MODELS = {
+    'recta': 'checkpoint_design_recta.pth',
+    'con_volante': 'checkpoint_design_con_volante.pth',
+    'con_bolsillo': 'checkpoint_design_con_bolsillo.pth',
+    'campana': 'checkpoint_design_campana.pth',
+    'sirena': 'checkpoint_design_sirena.pth',
+    'con_canesu': 'checkpoint_design_con_canesu.pth',
+    'varios_disenos': 'checkpoint_design_varios_disenos.pth',
+    'patrones_varios_disenos': 'checkpoint_design_patrones_varios_disenos.pth'
+}
+
+PATTERN_MODELS = {
+    'recta': 'checkpoint_patron_recta.pth',
+    'con_volante': 'checkpoint_patron_con_volante.pth',
+    'con_bolsillo': 'checkpoint_patron_con_bolsillo.pth',
+    'campana': 'checkpoint_patron_campana.pth',
+    'sirena': 'checkpoint_patron_sirena.pth',
+    'con_canesu': 'checkpoint_patron_con_canesu.pth',
+    'varios_disenos': 'checkpoint_patron_varios_disenos.pth',
+    'patrones_varios_disenos': 'checkpoint_patron_patrones_varios_disenos.pth'
+}
+
+# Samplers compatibles con los checkpoints entrenados con predicción de epsilon.
+# 'ddpm' es el muestreo original de 1000 pasos; 'ddim' y 'dpmsolver++' permiten
+# reducir el número de pasos sin reentrenar.
+SAMPLERS = {
+    'ddpm': {
+        'scheduler_class': 'DDPMScheduler',
+        'options': {},
+        'default_steps': 1000
+    },
+    'ddim': {
+        'scheduler_class': 'DDIMScheduler',
+        'options': {},
+        'default_steps': 50
+    },
+    'dpmsolver++': {
+        'scheduler_class': 'DPMSolverMultistepScheduler',
+        'options': {'algorithm_type': 'dpmsolver++', 'solver_order': 2},
+        'default_steps': 25
+    }
+}
+
+# Implementación de los schedulers: 'native' (services/samplers.py, sin diffusers)
+# o 'diffusers' (la de referencia, con los mismos resultados)
+SCHEDULER_IMPL = os.environ.get('SCHEDULER_IMPL', 'native')
+# Formato de los modelos: 'auto' (el primero que exista de: artefacto exportado,
+# .safetensors y .pth), 'exported' (solo artefactos TorchScript), 'safetensors'
+# (pesos mapeados en memoria) o 'checkpoint' (solo .pth)
+MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'auto')
+
+DEFAULT_SAMPLER = os.environ.get('DIFFUSION_SAMPLER', 'ddim')
+DEFAULT_STEPS = int(os.environ.get('DIFFUSION_STEPS', SAMPLERS.get(DEFAULT_SAMPLER, SAMPLERS['ddim'])['default_steps']))
+# Imágenes por petición y tamaño de lote de muestreo. BYTES_PER_IMAGE es la memoria
+# de activaciones estimada por imagen de 192x128 durante un paso del UNet.
+MAX_NUM_IMAGES = int(os.environ.get('DIFFUSION_MAX_NUM_IMAGES', 8))
+MAX_BATCH_SIZE = int(os.environ.get('DIFFUSION_MAX_BATCH_SIZE', 8))
+BYTES_PER_IMAGE = int(os.environ.get('DIFFUSION_BYTES_PER_IMAGE', 256 * 1024 * 1024))
+
+# Escala de las previews intermedias respecto a 192x128
+PREVIEW_SCALE = float(os.environ.get('PREVIEW_SCALE', 0.5))
+
+# Nunca más pasos que los timesteps de entrenamiento
+MAX_STEPS = min(int(os.environ.get('DIFFUSION_MAX_STEPS', 1000)), 1000)
+
+# Rango de semillas aceptadas (las de varias imágenes son seed, seed + 1, ...)
+MAX_SEED = 2**31 - 1
+
+# Directorio de los UNets exportados a TorchScript (uno por checkpoint)
+EXPORT_DIR = os.environ.get('EXPORT_DIR', os.path.normpath(os.path.join(os.path.dirname(__file__), '../models/exported')))
+
+def _strict_int(value):
+    """
+    Convierte un parámetro de petición a entero sin aceptar booleanos ni decimales.
+
+    Raises:
+        TypeError: Si es un booleano
+        ValueError: Si es un float no entero o un texto que no representa un entero
+    """
+    if isinstance(value, bool):
+        raise TypeError(f"Se esperaba un entero: {value}")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"Se esperaba un entero: {value}")
+    return int(value)
+
+def resolve_sampler_options(sampler=None, steps=None):
+    """
+    Valida el sampler y el número de pasos solicitados, aplicando los valores por defecto.
+
+    Args:
+        sampler (str): Nombre del sampler ('ddpm', 'ddim', 'dpmsolver++') o None
+        steps (int): Número de pasos de inferencia o None
+
+    Returns:
+        tuple: (sampler, steps) validados
+
+    Raises:
+        ValueError: Si el sampler no existe o el número de pasos no es válido
+    """
+    sampler = sampler or DEFAULT_SAMPLER
+    if sampler not in SAMPLERS:
+        raise ValueError(f"Sampler inválido: {sampler}. Opciones: {', '.join(SAMPLERS)}")
+    
+    if steps is None:
+        steps = DEFAULT_STEPS if sampler == DEFAULT_SAMPLER else SAMPLERS[sampler]['default_steps']
+    
+    try:
+        steps = _strict_int(steps)
+    except (TypeError, ValueError):
+        raise ValueError(f"Número de pasos inválido: {steps}")
+    
+    if steps < 1 or steps > MAX_STEPS:
+        raise ValueError(f"El número de pasos debe estar entre 1 y {MAX_STEPS}")
+    
+    return sampler, steps
+
+def validate_num_images(num_images):
+    """
+    Valida el número de imágenes solicitadas en una misma petición.
+
+    Raises:
+        ValueError: Si no es un entero entre 1 y MAX_NUM_IMAGES
+    """
+    try:
+        num_images = _strict_int(num_images)
+    except (TypeError, ValueError):
+        raise ValueError(f"Número de imágenes inválido: {num_images}")
+    
+    if num_images < 1 or num_images > MAX_NUM_IMAGES:
+        raise ValueError(f"El número de imágenes debe estar entre 1 y {MAX_NUM_IMAGES}")
+    
+    return num_images
+
+def validate_seed(seed, num_images=1):
+    """
+    Valida la semilla opcional de una petición.
+
+    Returns:
+        int: La semilla validada, o None si no se indicó
+
+    Raises:
+        ValueError: Si no es un entero entre 0 y MAX_SEED - num_images + 1
+    """
+    if seed is None or seed == '':
+        return None
+    
+    try:
+        seed = _strict_int(seed)
+    except (TypeError, ValueError):
+        raise ValueError(f"Semilla inválida: {seed}")
+    
+    if seed < 0 or seed + num_images - 1 > MAX_SEED:
+        raise ValueError(f"La semilla debe estar entre 0 y {MAX_SEED - num_images + 1}")
+    
+    return seed
+
+def validate_preview_every(preview_every):
+    """
+    Valida la cadencia (en pasos) de las previews de progreso de una petición.
+
+    Returns:
+        int: La cadencia validada (0 desactiva las previews)
+
+    Raises:
+        ValueError: Si no es un entero mayor o igual que 0
+    """
+    try:
+        preview_every = _strict_int(preview_every)
+    except (TypeError, ValueError):
+        raise ValueError(f"Cadencia de previews inválida: {preview_every}")
+    
+    if preview_every < 0:
+        raise ValueError(f"Cadencia de previews inválida: {preview_every}")
+    
+    return preview_every
+
+def request_seeds(seed, num_images):
+    """Semillas de las imágenes de una petición: seed, seed + 1, ... o None (aleatorias)."""
+    if seed is None:
+        return [None] * num_images
+    return [seed + i for i in range(num_images)]
+
+def get_exported_path(checkpoint_filename):
+    """Ruta del artefacto exportado de un checkpoint ('x.pth' -> 'exported/x.pt')."""
+    return os.path.join(EXPORT_DIR, os.path.splitext(checkpoint_filename)[0] + '.pt')
+
+def get_checkpoint_filename(model_type, skirt_type):
+    if model_type == 'design':
+        return DESIGN_MODELS[skirt_type]
+    return PATTERN_MODELS[skirt_type]
+
+def get_checkpoint_path(model_type, skirt_type):
+    return os.path.join(os.path.dirname(__file__), '../models', get_checkpoint_filename(model_type, skirt_type))
+
+def get_safetensors_path(model_type, skirt_type):
+    """Ruta del checkpoint convertido a safetensors ('x.pth' -> 'x.safetensors')."""
+    return os.path.splitext(get_checkpoint_path(model_type, skirt_type))[0] + '.safetensors'
+
+def get_model_path(model_type, skirt_type):
+    """Ruta del archivo que load_model cargará según MODEL_FORMAT."""
+    exported_path = get_exported_path(get_checkpoint_filename(model_type, skirt_type))
+    safetensors_path = get_safetensors_path(model_type, skirt_type)
+    if MODEL_FORMAT == 'exported' or (MODEL_FORMAT == 'auto' and os.path.exists(exported_path)):
+        return exported_path
+    if MODEL_FORMAT == 'safetensors' or (MODEL_FORMAT == 'auto' and os.path.exists(safetensors_path)):
+        return safetensors_path
+    return get_checkpoint_path(model_type, skirt_type)
+
+class GenerationCancelled(Exception):
+    """Se lanza desde un callback de progreso para abortar el muestreo."""
@@ -0,0 +1,134 @@
+import os
+import logging
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Optimizaciones de inferencia aplicadas al UNet al cargarlo, separadas por comas:
+# 'fp32' (eager sin cambios), 'channels_last', 'bf16', 'int8' y 'compile'.
+# Por ejemplo: INFERENCE_BACKEND=channels_last,bf16
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'fp32')
+
+BACKEND_OPTIONS = ('fp32', 'channels_last', 'bf16', 'int8', 'compile')
+
+# Bloques del UNet con capas de atención que se cuantizan con la opción 'int8'
+ATTENTION_BLOCKS = ('AttnDownBlock2D', 'AttnUpBlock2D')
+
+
+def parse_backend(backend=INFERENCE_BACKEND):
+    """
+    Valida una combinación de optimizaciones de inferencia.
+
+    Returns:
+        tuple: Opciones activas, sin 'fp32'
+
+    Raises:
+        ValueError: Si alguna opción no existe
+    """
+    options = [option.strip() for option in backend.replace('+', ',').split(',') if option.strip()]
+    for option in options:
+        if option not in BACKEND_OPTIONS:
+            raise ValueError(f"Backend de inferencia inválido: {option}. Opciones: {', '.join(BACKEND_OPTIONS)}")
+    return tuple(option for option in BACKEND_OPTIONS if option in options and option != 'fp32')
+
+
+def bf16_supported(device='cpu'):
+    """Indica si el dispositivo ejecuta bf16 con kernels nativos (AVX512-BF16/AMX en CPU)."""
+    if device == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    try:
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def quantize_attention(model):
+    """
+    Cuantiza dinámicamente a int8 las capas Linear de la atención (q, k, v y
+    proyección de salida) de los bloques AttnDownBlock2D y AttnUpBlock2D. Las
+    convoluciones y el resto del UNet siguen en fp32.
+    """
+    for block in list(model.down_blocks) + list(model.up_blocks):
+        if type(block).__name__ in ATTENTION_BLOCKS:
+            torch.ao.quantization.quantize_dynamic(block.attentions, {torch.nn.Linear},
+                                                    dtype=torch.qint8, inplace=True)
+    return model
+
+
+class OptimizedUNet(torch.nn.Module):
+    """
+    Envuelve un UNet2DModel con las optimizaciones de un backend de inferencia.
+
+    Mantiene la interfaz model(sample, timestep).sample y devuelve siempre la
+    salida en fp32, así que los schedulers y sample_images no cambian. Si la
+    compilación falla en la primera llamada (p. ej. sin compilador de C++), se
+    sigue en modo eager.
+    """
+
+    def __init__(self, model, options, device='cpu'):
+        super().__init__()
+        self.unet = model
+        self.nbytes = getattr(model, 'nbytes', None)
+        self.device_type = device
+        self.options = options
+        self.channels_last = 'channels_last' in options
+        self.bf16 = 'bf16' in options
+        self._compiled = None
+
+        if 'int8' in options:
+            if device != 'cpu':
+                logger.warning("Cuantización int8 dinámica solo disponible en CPU, se omite")
+            elif not hasattr(self.unet, 'down_blocks'):
+                logger.warning("Cuantización int8 no disponible para modelos exportados, se omite")
+            else:
+                quantize_attention(self.unet)
+        if self.channels_last:
+            self.unet.to(memory_format=torch.channels_last)
+        if self.bf16 and not bf16_supported(device):
+            logger.warning("bf16 no soportado por este procesador, se usa fp32")
+            self.bf16 = False
+        if 'compile' in options:
+            self._compiled = torch.compile(self._forward, dynamic=True)
+
+    @property
+    def config(self):
+        return self.unet.config
+
+    def _forward(self, sample, timestep):
+        if self.channels_last:
+            sample = sample.contiguous(memory_format=torch.channels_last)
+        if self.bf16:
+            with torch.autocast(device_type=self.device_type, dtype=torch.bfloat16):
+                output = self.unet(sample, timestep)
+            output.sample = output.sample.float()
+            return output
+        return self.unet(sample, timestep)
+
+    def forward(self, sample, timestep):
+        if self._compiled is not None:
+            try:
+                return self._compiled(sample, timestep)
+            except Exception as e:
+                logger.warning(f"torch.compile no disponible, se continúa en modo eager: {e}")
+                self._compiled = None
+        return self._forward(sample, timestep)
+
+
+def apply_backend(model, backend=INFERENCE_BACKEND, device='cpu'):
+    """
+    Aplica el backend de inferencia configurado a un UNet ya cargado.
+
+    Args:
+        model: UNet2DModel en modo eval, o None
+        backend (str): Combinación de opciones (ver INFERENCE_BACKEND)
+        device (str): 'cpu' o 'cuda'
+
+    Returns:
+        El modelo optimizado, el mismo modelo si el backend es 'fp32', o None
+    """
+    if model is None:
+        return None
+    options = parse_backend(backend)
+    if not options:
+        return model
+    return OptimizedUNet(model, options, device).eval()
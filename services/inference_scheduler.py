@@ -0,0 +1,307 @@
+import os
+import logging
+import math
+import time
+import threading
+from collections import OrderedDict, Counter
+
+from services.generation_config import resolve_sampler_options, request_seeds, GenerationCancelled, MAX_BATCH_SIZE
+from services.worker_pool import generation_runner, worker_pool, EXECUTION_MODE
+
+logger = logging.getLogger(__name__)
+
+# Ventana durante la que se agrupan peticiones iguales antes de lanzar el lote
+INFERENCE_BATCH_WINDOW_MS = float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', 50))
+# Imágenes máximas por lote combinado (como mucho MAX_BATCH_SIZE)
+INFERENCE_MAX_BATCH_IMAGES = int(os.environ.get('INFERENCE_MAX_BATCH_IMAGES', MAX_BATCH_SIZE))
+# Hilos que ejecutan lotes (cada uno procesa un lote a la vez). En modo process,
+# por defecto uno por proceso de trabajo para que todos generen a la vez
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', worker_pool.workers if EXECUTION_MODE == 'process' else 1))
+# Lotes de una misma clave que pueden ejecutarse a la vez. En modo thread todos
+# comparten el modelo y los núcleos, así que es mejor acumular las peticiones en
+# el siguiente lote; en modo process cada lote va a su propio proceso
+INFERENCE_BATCHES_PER_KEY = INFERENCE_WORKERS if EXECUTION_MODE == 'process' else 1
+
+
+class InferenceRequest:
+    """Petición pendiente de un cliente dentro del planificador."""
+
+    def __init__(self, key, num_images, progress_callback=None, cancel_event=None,
+                 preview_callback=None, preview_every=0, seed=None, return_arrays=False):
+        self.key = key
+        self.num_images = num_images
+        self.return_arrays = return_arrays
+        self.seeds = request_seeds(seed, num_images)
+        self.progress_callback = progress_callback
+        self.preview_callback = preview_callback
+        self.preview_every = preview_every if preview_callback is not None else 0
+        self.cancel_event = cancel_event or threading.Event()
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+
+class InferenceScheduler:
+    """
+    Planificador de inferencia con micro-lotes entre peticiones.
+
+    Las peticiones con la misma clave (model_type, skirt_type, sampler, steps,
+    persist) que llegan dentro de la ventana configurada se ejecutan como un único lote
+    de generate_image, y las imágenes resultantes se reparten entre los clientes
+    que esperaban. Sin runner explícito, el lote se ejecuta en el hilo del
+    planificador o en el pool de procesos según EXECUTION_MODE; en modo process
+    hay un hilo por proceso de trabajo y varios lotes de la misma clave pueden
+    ejecutarse a la vez, uno en cada proceso.
+    """
+
+    def __init__(self, window_ms=INFERENCE_BATCH_WINDOW_MS, max_batch_images=INFERENCE_MAX_BATCH_IMAGES,
+                 workers=INFERENCE_WORKERS, runner=None, batches_per_key=INFERENCE_BATCHES_PER_KEY):
+        self.window = window_ms / 1000.0
+        # Un lote combinado no supera MAX_BATCH_SIZE (una sola petición de hasta
+        # MAX_NUM_IMAGES sí puede, y el muestreo la divide en tramos)
+        self.max_batch_images = max(1, min(max_batch_images, MAX_BATCH_SIZE))
+        self.workers = max(1, workers)
+        self.runner = runner
+        self.batches_per_key = max(1, batches_per_key)
+        self._pending = OrderedDict()  # key -> [InferenceRequest]
+        self._busy_keys = Counter()  # key -> lotes en ejecución
+        self._cond = threading.Condition()
+        self._threads = []
+        # Métricas
+        self.in_flight = 0
+        self.batches = 0
+        self.requests = 0
+        self.batch_size_histogram = {}
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_foreground_at = 0.0
+
+    def submit(self, model_type, skirt_type, sampler=None, steps=None, num_images=1,
+               progress_callback=None, cancel_event=None, preview_callback=None, preview_every=0,
+               background=False, seed=None, persist=True, return_arrays=False):
+        """
+        Encola una petición de generación y espera a que su lote termine.
+
+        Args:
+            progress_callback (callable): progress_callback(step, total_steps) del lote
+            cancel_event (threading.Event): Si se activa, la petición se descarta; el lote
+                solo se aborta cuando todas sus peticiones están canceladas
+            preview_callback (callable): preview_callback(step, total_steps, previews) con
+                las previews de las imágenes de esta petición cada preview_every pasos
+            background (bool): Petición de fondo (p. ej. reposición de stock) que no
+                cuenta como actividad de usuarios para is_idle()
+            seed (int): Semilla de la primera imagen (las siguientes usan seed + 1, ...);
+                las peticiones con semilla también se combinan en lotes
+            persist (bool): Si es False, las imágenes no se escriben en el almacén de
+                artefactos (solo se combina con otras peticiones sin persistencia)
+            return_arrays (bool): Incluir en cada imagen la imagen decodificada ('array')
+
+        Returns:
+            dict: Igual que generate_image, con solo las imágenes de esta petición,
+                  o None si la generación falló
+
+        Raises:
+            GenerationCancelled: Si la petición se canceló antes de terminar
+        """
+        sampler, steps = resolve_sampler_options(sampler, steps)
+        request = InferenceRequest((model_type, skirt_type, sampler, steps, bool(persist)), num_images,
+                                   progress_callback, cancel_event, preview_callback, preview_every, seed,
+                                   return_arrays)
+
+        with self._cond:
+            self._start_workers_locked()
+            self._pending.setdefault(request.key, []).append(request)
+            self.requests += 1
+            if not background:
+                self.last_foreground_at = time.monotonic()
+            self._cond.notify_all()
+
+        while not request.done.wait(timeout=0.5):
+            if request.cancelled():
+                with self._cond:
+                    pending = self._pending.get(request.key, [])
+                    if request in pending:
+                        # Aún no había entrado en un lote: se retira de la cola directamente
+                        pending.remove(request)
+                        if not pending:
+                            del self._pending[request.key]
+                        raise GenerationCancelled()
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _start_workers_locked(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker_loop, name=f"inference-worker-{len(self._threads)}",
+                                      daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_batch_locked(self):
+        """
+        Elige la clave con la petición más antigua cuya ventana ya expiró (o cuyo
+        lote ya está lleno). Devuelve (key, requests) o (None, segundos a esperar).
+        """
+        now = time.monotonic()
+        wait = None
+        for key, requests in self._pending.items():
+            if self._busy_keys[key] >= self.batches_per_key:
+                continue
+            # Las peticiones canceladas mientras esperaban no entran en ningún lote
+            for request in [r for r in requests if r.cancelled()]:
+                requests.remove(request)
+                request.error = GenerationCancelled()
+                request.done.set()
+            if not requests:
+                continue
+            total_images = sum(r.num_images for r in requests)
+            remaining = requests[0].enqueued_at + self.window - now
+            if remaining <= 0 or total_images >= self.max_batch_images:
+                batch, images = [], 0
+                while requests and (not batch or images + requests[0].num_images <= self.max_batch_images):
+                    images += requests[0].num_images
+                    batch.append(requests.pop(0))
+                if not requests:
+                    del self._pending[key]
+                return key, batch
+            wait = remaining if wait is None else min(wait, remaining)
+        for key in [k for k, requests in self._pending.items() if not requests]:
+            del self._pending[key]
+        return None, wait
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    key, batch = self._next_batch_locked()
+                    if key is not None:
+                        break
+                    self._cond.wait(timeout=batch)
+                self._busy_keys[key] += 1
+                self.in_flight += len(batch)
+
+            try:
+                self._run_batch(key, batch)
+            finally:
+                with self._cond:
+                    self._busy_keys[key] -= 1
+                    if not self._busy_keys[key]:
+                        del self._busy_keys[key]
+                    self.in_flight -= len(batch)
+                    self._cond.notify_all()
+
+    def _run_batch(self, key, batch):
+        model_type, skirt_type, sampler, steps, persist = key
+        total_images = sum(r.num_images for r in batch)
+        started = time.monotonic()
+
+        with self._cond:
+            self.batches += 1
+            self.batch_size_histogram[total_images] = self.batch_size_histogram.get(total_images, 0) + 1
+            for request in batch:
+                waited = started - request.enqueued_at
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+        if len(batch) > 1:
+            logger.info(f"Lote combinado: {len(batch)} peticiones, {total_images} imágenes para {model_type} - {skirt_type}")
+
+        def progress(step, total_steps):
+            active = [r for r in batch if not r.cancelled()]
+            if not active:
+                raise GenerationCancelled()
+            for request in active:
+                if request.progress_callback is not None:
+                    request.progress_callback(step, total_steps)
+
+        # Las previews se calculan con la cadencia común (MCD) y cada petición recibe
+        # solo las de sus pasos y sus imágenes
+        preview_every = 0
+        for request in batch:
+            if request.preview_every:
+                preview_every = math.gcd(preview_every, request.preview_every)
+
+        def preview(step, total_steps, first_image, previews):
+            offset = 0
+            for request in batch:
+                start = max(offset, first_image) - first_image
+                end = min(offset + request.num_images, first_image + len(previews)) - first_image
+                offset += request.num_images
+                if (request.preview_every and step % request.preview_every == 0
+                        and start < end and not request.cancelled()):
+                    request.preview_callback(step, total_steps, previews[start:end])
+
+        try:
+            runner = self.runner or generation_runner()
+            result = runner(model_type, skirt_type, sampler, steps, total_images, progress_callback=progress,
+                            preview_callback=preview if preview_every else None, preview_every=preview_every,
+                            seeds=[seed for request in batch for seed in request.seeds], persist=persist,
+                            return_arrays=any(request.return_arrays for request in batch))
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        offset = 0
+        for request in batch:
+            if request.cancelled():
+                request.error = GenerationCancelled()
+            elif result:
+                images = result['images'][offset:offset + request.num_images]
+                if not request.return_arrays:
+                    images = [{name: value for name, value in image.items() if name != 'array'} for image in images]
+                request.result = {
+                    'image_path': images[0]['image_path'],
+                    'image_base64': images[0]['image_base64'],
+                    'images': images,
+                    'seed': images[0]['seed'],
+                    'sampler': result['sampler'],
+                    'steps': result['steps'],
+                    'batch_size': total_images
+                }
+            offset += request.num_images
+            request.done.set()
+
+    def is_idle(self, quiet_seconds=0.0):
+        """
+        Indica si no hay peticiones en cola ni en ejecución y no ha llegado ninguna
+        petición de usuario en los últimos quiet_seconds segundos.
+        """
+        with self._cond:
+            return (not self._pending and self.in_flight == 0
+                    and time.monotonic() - self.last_foreground_at >= quiet_seconds)
+
+    def queue_depth(self):
+        """Número de peticiones esperando a entrar en un lote."""
+        with self._cond:
+            return sum(len(requests) for requests in self._pending.values())
+
+    def stats(self):
+        """Devuelve profundidad de cola, histograma de tamaños de lote y tiempos de espera."""
+        with self._cond:
+            return {
+                'queue_depth': sum(len(requests) for requests in self._pending.values()),
+                'in_flight': self.in_flight,
+                'requests': self.requests,
+                'batches': self.batches,
+                'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_size_histogram.items())},
+                'wait_seconds': {
+                    'count': self.wait_count,
+                    'avg': self.wait_total / self.wait_count if self.wait_count else 0.0,
+                    'max': self.wait_max
+                },
+                'window_ms': self.window * 1000.0,
+                'workers': self.workers,
+                'max_batch_images': self.max_batch_images
+            }
+
+# Instancia global del planificador
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,371 @@
+import os
+import logging
+import json
+import time
+import uuid
+import queue
+import threading
+from collections import deque, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Backend de ejecución: 'inprocess' (cola en memoria con hilos) o 'local_queue'
+# (cola local que imita a un broker externo: mensajes serializados en JSON)
+JOB_BACKEND = os.environ.get('JOB_BACKEND', 'inprocess')
+# Hilos de trabajo que ejecutan trabajos en paralelo
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# Trabajos en espera admitidos antes de responder 429
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 16))
+# Segundos que se conservan los trabajos terminados para consultar su resultado
+JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))
+
+# Eventos pendientes por suscriptor antes de descartar los nuevos
+JOB_EVENT_QUEUE_SIZE = int(os.environ.get('JOB_EVENT_QUEUE_SIZE', 64))
+
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+
+
+class QueueFull(Exception):
+    """La cola de trabajos está llena."""
+
+
+class JobCancelled(Exception):
+    """El trabajo fue cancelado durante su ejecución."""
+
+
+class Job:
+    """Trabajo asíncrono con estado, progreso y resultado."""
+
+    def __init__(self, task, params):
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.params = params
+        self.state = 'queued'
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.status_code = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def set_progress(self, percent, message=None):
+        """Actualiza el porcentaje completado (0-100)."""
+        with self._lock:
+            self.progress = max(0.0, min(100.0, float(percent)))
+            if message is not None:
+                self.message = message
+        self.publish('progress', {'progress': round(self.progress, 1), 'message': self.message})
+
+    def subscribe(self):
+        """
+        Devuelve una cola que recibe los eventos (nombre, datos) del trabajo:
+        'progress', 'preview', 'state' y, al terminar, 'done'.
+        """
+        events = queue.Queue(maxsize=JOB_EVENT_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock:
+            if events in self._subscribers:
+                self._subscribers.remove(events)
+
+    def publish(self, event, data):
+        """Envía un evento a los suscriptores; los que no consumen a tiempo lo pierden."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for events in subscribers:
+            try:
+                events.put_nowait((event, data))
+            except queue.Full:
+                pass
+
+    def check_cancelled(self):
+        """Lanza JobCancelled si se pidió cancelar el trabajo."""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    @property
+    def finished(self):
+        return self.state in ('succeeded', 'failed', 'cancelled')
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'task': self.task,
+                'state': self.state,
+                'progress': round(self.progress, 1),
+                'message': self.message,
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at
+            }
+
+
+class InProcessBackend:
+    """Ejecuta los trabajos en hilos del propio proceso sobre una cola acotada."""
+
+    name = 'inprocess'
+
+    def __init__(self, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._threads = []
+
+    def start(self, execute, resolve):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, args=(execute,), name=f"job-worker-{i}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def enqueue(self, job):
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFull()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _worker_loop(self, execute):
+        while True:
+            job = self._queue.get()
+            try:
+                execute(job)
+            finally:
+                self._queue.task_done()
+
+
+class LocalBroker:
+    """
+    Cola local con la interfaz mínima de un broker (push/pop de mensajes de texto).
+
+    Sustituye a un broker externo para poder probar el backend de colas sin red.
+    """
+
+    def __init__(self, maxsize=JOB_QUEUE_SIZE):
+        self.maxsize = max(1, maxsize)
+        self._messages = deque()
+        self._cond = threading.Condition()
+
+    def push(self, message):
+        with self._cond:
+            if len(self._messages) >= self.maxsize:
+                return False
+            self._messages.append(message)
+            self._cond.notify()
+            return True
+
+    def pop(self, timeout=None):
+        with self._cond:
+            if not self._messages:
+                self._cond.wait(timeout=timeout)
+            if not self._messages:
+                return None
+            return self._messages.popleft()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._messages)
+
+
+class LocalQueueBackend:
+    """
+    Backend basado en mensajes: cada trabajo viaja por el broker como JSON con el
+    nombre de la tarea y sus parámetros, igual que lo haría con un broker externo.
+    """
+
+    name = 'local_queue'
+
+    def __init__(self, broker=None, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE):
+        self.broker = broker or LocalBroker(queue_size)
+        self.workers = max(1, workers)
+        self._threads = []
+
+    def start(self, execute, resolve):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, args=(execute, resolve),
+                                      name=f"job-consumer-{i}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def enqueue(self, job):
+        message = json.dumps({'job_id': job.id, 'task': job.task, 'params': job.params})
+        if not self.broker.push(message):
+            raise QueueFull()
+
+    def depth(self):
+        return len(self.broker)
+
+    def _worker_loop(self, execute, resolve):
+        while True:
+            message = self.broker.pop(timeout=1.0)
+            if message is None:
+                continue
+            payload = json.loads(message)
+            job = resolve(payload['job_id'])
+            if job is None:
+                logger.warning(f"Trabajo desconocido en la cola: {payload['job_id']}")
+                continue
+            job.params = payload['params']
+            execute(job)
+
+
+class JobManager:
+    """
+    Gestiona trabajos asíncronos: registro de tareas, envío, consulta y cancelación.
+
+    Las tareas se registran por nombre con register_task(name, func). func recibe
+    (params, job) y devuelve (payload, status_code); un status_code >= 400 marca el
+    trabajo como fallido.
+    """
+
+    def __init__(self, backend=None, result_ttl=JOB_RESULT_TTL):
+        self.backend = backend or create_backend(JOB_BACKEND)
+        self.result_ttl = result_ttl
+        self._tasks = {}
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._started = False
+        self.rejected = 0
+
+    def register_task(self, name, func):
+        self._tasks[name] = func
+
+    def run_task(self, task, params):
+        """Ejecuta una tarea de forma síncrona en el hilo actual, sin crear trabajo."""
+        return self._tasks[task](params, None)
+
+    def submit(self, task, params):
+        """
+        Crea y encola un trabajo.
+
+        Returns:
+            Job: El trabajo en estado 'queued'
+
+        Raises:
+            QueueFull: Si la cola del backend está llena
+        """
+        if task not in self._tasks:
+            raise ValueError(f"Tarea desconocida: {task}")
+
+        job = Job(task, params)
+        with self._lock:
+            if not self._started:
+                self.backend.start(self._execute, self.get)
+                self._started = True
+            self._expire_locked()
+            self._jobs[job.id] = job
+
+        try:
+            self.backend.enqueue(job)
+        except QueueFull:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self.rejected += 1
+            raise
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Pide cancelar un trabajo. Los trabajos en cola se cancelan inmediatamente;
+        los que están en ejecución se detienen en el siguiente punto de control.
+
+        Returns:
+            Job o None si no existe
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        with job._lock:
+            cancelled_in_queue = job.state == 'queued'
+            if cancelled_in_queue:
+                job.state = 'cancelled'
+                job.finished_at = time.time()
+        if cancelled_in_queue:
+            job.publish('done', job.to_dict())
+        return job
+
+    def _execute(self, job):
+        with job._lock:
+            if job.state != 'queued':
+                return
+            job.state = 'running'
+            job.started_at = time.time()
+        job.publish('state', {'state': 'running'})
+
+        try:
+            payload, status_code = self._tasks[job.task](job.params, job)
+            state = 'succeeded' if status_code < 400 and payload.get('success', True) else 'failed'
+            error = None if state == 'succeeded' else payload.get('error')
+        except JobCancelled:
+            payload, status_code, state, error = None, 499, 'cancelled', None
+        except Exception as e:
+            logger.error(f"Error en trabajo {job.id} ({job.task}): {e}")
+            payload, status_code, state, error = None, 500, 'failed', str(e)
+
+        if job.cancel_event.is_set() and state != 'succeeded':
+            state = 'cancelled'
+
+        with job._lock:
+            job.result = payload
+            job.status_code = status_code
+            job.error = error
+            job.state = state
+            if state == 'succeeded':
+                job.progress = 100.0
+            job.finished_at = time.time()
+        job.publish('done', dict(job.to_dict(), result=payload))
+
+    def _expire_locked(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values()
+                       if j.finished and j.finished_at and now - j.finished_at > self.result_ttl]:
+            del self._jobs[job_id]
+
+    def active_job_ids(self):
+        """Identificadores de los trabajos en cola o en ejecución."""
+        with self._lock:
+            return [job.id for job in self._jobs.values() if not job.finished]
+
+    def referenced_filenames(self):
+        """Archivos de entrada (params['filename']) de los trabajos en cola o en ejecución."""
+        with self._lock:
+            return [job.params['filename'] for job in self._jobs.values()
+                    if not job.finished and job.params.get('filename')]
+
+    def stats(self):
+        with self._lock:
+            states = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                states[job.state] += 1
+            return {
+                'backend': self.backend.name,
+                'queue_depth': self.backend.depth(),
+                'states': states,
+                'rejected': self.rejected
+            }
+
+
+def create_backend(name):
+    if name == 'inprocess':
+        return InProcessBackend()
+    if name == 'local_queue':
+        return LocalQueueBackend()
+    raise ValueError(f"Backend de trabajos desconocido: {name}")
+
+# Instancia global del gestor de trabajos
+job_manager = JobManager()
@@ -0,0 +1,149 @@
+import os
+import logging
+import time
+import threading
+
+from services.generation_config import DESIGN_MODELS, PATTERN_MODELS, get_model_path
+from services.model_registry import model_registry
+from services.worker_pool import EXECUTION_MODE, worker_pool
+
+logger = logging.getLogger(__name__)
+
+# Modelos que se precargan al arrancar: "pattern:patrones_varios_disenos,design:recta",
+# 'all' (todos los que tienen archivo en models/) o vacío (ninguno)
+WARMUP_MODELS = os.environ.get('WARMUP_MODELS', '')
+
+
+def parse_warmup_models(text=WARMUP_MODELS):
+    """
+    Lista de modelos a precargar.
+
+    Returns:
+        list: [(model_type, skirt_type), ...]
+    """
+    text = text.strip()
+    if text == 'all':
+        return [(model_type, skirt_type)
+                for model_type, models in (('design', DESIGN_MODELS), ('pattern', PATTERN_MODELS))
+                for skirt_type in models
+                if os.path.exists(get_model_path(model_type, skirt_type))]
+
+    models = []
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        model_type, skirt_type = item.strip().split(':')
+        if skirt_type not in (DESIGN_MODELS if model_type == 'design' else PATTERN_MODELS):
+            raise ValueError(f"Modelo de precarga desconocido: {item}")
+        models.append((model_type, skirt_type))
+    return models
+
+
+def warm_up(models):
+    """
+    Importa las dependencias de inferencia, carga los modelos en el registro y
+    ejecuta con cada uno una pasada hacia delante de una imagen para inicializar
+    los kernels (y compilar, si el backend usa torch.compile).
+
+    Se ejecuta en el proceso que hará la inferencia: el proceso web en modo
+    'thread' o cada proceso de trabajo en modo 'process'.
+
+    Returns:
+        dict: {'pid', 'models': modelos listos, 'failed': modelos que no cargaron, 'seconds'}
+    """
+    started = time.monotonic()
+    import torch
+    from services.diffusion_service import load_model, device
+
+    ready, failed = [], []
+    for model_type, skirt_type in models:
+        model, _ = load_model(model_type, skirt_type)
+        if model is None:
+            failed.append(f"{model_type}:{skirt_type}")
+            continue
+        with torch.no_grad():
+            model(torch.zeros(1, 3, 192, 128, device=device), torch.full((1,), 999, device=device, dtype=torch.long))
+        ready.append(f"{model_type}:{skirt_type}")
+
+    return {'pid': os.getpid(), 'models': ready, 'failed': failed, 'seconds': time.monotonic() - started}
+
+
+class Lifecycle:
+    """
+    Ciclo de arranque de la instancia: 'starting' -> 'warming' -> 'ready' o 'failed'.
+
+    La aplicación responde desde el primer momento (liveness); la preparación
+    (readiness) solo se anuncia cuando el calentamiento termina sin errores y
+    con todos los modelos cargados, para que el balanceador no envíe inferencia
+    a una instancia fría o rota ('failed'). En modo 'process' cada proceso de
+    trabajo ejecuta su propio calentamiento (worker_pool.call_each).
+    """
+
+    def __init__(self, models=None):
+        self.models = parse_warmup_models() if models is None else models
+        self.state = 'starting'
+        self.started_at = time.time()
+        self.ready_at = None
+        self.workers = []
+        self.error = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Lanza el calentamiento en segundo plano."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = 'warming'
+            self._thread = threading.Thread(target=self._run, name='warm-up', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            if EXECUTION_MODE == 'process':
+                workers = worker_pool.call_each('services.lifecycle:warm_up', self.models)
+            else:
+                workers = [warm_up(self.models)]
+            error = None
+        except Exception as e:
+            workers, error = [], str(e) or repr(e)
+
+        failed = sorted({name for worker in workers for name in worker['failed']})
+        with self._lock:
+            self.workers = workers
+            self.error = error
+            self.state = 'failed' if error or failed else 'ready'
+            self.ready_at = time.time()
+        if error:
+            logger.error(f"Error durante el calentamiento: {error}")
+        elif failed:
+            logger.error(f"Calentamiento incompleto, modelos sin cargar: {', '.join(failed)}")
+        else:
+            logger.info(f"Instancia lista en {self.ready_at - self.started_at:.1f} s")
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def resident_models(self):
+        """Modelos residentes: los del registro local, o los calentados en cada proceso de trabajo."""
+        if EXECUTION_MODE == 'process':
+            with self._lock:
+                return sorted({name for worker in self.workers for name in worker['models']})
+        return [f"{model_type}:{skirt_type}" for model_type, skirt_type in model_registry.resident_keys()]
+
+    def status(self):
+        with self._lock:
+            status = {
+                'state': self.state,
+                'ready': self.state == 'ready',
+                'warmup_models': [f"{model_type}:{skirt_type}" for model_type, skirt_type in self.models],
+                'failed_models': sorted({name for worker in self.workers for name in worker['failed']}),
+                'startup_seconds': (self.ready_at - self.started_at) if self.ready_at else None,
+                'error': self.error
+            }
+        status['resident_models'] = self.resident_models()
+        return status
+
+# Instancia global del ciclo de vida
+lifecycle = Lifecycle()
@@ -0,0 +1,311 @@
+"""
+Métricas en formato Prometheus y logging estructurado.
+
+Las etapas del servicio (carga del modelo, muestreo, tallas, vectorización,
+renderizado y codificación) se miden con metrics.timer() o @metrics.timed()
+en un histograma por etapa; además se publican los percentiles p50, p90 y p99
+de las últimas METRICS_WINDOW observaciones de cada etapa. Los contadores
+(peticiones, errores, aciertos de caché) y los indicadores (colas, modelos
+residentes, memoria) se exponen en /metrics.
+
+Las observaciones hechas en procesos hijos (EXECUTION_MODE=process y
+PATTERN_WORKERS) viajan de vuelta con el resultado de cada tarea
+(call_forwarding / merge_result), así que /metrics refleja todo el trabajo.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import functools
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Prefijo de todas las métricas
+METRICS_PREFIX = 'patrones'
+# Observaciones recientes por etapa con las que se calculan los percentiles
+METRICS_WINDOW = int(os.environ.get('METRICS_WINDOW', 1024))
+# Formato de los logs: 'json' (una línea JSON por registro) o 'text'
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+# Nivel mínimo de los registros (DEBUG, INFO, WARNING, ERROR)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+# Límites (segundos) de los histogramas: de operaciones de milisegundos a muestreos de minutos
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Tipo y descripción de cada métrica
+METRICS = {
+    'stage_seconds': ('histogram', 'Duración de cada etapa del servicio'),
+    'http_request_seconds': ('histogram', 'Duración de las peticiones HTTP por ruta'),
+    'http_requests_total': ('counter', 'Peticiones HTTP por ruta, método y código'),
+    'errors_total': ('counter', 'Errores registrados en los logs por módulo'),
+    'cache_requests_total': ('counter', 'Consultas a las cachés (result, model, stock) por resultado'),
+    'images_generated_total': ('counter', 'Imágenes muestreadas con el UNet por modelo'),
+    'inference_queue_depth': ('gauge', 'Peticiones esperando en el planificador de inferencia'),
+    'inference_in_flight': ('gauge', 'Lotes de inferencia en ejecución'),
+    'job_queue_depth': ('gauge', 'Trabajos asíncronos en cola'),
+    'worker_pool_in_flight': ('gauge', 'Tareas en ejecución en el pool de procesos'),
+    'artifact_writes_pending': ('gauge', 'Artefactos pendientes de escribir en disco'),
+    'resident_models': ('gauge', 'Modelos cargados en memoria'),
+    'process_resident_memory_bytes': ('gauge', 'Memoria residente (RSS) del proceso web y de sus procesos hijos'),
+    'storage_bytes': ('gauge', 'Bytes de artefactos en disco por directorio (último barrido)'),
+    'storage_files': ('gauge', 'Archivos de artefactos en disco por directorio (último barrido)')
+}
+
+
+def _labels_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in items) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metrics:
+    """
+    Registro de métricas del proceso.
+
+    Los contadores y los histogramas se actualizan con inc() y observe(); los
+    indicadores se calculan al generar /metrics con las funciones registradas
+    con add_collector(), que leen el estado de cada servicio.
+    """
+
+    def __init__(self, window=METRICS_WINDOW, buckets=LATENCY_BUCKETS):
+        self.window = window
+        self.buckets = tuple(buckets)
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._collectors = []
+        self._forward = None
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Suma value al contador name."""
+        self._record('inc', name, _labels_key(labels), value)
+
+    def observe(self, name, seconds, **labels):
+        """Añade una observación al histograma name."""
+        self._record('observe', name, _labels_key(labels), seconds)
+
+    def _record(self, kind, name, key, value):
+        with self._lock:
+            if kind == 'inc':
+                self._counters[(name, key)] += value
+            else:
+                histogram = self._histograms.get((name, key))
+                if histogram is None:
+                    histogram = self._histograms[(name, key)] = {
+                        'counts': [0] * len(self.buckets),
+                        'sum': 0.0,
+                        'count': 0,
+                        'recent': deque(maxlen=self.window)
+                    }
+                for i, bound in enumerate(self.buckets):
+                    if value <= bound:
+                        histogram['counts'][i] += 1
+                histogram['sum'] += value
+                histogram['count'] += 1
+                histogram['recent'].append(value)
+            if self._forward is not None:
+                self._forward.append((kind, name, key, value))
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """Mide la duración del bloque como una observación de la etapa stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    def timed(self, stage):
+        """Decorador: mide cada llamada a la función como una observación de la etapa stage."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_collector(self, collector):
+        """Registra una función que devuelve indicadores [(nombre, etiquetas, valor), ...]."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def start_forwarding(self):
+        """En un proceso hijo: guarda las observaciones para devolverlas con drain()."""
+        with self._lock:
+            if self._forward is None:
+                self._forward = []
+
+    def drain(self):
+        """Observaciones guardadas desde la última llamada (vacío si no se reenvían)."""
+        with self._lock:
+            events, self._forward = self._forward or [], ([] if self._forward is not None else None)
+        return events
+
+    def merge(self, events):
+        """Aplica las observaciones de un proceso hijo."""
+        for kind, name, key, value in events:
+            self._record(kind, name, key, value)
+
+    def quantiles(self, name='stage_seconds'):
+        """Percentiles QUANTILES de las observaciones recientes de cada serie de un histograma."""
+        with self._lock:
+            series = {key: sorted(histogram['recent']) for (metric, key), histogram in self._histograms.items()
+                      if metric == name and histogram['recent']}
+        return {key: {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+                for key, values in series.items()}
+
+    def snapshot(self):
+        """Valores actuales en forma de diccionario (para /api/stats y los benchmarks)."""
+        with self._lock:
+            stages = {dict(key).get('stage'): {'count': histogram['count'], 'sum': histogram['sum']}
+                      for (name, key), histogram in self._histograms.items() if name == 'stage_seconds'}
+        for key, quantiles in self.quantiles().items():
+            stage = dict(key).get('stage')
+            if stage in stages:
+                stages[stage].update({f"p{int(q * 100)}": value for q, value in quantiles.items()})
+        return {'stages': stages}
+
+    def render(self):
+        """Todas las métricas en el formato de texto de Prometheus."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {'counts': list(h['counts']), 'sum': h['sum'], 'count': h['count']}
+                          for key, h in self._histograms.items()}
+            collectors = list(self._collectors)
+
+        gauges = defaultdict(list)
+        for collector in collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges[name].append((_labels_key(labels), value))
+            except Exception as e:
+                logger.warning(f"Error calculando métricas: {e}")
+        quantiles = self.quantiles()
+
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            full_name = f"{METRICS_PREFIX}_{name}"
+            if kind == 'counter':
+                samples = [(key, value) for (metric, key), value in counters.items() if metric == name]
+            elif kind == 'gauge':
+                samples = gauges.get(name, [])
+            else:
+                samples = [(key, h) for (metric, key), h in histograms.items() if metric == name]
+            if not samples:
+                continue
+
+            lines.append(f"# HELP {full_name} {description}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for key, value in sorted(samples, key=lambda sample: sample[0]):
+                if kind != 'histogram':
+                    lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+                    continue
+                for bound, count in zip(self.buckets, value['counts']):
+                    lines.append(f"{full_name}_bucket{_format_labels(key, [('le', _format_value(float(bound)))])} {count}")
+                lines.append(f"{full_name}_bucket{_format_labels(key, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{full_name}_sum{_format_labels(key)} {_format_value(value['sum'])}")
+                lines.append(f"{full_name}_count{_format_labels(key)} {value['count']}")
+
+            if kind == 'histogram':
+                quantile_name = f"{full_name}_quantile"
+                series = [(key, values) for key, values in quantiles.items() if (name, key) in histograms]
+                if series:
+                    lines.append(f"# HELP {quantile_name} Percentiles de las últimas {self.window} observaciones")
+                    lines.append(f"# TYPE {quantile_name} gauge")
+                    for key, values in sorted(series):
+                        for q, value in values.items():
+                            lines.append(f"{quantile_name}{_format_labels(key, [('quantile', q)])} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def call_forwarding(function, *args, **kwargs):
+    """
+    Ejecuta function en un proceso hijo y devuelve (resultado, observaciones)
+    para que el proceso padre las aplique con merge_result.
+    """
+    metrics.start_forwarding()
+    metrics.drain()
+    result = function(*args, **kwargs)
+    return result, metrics.drain()
+
+
+def merge_result(forwarded):
+    """Aplica las observaciones de call_forwarding y devuelve el resultado."""
+    result, events = forwarded
+    metrics.merge(events)
+    return result
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos pasados en extra={...}."""
+
+    RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'message': record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in self.RESERVED})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ErrorCounter(logging.Handler):
+    """Cuenta los errores registrados (errors_total) por módulo."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record):
+        metrics.inc('errors_total', logger=record.name)
+
+
+_logging_configured = False
+
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """Configura el logging del proceso (una vez): formato JSON o texto en stderr y contador de errores."""
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+
+    handler = logging.StreamHandler(sys.stderr)
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.addHandler(ErrorCounter())
+    root.setLevel(level.upper())
+
+
+logger = logging.getLogger(__name__)
+
+# Instancia global del registro de métricas
+metrics = Metrics()
@@ -0,0 +1,70 @@
+import os
+import torch
+
+
+class UNetOutput:
+    """Salida con el mismo atributo .sample que UNet2DOutput de diffusers."""
+
+    def __init__(self, sample):
+        self.sample = sample
+
+
+class TraceableUNet(torch.nn.Module):
+    """Adapta UNet2DModel para el trazado: devuelve el tensor en lugar de UNet2DOutput."""
+
+    def __init__(self, unet):
+        super().__init__()
+        self.unet = unet
+
+    def forward(self, sample, timestep):
+        return self.unet(sample, timestep, return_dict=False)[0]
+
+
+class ExportedUNet(torch.nn.Module):
+    """
+    UNet cargado desde un artefacto TorchScript, con la interfaz
+    model(sample, timestep).sample que espera sample_images.
+    """
+
+    def __init__(self, module):
+        super().__init__()
+        self.module = module
+
+    def forward(self, sample, timestep):
+        return UNetOutput(self.module(sample, timestep))
+
+
+def export_model(model, output_path, device='cpu', batch_size=2):
+    """
+    Traza un UNet2DModel con TorchScript, lo congela y lo guarda.
+
+    El trazado se hace con un lote de batch_size imágenes de 192x128; el tamaño
+    de lote queda dinámico en el grafo, así que el artefacto sirve para
+    cualquier lote.
+
+    Returns:
+        torch.jit.ScriptModule: El módulo exportado
+    """
+    model.eval()
+    sample = torch.randn(batch_size, 3, 192, 128, device=device)
+    timestep = torch.full((batch_size,), 999, device=device, dtype=torch.long)
+
+    with torch.no_grad():
+        traced = torch.jit.trace(TraceableUNet(model).eval(), (sample, timestep), check_trace=False)
+        traced = torch.jit.freeze(traced)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    torch.jit.save(traced, tmp_path)
+    os.replace(tmp_path, output_path)
+    return traced
+
+
+def load_exported(path, device='cpu'):
+    """Carga un artefacto exportado con export_model."""
+    module = torch.jit.load(path, map_location=device)
+    module.eval()
+    exported = ExportedUNet(module).eval()
+    # Los pesos congelados no aparecen en parameters(): el registro usa el tamaño del archivo
+    exported.nbytes = os.path.getsize(path)
+    return exported
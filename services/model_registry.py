@@ -0,0 +1,153 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Presupuesto de memoria para modelos residentes (por defecto 1 GB, ~6 UNets)
+MODEL_CACHE_MAX_BYTES = int(os.environ.get('MODEL_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+# Número máximo de modelos residentes (16 = todos los DESIGN_MODELS + PATTERN_MODELS)
+MODEL_CACHE_MAX_ENTRIES = int(os.environ.get('MODEL_CACHE_MAX_ENTRIES', 16))
+
+
+def model_nbytes(model):
+    """
+    Calcula la memoria ocupada por los parámetros y buffers de un modelo.
+
+    Args:
+        model: Módulo de PyTorch
+
+    Returns:
+        int: Tamaño en bytes
+    """
+    # Los módulos congelados (TorchScript) guardan los pesos como constantes y
+    # declaran su tamaño en nbytes
+    if getattr(model, 'nbytes', None):
+        return model.nbytes
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    Registro de modelos residentes en memoria con expulsión LRU.
+
+    Cada entrada se identifica por (model_type, skirt_type). La carga es
+    thread-safe: si varias peticiones piden a la vez un modelo que aún no
+    está en memoria, solo una lo carga y las demás esperan el resultado.
+    """
+
+    def __init__(self, max_bytes=MODEL_CACHE_MAX_BYTES, max_entries=MODEL_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._models = OrderedDict()  # key -> (model, nbytes)
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> threading.Lock de carga
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_errors = 0
+
+    def get(self, key, loader):
+        """
+        Devuelve el modelo asociado a key, cargándolo con loader() si no está residente.
+
+        Args:
+            key (tuple): (model_type, skirt_type)
+            loader (callable): Función sin argumentos que devuelve el modelo o None
+
+        Returns:
+            El modelo cargado, o None si loader() falló
+        """
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                metrics.inc('cache_requests_total', cache='model', result='hit')
+                return entry[0]
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # Solo un hilo carga cada modelo; el resto espera en el mismo lock
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc('cache_requests_total', cache='model', result='hit')
+                    return entry[0]
+                self.misses += 1
+            metrics.inc('cache_requests_total', cache='model', result='miss')
+
+            model = loader()
+
+            with self._lock:
+                self._loading.pop(key, None)
+                if model is None:
+                    self.load_errors += 1
+                    return None
+                nbytes = model_nbytes(model)
+                self._models[key] = (model, nbytes)
+                self._bytes += nbytes
+                self._evict_locked(keep=key)
+            return model
+
+    def _evict_locked(self, keep=None):
+        """Expulsa los modelos menos usados hasta respetar el presupuesto."""
+        while self._models and (self._bytes > self.max_bytes or len(self._models) > self.max_entries):
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                # Un único modelo más grande que el presupuesto se mantiene igualmente
+                if len(self._models) == 1:
+                    break
+                self._models.move_to_end(oldest)
+                continue
+            _, nbytes = self._models.pop(oldest)
+            self._bytes -= nbytes
+            self.evictions += 1
+            logger.warning(f"Modelo expulsado de memoria: {oldest}")
+
+    def evict(self, key):
+        """Elimina un modelo concreto del registro. Devuelve True si estaba residente."""
+        with self._lock:
+            entry = self._models.pop(key, None)
+            if entry is None:
+                return False
+            self._bytes -= entry[1]
+            self.evictions += 1
+            return True
+
+    def clear(self):
+        """Vacía el registro sin contar expulsiones."""
+        with self._lock:
+            self._models.clear()
+            self._bytes = 0
+
+    def resident_keys(self):
+        """Devuelve las claves residentes, de la menos a la más usada recientemente."""
+        with self._lock:
+            return list(self._models.keys())
+
+    def stats(self):
+        """Devuelve contadores de aciertos, fallos y expulsiones del registro."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'load_errors': self.load_errors,
+                'resident': [f"{model_type}:{skirt_type}" for model_type, skirt_type in self._models],
+                'resident_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries
+            }
+
+# Instancia global del registro
+model_registry = ModelRegistry()
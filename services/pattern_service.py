@@ -1,33 +1,78 @@
 import os
+import logging
 import cv2
 import numpy as np
 from skimage import measure
 import svgwrite
 from scipy.interpolate import splprep, splev
 import cairosvg
+import cairocffi
 import base64
 from PIL import Image
 import io
-import glob
 import re
+import math
+import uuid
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from services.artifact_index import artifact_index
+from services.artifact_store import artifact_store, atomic_path, atomic_write
+from services.metrics import metrics, configure_logging, call_forwarding, merge_result
+from services.size_config import SIZE_TABLE
+from services.print_config import PAGE_SIZES, PRINT_MARGIN_MM, DEFAULT_OVERLAP_MM, DEFAULT_SCALE
+
+logger = logging.getLogger(__name__)
+
+# Procesos que exportan tallas en paralelo (0: exportación secuencial en el proceso actual).
+# No se usa dentro de los procesos de trabajo de EXECUTION_MODE=process, que ya reparten el trabajo
+PATTERN_WORKERS = int(os.environ.get('PATTERN_WORKERS', 0))
+# Desviación máxima (mm del patrón) al simplificar los contornos (0: sin simplificar)
+CONTOUR_TOLERANCE_MM = float(os.environ.get('CONTOUR_TOLERANCE_MM', 0.5))
+# Renderizado de PDF y previews: 'cairo' (directo desde la geometría en memoria)
+# o 'cairosvg' (a partir del SVG, como en la versión original)
+PATTERN_RENDERER = os.environ.get('PATTERN_RENDERER', 'cairo')
+
+# Puntos PDF por milímetro
+PT_PER_MM = 72 / 25.4
+# Tamaño de las previews PNG (píxeles)
+PREVIEW_WIDTH = 300
+PREVIEW_HEIGHT = 400
+# Color 'gray' de SVG para las reglas
+RULER_RGB = (128 / 255, 128 / 255, 128 / 255)
+# Marcas de registro de la exportación por páginas (mm)
+REGISTRATION_MARK_RADIUS_MM = 3
 
 class PatternService:
     def __init__(self):
         self.dpi = 96
         self.pixel_to_mm = 25.4 / self.dpi  # 0.26458 mm per pixel
-        self.scale_factor = 20  # Escala para patrones funcionales
+        self.scale_factor = DEFAULT_SCALE  # Escala para patrones funcionales
+        self.contour_tolerance_mm = CONTOUR_TOLERANCE_MM
+        self.renderer = PATTERN_RENDERER
+        self.workers = PATTERN_WORKERS
+        self._executor = None
+        self._lock = threading.Lock()
         
-    def draw_ruler(self, dwg, max_length_mm, scale_factor, axis='x', interval=10, size=5):
-        """Draw ruler ticks and labels along the X or Y axis, adjusted for scaling."""
+    def ruler_marks(self, max_length_mm, scale_factor, axis='x', interval=10, size=5):
+        """Marcas de la regla a lo largo del eje X o Y: (inicio, fin, etiqueta, posición de la etiqueta)."""
+        marks = []
         for i in range(0, int(max_length_mm / scale_factor) + 1, interval):
             if axis == 'x':
                 x = i * scale_factor
-                dwg.add(dwg.line(start=(x, 0), end=(x, size), stroke='gray', stroke_width=0.3))
-                dwg.add(dwg.text(str(i), insert=(x + 1, size + 3), font_size="2px", fill='gray'))
+                marks.append(((x, 0), (x, size), str(i), (x + 1, size + 3)))
             elif axis == 'y':
                 y = i * scale_factor
-                dwg.add(dwg.line(start=(0, y), end=(size, y), stroke='gray', stroke_width=0.3))
-                dwg.add(dwg.text(str(i), insert=(size + 1, y + 1.5), font_size="2px", fill='gray'))
+                marks.append(((0, y), (size, y), str(i), (size + 1, y + 1.5)))
+        return marks
+
+    def draw_ruler(self, dwg, max_length_mm, scale_factor, axis='x', interval=10, size=5):
+        """Draw ruler ticks and labels along the X or Y axis, adjusted for scaling."""
+        for start, end, label, insert in self.ruler_marks(max_length_mm, scale_factor, axis, interval, size):
+            dwg.add(dwg.line(start=start, end=end, stroke='gray', stroke_width=0.3))
+            dwg.add(dwg.text(label, insert=insert, font_size="2px", fill='gray'))
 
     def smooth_contour(self, contour, smooth_factor=0.1):
         """Suaviza un contorno usando splines."""
@@ -37,11 +82,10 @@ class PatternService:
 
         x, y = contour[:, 1], contour[:, 0]
 
-        # Eliminar puntos duplicados
+        # Eliminar puntos duplicados (mismo criterio que np.allclose con el punto anterior)
         mask = np.ones(len(x), dtype=bool)
-        for i in range(1, len(x)):
-            if np.allclose([x[i], y[i]], [x[i-1], y[i-1]], atol=1e-6):
-                mask[i] = False
+        mask[1:] = ~((np.abs(np.diff(x)) <= 1e-6 + 1e-5 * np.abs(x[:-1]))
+                     & (np.abs(np.diff(y)) <= 1e-6 + 1e-5 * np.abs(y[:-1])))
         x, y = x[mask], y[mask]
 
         # Cerrar el contorno
@@ -57,148 +101,674 @@ class PatternService:
             x_smooth, y_smooth = splev(u_fine, tck)
             return np.column_stack((y_smooth, x_smooth))
         except ValueError as e:
-            print(f"Error smoothing contour: {e}. Returning original contour.")
+            logger.warning(f"Error smoothing contour: {e}. Returning original contour.")
             return contour
 
-    def png_to_svg(self, image_path, output_path):
+    def simplify_contour(self, points, tolerance_mm=None):
+        """
+        Simplifica un contorno cerrado con Douglas-Peucker (cv2.approxPolyDP).
+
+        Args:
+            points (np.array): Puntos (x, y) en milímetros del patrón
+            tolerance_mm (float): Distancia máxima en mm entre el contorno simplificado
+                y el original (por defecto CONTOUR_TOLERANCE_MM; 0 no simplifica)
+
+        Returns:
+            np.array: Subconjunto de los puntos que respeta la tolerancia
+        """
+        tolerance_mm = self.contour_tolerance_mm if tolerance_mm is None else tolerance_mm
+        if tolerance_mm <= 0 or len(points) < 4:
+            return points
+        simplified = cv2.approxPolyDP(points.astype(np.float32).reshape(-1, 1, 2), tolerance_mm, True)
+        return simplified.reshape(-1, 2).astype(np.float64)
+
+    def contour_path_data(self, points):
+        """
+        Serializa un contorno cerrado como datos de path SVG ("M x,y L x,y ... Z").
+
+        Todas las coordenadas se formatean en una sola operación en lugar de una
+        f-string por punto.
+        """
+        return "M " + " L ".join(["%.2f,%.2f"] * len(points)) % tuple(points.ravel()) + " Z"
+
+    def png_to_svg(self, image_path, output_path, scale_factor=None):
         """Convierte una imagen PNG a SVG con contornos suavizados."""
         try:
             img = cv2.imread(image_path)
             if img is None:
                 raise ValueError(f"No se pudo cargar la imagen: {image_path}")
-                
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (5, 5), 0)
-            
-            _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
             
-            kernel = np.ones((3, 3), np.uint8)
-            binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=2)
-            
-            contours = measure.find_contours(binary, level=0.8)
-            
-            height, width = binary.shape
-            width_mm = width * self.pixel_to_mm
-            height_mm = height * self.pixel_to_mm
-            
-            scaled_width_mm = width_mm * self.scale_factor
-            scaled_height_mm = height_mm * self.scale_factor
-            
-            dwg = svgwrite.Drawing(output_path, 
-                                 size=(f"{scaled_width_mm}mm", f"{scaled_height_mm}mm"),
-                                 viewBox=f"0 0 {scaled_width_mm} {scaled_height_mm}")
-            
-            # Agregar reglas
-            dwg.add(dwg.line(start=(0, 0), end=(scaled_width_mm, 0), 
-                           stroke='gray', stroke_width=0.5))
-            dwg.add(dwg.line(start=(0, 0), end=(0, scaled_height_mm), 
-                           stroke='gray', stroke_width=0.5))
-            
-            self.draw_ruler(dwg, scaled_width_mm, self.scale_factor, axis='x', interval=10, size=2.5)
-            self.draw_ruler(dwg, scaled_height_mm, self.scale_factor, axis='y', interval=10, size=2.5)
-            
-            # AGREGAR CONTORNOS
-            for contour in contours:
-                smoothed_contour = self.smooth_contour(contour, smooth_factor=0.5)
-                points = [(x * self.pixel_to_mm * self.scale_factor, 
-                            y * self.pixel_to_mm * self.scale_factor) 
-                            for y, x in smoothed_contour]
-                
-                path_data = "M " + " L ".join([f"{x:.2f},{y:.2f}" for x, y in points]) + " Z"
-                path = dwg.path(d=path_data, fill='none', stroke='black', stroke_width=0.3)
-                dwg.add(path)
-            
-            dwg.save()
+            with atomic_path(output_path) as tmp_path:
+                self.build_svg(img, tmp_path, scale_factor=scale_factor).save()
             return True
             
         except Exception as e:
-            print(f"Error converting PNG to SVG: {e}")
+            logger.error(f"Error converting PNG to SVG: {e}")
             return False
 
+    @metrics.timed('vectorization')
+    def pattern_geometry(self, img, scale_factor=None):
+        """
+        Extrae la geometría del patrón de una imagen OpenCV (BGR): tamaño de la hoja
+        y contornos suavizados y simplificados, en mm del patrón.
+
+        Args:
+            img: Imagen OpenCV (BGR) de la talla
+            scale_factor (float): Escala del patrón (por defecto self.scale_factor)
+
+        Returns:
+            dict: {'width_mm', 'height_mm', 'scale_factor', 'paths': [array (N, 2) de puntos (x, y)]}
+        """
+        if scale_factor is None:
+            scale_factor = self.scale_factor
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        
+        _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
+        
+        kernel = np.ones((3, 3), np.uint8)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=2)
+        
+        contours = measure.find_contours(binary, level=0.8)
+        
+        height, width = binary.shape
+        width_mm = width * self.pixel_to_mm
+        height_mm = height * self.pixel_to_mm
+        
+        paths = []
+        for contour in contours:
+            smoothed_contour = self.smooth_contour(contour, smooth_factor=0.5)
+            # Columnas (y, x) en píxeles -> (x, y) en mm del patrón
+            points = smoothed_contour[:, ::-1] * self.pixel_to_mm * scale_factor
+            paths.append(self.simplify_contour(points))
+        
+        return {
+            'width_mm': width_mm * scale_factor,
+            'height_mm': height_mm * scale_factor,
+            'scale_factor': scale_factor,
+            'paths': paths
+        }
+
+    def build_svg(self, img=None, output_path='pattern.svg', geometry=None, scale_factor=None):
+        """Construye el dibujo SVG con reglas y contornos suavizados de una imagen OpenCV (BGR) o de su geometría."""
+        if geometry is None:
+            geometry = self.pattern_geometry(img, scale_factor)
+        scaled_width_mm = geometry['width_mm']
+        scaled_height_mm = geometry['height_mm']
+        
+        # Sin validación de atributos (debug): svgwrite analizaría cada path con una gramática en Python
+        dwg = svgwrite.Drawing(output_path, 
+                             size=(f"{scaled_width_mm}mm", f"{scaled_height_mm}mm"),
+                             viewBox=f"0 0 {scaled_width_mm} {scaled_height_mm}",
+                             debug=False)
+        
+        # Agregar reglas
+        dwg.add(dwg.line(start=(0, 0), end=(scaled_width_mm, 0), 
+                       stroke='gray', stroke_width=0.5))
+        dwg.add(dwg.line(start=(0, 0), end=(0, scaled_height_mm), 
+                       stroke='gray', stroke_width=0.5))
+        
+        self.draw_ruler(dwg, scaled_width_mm, geometry['scale_factor'], axis='x', interval=10, size=2.5)
+        self.draw_ruler(dwg, scaled_height_mm, geometry['scale_factor'], axis='y', interval=10, size=2.5)
+        
+        # AGREGAR CONTORNOS
+        for points in geometry['paths']:
+            path_data = self.contour_path_data(points)
+            path = dwg.path(d=path_data, fill='none', stroke='black', stroke_width=0.3)
+            dwg.add(path)
+        
+        return dwg
+
+    def svg_bytes(self, geometry):
+        """Serializa el SVG de una geometría, con la misma cabecera que Drawing.save()."""
+        buffer = io.StringIO()
+        self.build_svg(geometry=geometry).write(buffer)
+        return buffer.getvalue().encode('utf-8')
+
+    def draw_cairo(self, ctx, geometry):
+        """
+        Dibuja reglas y contornos en un contexto Cairo cuyas unidades son mm del
+        patrón, con los mismos trazos y colores que el SVG.
+        """
+        width_mm, height_mm = geometry['width_mm'], geometry['height_mm']
+        
+        # Ejes
+        ctx.set_source_rgb(*RULER_RGB)
+        ctx.set_line_width(0.5)
+        ctx.move_to(0, 0)
+        ctx.line_to(width_mm, 0)
+        ctx.move_to(0, 0)
+        ctx.line_to(0, height_mm)
+        ctx.stroke()
+        
+        # Reglas
+        marks = (self.ruler_marks(width_mm, geometry['scale_factor'], axis='x', interval=10, size=2.5)
+                 + self.ruler_marks(height_mm, geometry['scale_factor'], axis='y', interval=10, size=2.5))
+        ctx.set_line_width(0.3)
+        for start, end, _, _ in marks:
+            ctx.move_to(*start)
+            ctx.line_to(*end)
+        ctx.stroke()
+        ctx.select_font_face('sans-serif')
+        ctx.set_font_size(2)
+        for _, _, label, insert in marks:
+            ctx.move_to(*insert)
+            ctx.show_text(label)
+        
+        # Contornos: un único trazo para todos los paths
+        ctx.set_source_rgb(0, 0, 0)
+        ctx.set_line_width(0.3)
+        for points in geometry['paths']:
+            ctx.move_to(*points[0])
+            for x, y in points[1:]:
+                ctx.line_to(x, y)
+            ctx.close_path()
+        ctx.stroke()
+
+    @metrics.timed('pdf_render')
+    def draw_pdf(self, geometry):
+        """PDF de una página del tamaño real del patrón."""
+        buffer = io.BytesIO()
+        surface = cairocffi.PDFSurface(buffer, geometry['width_mm'] * PT_PER_MM, geometry['height_mm'] * PT_PER_MM)
+        ctx = cairocffi.Context(surface)
+        ctx.scale(PT_PER_MM, PT_PER_MM)
+        self.draw_cairo(ctx, geometry)
+        surface.finish()
+        return buffer.getvalue()
+
+    @metrics.timed('preview_render')
+    def draw_preview(self, geometry, width=PREVIEW_WIDTH, height=PREVIEW_HEIGHT):
+        """Preview PNG con el patrón completo centrado y escalado sin deformar, como CairoSVG."""
+        surface = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, width, height)
+        ctx = cairocffi.Context(surface)
+        scale = min(width / geometry['width_mm'], height / geometry['height_mm'])
+        ctx.translate((width - geometry['width_mm'] * scale) / 2, (height - geometry['height_mm'] * scale) / 2)
+        ctx.scale(scale, scale)
+        self.draw_cairo(ctx, geometry)
+        buffer = io.BytesIO()
+        surface.write_to_png(buffer)
+        surface.finish()
+        return buffer.getvalue()
+
+    @metrics.timed('pdf_render')
+    def draw_combined_pdf(self, geometries, labels):
+        """
+        PDF con una página por talla, cada una de su tamaño real y con el nombre
+        de la talla. Se dibuja a partir de las geometrías ya extraídas.
+        """
+        buffer = io.BytesIO()
+        first = geometries[0]
+        surface = cairocffi.PDFSurface(buffer, first['width_mm'] * PT_PER_MM, first['height_mm'] * PT_PER_MM)
+        ctx = cairocffi.Context(surface)
+        for geometry, label in zip(geometries, labels):
+            surface.set_size(geometry['width_mm'] * PT_PER_MM, geometry['height_mm'] * PT_PER_MM)
+            ctx.save()
+            ctx.scale(PT_PER_MM, PT_PER_MM)
+            self.draw_cairo(ctx, geometry)
+            ctx.set_source_rgb(0, 0, 0)
+            ctx.set_font_size(12)
+            ctx.move_to(20, 20)
+            ctx.show_text(label)
+            ctx.restore()
+            ctx.show_page()
+        surface.finish()
+        return buffer.getvalue()
+
+    def tile_grid(self, geometry, page_size, overlap_mm):
+        """
+        Páginas necesarias para imprimir una geometría en page_size.
+
+        Returns:
+            dict: {'print_width', 'print_height' (área imprimible en mm), 'step_x', 'step_y'
+                   (desplazamiento entre páginas contiguas), 'columns', 'rows'}
+        """
+        page_width, page_height = PAGE_SIZES[page_size]
+        print_width = page_width - 2 * PRINT_MARGIN_MM
+        print_height = page_height - 2 * PRINT_MARGIN_MM
+        step_x, step_y = print_width - overlap_mm, print_height - overlap_mm
+        return {
+            'print_width': print_width,
+            'print_height': print_height,
+            'step_x': step_x,
+            'step_y': step_y,
+            'columns': max(1, math.ceil((geometry['width_mm'] - print_width) / step_x) + 1),
+            'rows': max(1, math.ceil((geometry['height_mm'] - print_height) / step_y) + 1)
+        }
+
+    def registration_marks(self, grid, column, row, overlap_mm):
+        """
+        Marcas de registro de una página, en mm del patrón.
+
+        Se colocan en el centro de cada solape con una página vecina, a 1/4 y 3/4
+        del lado común, de modo que cada marca aparece en las dos páginas que
+        hay que superponer.
+        """
+        x0, y0 = column * grid['step_x'], row * grid['step_y']
+        seams_x = [x0 + overlap_mm / 2] * (column > 0) + [x0 + grid['step_x'] + overlap_mm / 2] * (column < grid['columns'] - 1)
+        seams_y = [y0 + overlap_mm / 2] * (row > 0) + [y0 + grid['step_y'] + overlap_mm / 2] * (row < grid['rows'] - 1)
+        
+        marks = []
+        for x in seams_x:
+            marks += [(x, y0 + grid['print_height'] / 4), (x, y0 + grid['print_height'] * 3 / 4)]
+        for y in seams_y:
+            marks += [(x0 + grid['print_width'] / 4, y), (x0 + grid['print_width'] * 3 / 4, y)]
+        return marks
+
+    @metrics.timed('pdf_render')
+    def draw_tiled_pdf(self, geometries, labels, target, page_size='a4', overlap_mm=DEFAULT_OVERLAP_MM):
+        """
+        PDF del patrón a escala dividido en páginas de page_size que se solapan
+        overlap_mm, con marcas de registro en los solapes y la posición de cada
+        página (fila y columna) en el margen.
+
+        Cairo escribe cada página en target al terminarla (show_page), así que la
+        memoria no depende de la escala ni del número de páginas. En cada página
+        solo se dibujan los contornos que la cruzan.
+
+        Args:
+            geometries (list): Geometrías de pattern_geometry, una por talla
+            labels (list): Nombre de cada talla
+            target: Ruta o archivo binario en el que se escribe el PDF
+            page_size (str): Formato de página de PAGE_SIZES
+            overlap_mm (float): Solape entre páginas contiguas
+
+        Returns:
+            int: Número de páginas escritas
+        """
+        page_width, page_height = PAGE_SIZES[page_size]
+        surface = cairocffi.PDFSurface(target, page_width * PT_PER_MM, page_height * PT_PER_MM)
+        ctx = cairocffi.Context(surface)
+        ctx.scale(PT_PER_MM, PT_PER_MM)
+        
+        pages = 0
+        for geometry, label in zip(geometries, labels):
+            grid = self.tile_grid(geometry, page_size, overlap_mm)
+            bounds = [(points.min(axis=0), points.max(axis=0)) for points in geometry['paths']]
+            
+            for row in range(grid['rows']):
+                for column in range(grid['columns']):
+                    x0, y0 = column * grid['step_x'], row * grid['step_y']
+                    x1, y1 = x0 + grid['print_width'], y0 + grid['print_height']
+                    visible = [points for points, (low, high) in zip(geometry['paths'], bounds)
+                               if low[0] <= x1 and high[0] >= x0 and low[1] <= y1 and high[1] >= y0]
+                    
+                    # Trozo del patrón, recortado al área imprimible
+                    ctx.save()
+                    ctx.rectangle(PRINT_MARGIN_MM, PRINT_MARGIN_MM, grid['print_width'], grid['print_height'])
+                    ctx.clip()
+                    ctx.translate(PRINT_MARGIN_MM - x0, PRINT_MARGIN_MM - y0)
+                    self.draw_cairo(ctx, {**geometry, 'paths': visible})
+                    
+                    ctx.set_source_rgb(0, 0, 0)
+                    ctx.set_line_width(0.2)
+                    radius = REGISTRATION_MARK_RADIUS_MM
+                    for x, y in self.registration_marks(grid, column, row, overlap_mm):
+                        ctx.new_sub_path()
+                        ctx.arc(x, y, radius, 0, 2 * math.pi)
+                        ctx.move_to(x - 2 * radius, y)
+                        ctx.line_to(x + 2 * radius, y)
+                        ctx.move_to(x, y - 2 * radius)
+                        ctx.line_to(x, y + 2 * radius)
+                    ctx.stroke()
+                    ctx.restore()
+                    
+                    # Borde del área imprimible y posición de la página
+                    ctx.set_source_rgb(*RULER_RGB)
+                    ctx.set_line_width(0.2)
+                    ctx.rectangle(PRINT_MARGIN_MM, PRINT_MARGIN_MM, grid['print_width'], grid['print_height'])
+                    ctx.stroke()
+                    ctx.set_source_rgb(0, 0, 0)
+                    ctx.set_font_size(3.5)
+                    ctx.move_to(PRINT_MARGIN_MM, PRINT_MARGIN_MM - 3)
+                    ctx.show_text(f"{label} - fila {row + 1} de {grid['rows']}, "
+                                  f"columna {column + 1} de {grid['columns']}")
+                    ctx.show_page()
+                    pages += 1
+        
+        surface.finish()
+        return pages
+
+    def render_pattern(self, img, svg=True):
+        """
+        Genera en memoria el patrón de una imagen de talla: PDF, preview PNG y,
+        opcionalmente, SVG.
+        
+        Con el renderizador 'cairo' los contornos se extraen una vez y se dibujan
+        directamente en las superficies PDF y PNG de Cairo, sin generar ni
+        analizar XML; con 'cairosvg' el SVG se serializa y CairoSVG lo lee desde memoria.
+        
+        Args:
+            img: Imagen OpenCV (BGR) de la talla
+            svg (bool): Incluir también el SVG
+        
+        Returns:
+            dict: {'svg_bytes' (o None), 'pdf_bytes', 'preview_png', 'geometry'}
+        """
+        geometry = self.pattern_geometry(img)
+        
+        if self.renderer == 'cairosvg':
+            svg_bytes = self.svg_bytes(geometry)
+            return {
+                'svg_bytes': svg_bytes if svg else None,
+                'pdf_bytes': cairosvg.svg2pdf(bytestring=svg_bytes),
+                'preview_png': cairosvg.svg2png(bytestring=svg_bytes, output_width=PREVIEW_WIDTH,
+                                                output_height=PREVIEW_HEIGHT),
+                'geometry': geometry
+            }
+        
+        return {
+            'svg_bytes': self.svg_bytes(geometry) if svg else None,
+            'pdf_bytes': self.draw_pdf(geometry),
+            'preview_png': self.draw_preview(geometry),
+            'geometry': geometry
+        }
+
+    @metrics.timed('pdf_render')
     def svg_to_pdf(self, svg_path, pdf_path):
         """Convierte un archivo SVG a PDF."""
         try:
-            cairosvg.svg2pdf(url=svg_path, write_to=pdf_path)
+            with atomic_path(pdf_path) as tmp_path:
+                cairosvg.svg2pdf(url=svg_path, write_to=tmp_path)
             return True
         except Exception as e:
-            print(f"Error converting SVG to PDF: {e}")
+            logger.error(f"Error converting SVG to PDF: {e}")
             return False
 
+    @metrics.timed('preview_render')
     def create_svg_preview(self, svg_path):
         """Crea una imagen preview PNG del SVG para mostrar en la web."""
         try:
             png_data = cairosvg.svg2png(url=svg_path, output_width=300, output_height=400)
             return base64.b64encode(png_data).decode('utf-8')
         except Exception as e:
-            print(f"Error creating SVG preview: {e}")
+            logger.error(f"Error creating SVG preview: {e}")
+            return None
+
+    def executor(self):
+        """
+        Pool de procesos de exportación.
+
+        Devuelve None (exportación secuencial) si PATTERN_WORKERS es 0 o si se
+        ejecuta dentro de un proceso de trabajo de EXECUTION_MODE=process: cada
+        proceso abriría su propio pool y habría WORKER_PROCESSES * PATTERN_WORKERS
+        procesos compitiendo por los mismos núcleos.
+        """
+        from services.worker_pool import in_worker_process
+        if self.workers <= 0 or in_worker_process():
             return None
+        with self._lock:
+            if self._executor is None:
+                # 'spawn': no se hereda el estado del proceso web (hilos, modelos cargados)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=configure_logging)
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def uses_svg_chain(self, job):
+        """Si la talla se exporta a partir del SVG (PATTERN_RENDERER=cairosvg y sin páginas)."""
+        return self.renderer == 'cairosvg' and job.get('page_size') is None
+
+    def export_size(self, job):
+        """
+        Exporta una talla en el proceso actual.
 
-    def process_pattern_sizes(self, base_filename, skirt_type):
+        Con el renderizador 'cairo', PDF y preview se dibujan en una sola pasada
+        desde la geometría y el SVG solo se escribe si job['svg_path'] no es None.
+        Con 'cairosvg' se escribe el SVG y a partir de él el PDF y la preview.
+        Si job['page_size'] no es None, el PDF se divide en páginas de ese formato
+        (draw_tiled_pdf) con cualquiera de los dos renderizadores.
+
+        Returns:
+            dict: {'svg': bool (contornos extraídos), 'pdf': bool, 'preview': base64 o None,
+                   'error': excepción o None, 'geometry': geometría o None, 'pages': int}
+        """
+        outcome = {'svg': False, 'pdf': False, 'preview': None, 'error': None, 'geometry': None, 'pages': 1}
         try:
-            # Rutas base
-            static_path = os.path.join(os.getcwd(), 'static')
-            tallas_path = os.path.join(static_path, 'tallas')
-            patterns_path = os.path.join(static_path, 'patterns')
+            if self.uses_svg_chain(job):
+                outcome['svg'] = self.png_to_svg(job['image_path'], job['svg_path'], job.get('scale_factor'))
+                if outcome['svg']:
+                    outcome['pdf'] = self.svg_to_pdf(job['svg_path'], job['pdf_path'])
+                    if outcome['pdf']:
+                        outcome['preview'] = self.create_svg_preview(job['svg_path'])
+                return outcome
             
-            # Crear directorio de patrones si no existe
-            os.makedirs(patterns_path, exist_ok=True)
+            img = cv2.imread(job['image_path'])
+            if img is None:
+                raise ValueError(f"No se pudo cargar la imagen: {job['image_path']}")
+            geometry = self.pattern_geometry(img, job.get('scale_factor'))
+            outcome['svg'] = True
+            outcome['geometry'] = geometry
             
+            if job.get('page_size') is None:
+                atomic_write(job['pdf_path'], self.draw_pdf(geometry))
+            else:
+                with atomic_path(job['pdf_path']) as tmp_path:
+                    outcome['pages'] = self.draw_tiled_pdf([geometry], [job['label']], tmp_path,
+                                                           job['page_size'], job['overlap_mm'])
+            outcome['pdf'] = True
+            if job['svg_path'] is not None:
+                atomic_write(job['svg_path'], self.svg_bytes(geometry))
+            outcome['preview'] = base64.b64encode(self.draw_preview(geometry)).decode('utf-8')
+        except Exception as e:
+            outcome['error'] = e
+        return outcome
+
+    def export_sizes(self, jobs, progress_callback=None):
+        """
+        Exporta varias tallas, en paralelo si hay pool de procesos.
+
+        Con pool, cada talla se exporta en un proceso. Con el renderizador
+        'cairosvg' y sin páginas, en cuanto el SVG de una talla está listo, el PDF y la preview
+        se generan a la vez en otros dos.
+
+        Args:
+            jobs (list): Por talla, {'size', 'image_path', 'svg_path', 'pdf_path'}
+            progress_callback (callable): Función progress_callback(done, total) llamada
+                al terminar cada talla salvo la última
+
+        Returns:
+            list: Resultado de cada talla como en export_size, en el orden de jobs
+        """
+        executor = self.executor()
+        total = len(jobs)
+        if executor is None or total == 0:
+            outcomes = []
+            for index, job in enumerate(jobs):
+                if progress_callback is not None and index > 0:
+                    progress_callback(index, total)
+                outcomes.append(self.export_size(job))
+            return outcomes
+
+        outcomes = [{'svg': False, 'pdf': False, 'preview': None, 'error': None, 'geometry': None, 'pages': 1}
+                    for _ in jobs]
+        pending = {}
+        for index, job in enumerate(jobs):
+            if self.uses_svg_chain(job):
+                pending[executor.submit(_export_svg, job['image_path'], job['svg_path'], job.get('scale_factor'))] = (index, 'svg')
+            else:
+                pending[executor.submit(_export_size, job)] = (index, 'size')
+        stages_left = [1] * total
+        done_sizes = 0
+        try:
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index, stage = pending.pop(future)
+                    job = jobs[index]
+                    try:
+                        if stage == 'size':
+                            outcomes[index] = merge_result(future.result())
+                        else:
+                            outcomes[index][stage] = merge_result(future.result())
+                    except Exception as e:
+                        outcomes[index]['error'] = e
+                    stages_left[index] -= 1
+                    
+                    if stage == 'svg' and outcomes[index]['svg']:
+                        pending[executor.submit(_export_pdf, job['svg_path'], job['pdf_path'])] = (index, 'pdf')
+                        pending[executor.submit(_export_preview, job['svg_path'])] = (index, 'preview')
+                        stages_left[index] += 2
+                    
+                    if stages_left[index] == 0:
+                        done_sizes += 1
+                        if progress_callback is not None and done_sizes < total:
+                            progress_callback(done_sizes, total)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        
+        # Como en la exportación secuencial, sin PDF no se usa la preview
+        for outcome in outcomes:
+            if not outcome['pdf']:
+                outcome['preview'] = None
+        return outcomes
+
+    def render_patterns(self, images, svg=True):
+        """
+        Versión de render_pattern para varias tallas, en paralelo si hay pool de procesos.
+
+        Returns:
+            list: Resultado de render_pattern por imagen, o la excepción que produjo
+        """
+        executor = self.executor()
+        if executor is None:
+            futures = None
+        else:
+            futures = [executor.submit(_render_pattern, img, svg) for img in images]
+        
+        results = []
+        for index, img in enumerate(images):
+            try:
+                results.append(merge_result(futures[index].result()) if futures else self.render_pattern(img, svg))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def process_pattern_sizes(self, base_filename, skirt_type, progress_callback=None, svg=False, combined=False,
+                              page_size=None, overlap_mm=DEFAULT_OVERLAP_MM, scale_factor=None, preview_files=False,
+                              sizes_token=None):
+        """
+        Genera los patrones PDF (y opcionalmente SVG) y sus previews para las tallas de un diseño.
+
+        Las tallas se buscan en el índice de artefactos por el nombre del diseño
+        base, no en el directorio static/tallas. Con PATTERN_WORKERS > 0 las
+        tallas se exportan en paralelo (salvo en un proceso de trabajo). Los nombres llevan un identificador de
+        la petición, así que dos peticiones del mismo diseño no se pisan.
+
+        Args:
+            base_filename (str): Nombre del archivo base generado
+            skirt_type (str): Tipo de falda
+            progress_callback (callable): Función progress_callback(done, total) llamada
+                al terminar cada talla
+            svg (bool): Escribir también el SVG de cada talla (siempre con PATTERN_RENDERER=cairosvg
+                si no se divide en páginas)
+            combined (bool): Generar además un PDF con todas las tallas
+            page_size (str): Formato de página de PAGE_SIZES en el que dividir cada
+                patrón, o None para una sola página del tamaño del patrón
+            overlap_mm (float): Solape entre páginas contiguas
+            scale_factor (float): Escala del patrón (por defecto self.scale_factor)
+            preview_files (bool): Guardar las previews como PNG en el almacén de patrones
+                ('preview_filename') en lugar de devolverlas en base64
+            sizes_token (str): Identificador de la petición de tallas cuyas tallas se
+                usan, o None para las últimas generadas para el diseño
+
+        Returns:
+            dict: Resultado con la lista de patrones generados por talla
+        """
+        try:
             results = {
                 'success': False,
                 'patterns': []
             }
             
-            sizes = ['S', 'M', 'L']
+            sizes = artifact_index.sizes_for(base_filename, sizes_token)
+            if not sizes:
+                return {'success': False, 'error': f'No hay tallas generadas para {base_filename}'}
             
-            # Listar todos los archivos en static/tallas/ para depuración
-            tallas_files = os.listdir(tallas_path)
-            print(f"Archivos en {tallas_path}: {tallas_files}")
+            # Generar nombres de archivos de salida
+            base_name = os.path.splitext(base_filename)[0]
+            token = uuid.uuid4().hex[:12]
+            pattern_path = lambda filename: os.path.abspath(artifact_store.path('patterns', filename))
+            write_svg = svg or (self.renderer == 'cairosvg' and page_size is None)
+            jobs = []
+            for size_entry in sizes:
+                size = size_entry['size'].upper()
+                svg_filename = f"{base_name}_pattern_{size.lower()}_{token}.svg" if write_svg else None
+                pdf_filename = f"{base_name}_pattern_{size.lower()}_{token}.pdf"
+                jobs.append({
+                    'size': size,
+                    'image_path': size_entry['path'],
+                    'svg_filename': svg_filename,
+                    'pdf_filename': pdf_filename,
+                    'svg_path': pattern_path(svg_filename) if write_svg else None,
+                    'pdf_path': pattern_path(pdf_filename),
+                    'label': size_label(size.lower()),
+                    'scale_factor': scale_factor,
+                    'page_size': page_size,
+                    'overlap_mm': overlap_mm
+                })
+                logger.info(f"Usando archivo de talla: {size_entry['path']}")
             
-            for size in sizes:
-                try:
-                    # Buscar archivo de talla que coincida con el patrón size_[s/m/l]_{skirt_type}_*.png
-                    pattern = f"size_{size.lower()}_{skirt_type}_*.png"
-                    size_files = glob.glob(os.path.join(tallas_path, pattern))
-                    
-                    if not size_files:
-                        print(f"No se encontraron archivos para: {pattern}")
-                        continue
-                    
-                    # Tomar el archivo más reciente (en caso de que haya múltiples coincidencias)
-                    size_image_path = max(size_files, key=os.path.getmtime)
-                    size_filename = os.path.basename(size_image_path)
-                    
-                    print(f"Usando archivo de talla: {size_image_path}")
-                    
-                    # Generar nombres de archivos de salida
-                    base_name = os.path.splitext(base_filename)[0]
-                    svg_filename = f"{base_name}_pattern_{size.lower()}.svg"
-                    pdf_filename = f"{base_name}_pattern_{size.lower()}.pdf"
-                    
-                    svg_path = os.path.join(patterns_path, svg_filename)
-                    pdf_path = os.path.join(patterns_path, pdf_filename)
-                    
-                    # Convertir PNG a SVG
-                    if self.png_to_svg(size_image_path, svg_path):
-                        # Convertir SVG a PDF
-                        if self.svg_to_pdf(svg_path, pdf_path):
-                            # Crear preview
-                            preview_base64 = self.create_svg_preview(svg_path)
-                            
-                            results['patterns'].append({
-                                'size': size,
-                                'svg_filename': svg_filename,
-                                'pdf_filename': pdf_filename,
-                                'preview_base64': preview_base64
-                            })
-                        else:
-                            print(f"Error al convertir SVG a PDF para talla {size}")
-                    else:
-                        print(f"Error al convertir PNG a SVG para talla {size}")
-                            
-                except Exception as e:
-                    print(f"Error procesando talla {size}: {e}")
-                    continue
+            outcomes = self.export_sizes(jobs, progress_callback)
+            
+            recorded = []
+            geometries, labels = [], []
+            for job, outcome in zip(jobs, outcomes):
+                size = job['size']
+                if outcome['error'] is not None:
+                    logger.error(f"Error procesando talla {size}: {outcome['error']}")
+                elif not outcome['svg']:
+                    logger.error(f"Error al convertir PNG a SVG para talla {size}")
+                elif not outcome['pdf']:
+                    logger.error(f"Error al convertir SVG a PDF para talla {size}")
+                else:
+                    pattern = {
+                        'size': size,
+                        'svg_filename': job['svg_filename'],
+                        'pdf_filename': job['pdf_filename'],
+                        'pages': outcome['pages'],
+                        'preview_base64': outcome['preview']
+                    }
+                    if preview_files and outcome['preview'] is not None:
+                        preview_filename = f"{base_name}_pattern_{size.lower()}_{token}.png"
+                        preview_path = pattern_path(preview_filename)
+                        atomic_write(preview_path, base64.b64decode(outcome['preview']))
+                        pattern['preview_base64'] = None
+                        pattern['preview_filename'] = preview_filename
+                        recorded.append(('pattern_preview', size.lower(), preview_filename, preview_path))
+                    results['patterns'].append(pattern)
+                    if job['svg_path'] is not None:
+                        recorded.append(('pattern_svg', size.lower(), job['svg_filename'], job['svg_path']))
+                    recorded.append(('pattern_pdf', size.lower(), job['pdf_filename'], job['pdf_path']))
+                    if combined:
+                        geometries.append(outcome['geometry']
+                                          or self.pattern_geometry(cv2.imread(job['image_path']), scale_factor))
+                        labels.append(job['label'])
+            
+            if geometries:
+                combined_filename = f"{base_name}_patterns_{token}.pdf"
+                combined_path = pattern_path(combined_filename)
+                if page_size is None:
+                    atomic_write(combined_path, self.draw_combined_pdf(geometries, labels))
+                else:
+                    with atomic_path(combined_path) as tmp_path:
+                        results['combined_pages'] = self.draw_tiled_pdf(geometries, labels, tmp_path,
+                                                                        page_size, overlap_mm)
+                results['combined_pdf_filename'] = combined_filename
+                recorded.append(('pattern_pdf', 'all', combined_filename, combined_path))
+            
+            if progress_callback is not None:
+                progress_callback(len(sizes), len(sizes))
+            
+            if recorded:
+                artifact_index.record(base_filename, recorded, token)
             
             if len(results['patterns']) > 0:
                 results['success'] = True
@@ -206,7 +776,37 @@ class PatternService:
             return results
             
         except Exception as e:
-            print(f"Error general en process_pattern_sizes: {e}")
+            logger.error(f"Error general en process_pattern_sizes: {e}")
             return {'success': False, 'error': str(e)}
+
+
+def size_label(code):
+    """Título de la página de una talla en el PDF combinado ('Talla M', 'Cadera 96.5 cm')."""
+    if code in SIZE_TABLE:
+        return SIZE_TABLE[code]['name']
+    return f"Cadera {code[:-2].replace('_', '.')} cm"
+
+
+# Tareas del pool de procesos: devuelven también sus métricas para el proceso padre
+def _export_svg(image_path, svg_path, scale_factor=None):
+    return call_forwarding(pattern_service.png_to_svg, image_path, svg_path, scale_factor)
+
+
+def _export_pdf(svg_path, pdf_path):
+    return call_forwarding(pattern_service.svg_to_pdf, svg_path, pdf_path)
+
+
+def _export_preview(svg_path):
+    return call_forwarding(pattern_service.create_svg_preview, svg_path)
+
+
+def _render_pattern(img, svg=True):
+    return call_forwarding(pattern_service.render_pattern, img, svg)
+
+
+def _export_size(job):
+    return call_forwarding(pattern_service.export_size, job)
+
 # Instancia global del servicio
-pattern_service = PatternService()
\ No newline at end of file
+pattern_service = PatternService()
+atexit.register(pattern_service.shutdown)
\ No newline at end of file
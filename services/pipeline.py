@@ -0,0 +1,318 @@
+"""
+Pipeline en memoria: diseño generado -> tallas -> patrones PDF.
+
+El diseño se genera con el planificador de inferencia (sample_design), como
+cualquier otra petición de generación: comparte micro-lotes, cola y límite de
+memoria. Las etapas siguientes se ejecutan en una sola llamada (run_pipeline,
+en el proceso de trabajo en modo 'process') y se pasan directamente los arrays
+decodificados y los bytes ya codificados: la imagen del UNet llega a
+size_service como array, cada talla se codifica a PNG una vez y pattern_service
+la vectoriza sin releerla del disco.
+
+Los archivos solo se escriben si la petición lo pide, y en segundo plano
+(ArtifactWriter) en el proceso web, de modo que la respuesta no espera al disco.
+"""
+import os
+import logging
+import uuid
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.artifact_index import artifact_index
+from services.artifact_delivery import artifact_delivery
+from services.artifact_store import artifact_store, atomic_write
+from services.inference_scheduler import inference_scheduler
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Hilos que escriben en disco los artefactos del pipeline
+ARTIFACT_WRITER_THREADS = int(os.environ.get('ARTIFACT_WRITER_THREADS', 2))
+# Segundos máximos que una descarga espera a que termine la escritura de su archivo
+ARTIFACT_WAIT_SECONDS = 30
+
+
+class ArtifactWriter:
+    """
+    Escribe artefactos en disco en segundo plano.
+
+    Cada archivo se escribe en un temporal y se renombra, así que nunca se sirve
+    a medias; las rutas de descarga llaman a wait() para no responder 404 a un
+    archivo que aún está en cola.
+    """
+
+    def __init__(self, threads=ARTIFACT_WRITER_THREADS):
+        self.threads = max(1, threads)
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.written = 0
+        self.errors = 0
+
+    def write(self, path, data):
+        """Encola la escritura de data (bytes) en path."""
+        path = os.path.abspath(path)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='artifact-writer')
+            future = self._executor.submit(self._write, path, data)
+            self._pending[path] = future
+        future.add_done_callback(lambda _: self._done(path, future))
+        return future
+
+    def _write(self, path, data):
+        atomic_write(path, data)
+
+    def _done(self, path, future):
+        with self._lock:
+            if self._pending.get(path) is future:
+                del self._pending[path]
+            if future.exception() is not None:
+                self.errors += 1
+                logger.error(f"Error escribiendo {path}: {future.exception()}")
+            else:
+                self.written += 1
+
+    def wait(self, path, timeout=ARTIFACT_WAIT_SECONDS):
+        """Espera a que termine la escritura pendiente de path, si la hay."""
+        with self._lock:
+            future = self._pending.get(os.path.abspath(path))
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def flush(self, timeout=ARTIFACT_WAIT_SECONDS):
+        """Espera a que terminen todas las escrituras pendientes."""
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'written': self.written,
+                'errors': self.errors
+            }
+
+
+def sample_design(model_type, skirt_type, sampler=None, steps=None, seed=None, progress_callback=None,
+                  cancel_event=None, persist=True):
+    """
+    Genera el diseño de un pipeline con el planificador de inferencia.
+
+    Args:
+        model_type (str): 'design' o 'pattern'
+        skirt_type (str): Tipo de falda
+        sampler (str): Sampler a usar (por defecto DEFAULT_SAMPLER)
+        steps (int): Pasos de inferencia (por defecto según el sampler)
+        seed (int): Semilla de la generación (al azar si es None)
+        progress_callback (callable): Función progress_callback(step, total_steps)
+        cancel_event (threading.Event): Si se activa, la generación se cancela
+        persist (bool): Si es False, el diseño no se escribe en el almacén de artefactos
+
+    Returns:
+        dict: Diseño generado (con la imagen decodificada en 'array'), o None si falló la generación
+
+    Raises:
+        GenerationCancelled: Si la generación se canceló
+    """
+    generation = inference_scheduler.submit(model_type, skirt_type, sampler, steps, 1, progress_callback,
+                                            cancel_event, seed=seed, persist=persist, return_arrays=True)
+    if not generation:
+        return None
+    image = generation['images'][0]
+    return {
+        'model_type': model_type,
+        'skirt_type': skirt_type,
+        'sampler': generation['sampler'],
+        'steps': generation['steps'],
+        'seed': image['seed'],
+        'filename': image['filename'],
+        'cached': image['cached'],
+        'image_base64': image['image_base64'],
+        'array': image['array']
+    }
+
+
+def run_pipeline(design, sizes=None, svg=False, combined=False, progress_callback=None):
+    """
+    Genera las tallas de un diseño y los patrones de cada talla sin pasar por el disco.
+
+    Args:
+        design (dict): Diseño devuelto por sample_design
+        sizes (list): Tallas a generar (por defecto GRADING_SIZES)
+        svg (bool): Incluir el SVG de cada patrón
+        combined (bool): Generar además un PDF con una página por talla
+        progress_callback (callable): Función progress_callback(percent, message)
+
+    Returns:
+        dict: Bytes codificados de cada artefacto y sus nombres de archivo
+    """
+    import numpy as np
+    from services.size_service import encode_sizes
+    from services.pattern_service import pattern_service, size_label
+
+    skirt_type = design['skirt_type']
+
+    def report(percent, message):
+        if progress_callback is not None:
+            progress_callback(percent, message)
+
+    # El UNet devuelve RGB; OpenCV trabaja en BGR como si la imagen se leyera con cv2.imread
+    report(60.0, 'Procesando tallas')
+    size_images = encode_sizes(np.ascontiguousarray(design['array'][..., ::-1]), sizes)
+
+    # Un identificador por petición: dos peticiones del mismo diseño no comparten archivos
+    token = uuid.uuid4().hex[:12]
+    base_name = os.path.splitext(design['filename'])[0]
+    result_sizes, patterns = [], []
+    geometries, labels = [], []
+    # Los patrones de todas las tallas se generan a la vez si PATTERN_WORKERS > 0
+    report(70.0, 'Generando patrones')
+    rendered = pattern_service.render_patterns([size['image'] for size in size_images], svg=svg)
+    for size, pattern in zip(size_images, rendered):
+        if isinstance(pattern, Exception):
+            logger.error(f"Error generando el patrón de la talla {size['size']}: {pattern}")
+        else:
+            geometries.append(pattern.pop('geometry'))
+            labels.append(size_label(size['size']))
+            patterns.append({
+                'size': size['size'],
+                'svg_filename': f"{base_name}_pattern_{size['size']}_{token}.svg" if svg else None,
+                'pdf_filename': f"{base_name}_pattern_{size['size']}_{token}.pdf",
+                **pattern
+            })
+        result_sizes.append({
+            'size': size['size'],
+            'name': size['name'],
+            'hip_contour': size['hip_contour'],
+            'width': size['width'],
+            'filename': f"size_{size['size']}_{skirt_type}_{token}.png",
+            'png_bytes': size['png_bytes']
+        })
+    combined_pdf = None
+    if combined and geometries:
+        combined_pdf = {
+            'pdf_filename': f"{base_name}_patterns_{token}.pdf",
+            'pdf_bytes': pattern_service.draw_combined_pdf(geometries, labels)
+        }
+    report(100.0, 'Completado')
+
+    return {
+        'model_type': design['model_type'],
+        'skirt_type': skirt_type,
+        'sampler': design['sampler'],
+        'steps': design['steps'],
+        'seed': design['seed'],
+        'design': {
+            'filename': design['filename'],
+            'cached': design['cached'],
+            'image_base64': design['image_base64']
+        },
+        'token': token,
+        'sizes': result_sizes,
+        'patterns': patterns,
+        'combined': combined_pdf
+    }
+
+
+@metrics.timed('publish')
+def publish_result(result, persist=True, urls=False):
+    """
+    Convierte el resultado de run_pipeline en la respuesta JSON y, si persist es
+    verdadero, encola la escritura de los archivos. El diseño ya lo escribió el
+    planificador de inferencia (sample_design con el mismo persist).
+
+    Con persist=False no se escribe nada en disco y los PDF se devuelven en base64.
+    Con persist=True las URLs llevan la huella de su contenido (?v=), calculada
+    de los bytes en memoria, y con urls=True la respuesta solo incluye URLs: ni
+    las imágenes ni las previews se envían en base64.
+    El SVG de cada talla solo se escribe si run_pipeline lo generó (svg=True).
+
+    Returns:
+        dict: Respuesta del endpoint /api/pipeline
+    """
+    encode = lambda data: base64.b64encode(data).decode('utf-8')
+    inline = not (persist and urls)
+    design = result['design']
+    recorded = []
+
+    def publish(namespace, prefix, filename, data, kind=None, size=None):
+        path = os.path.abspath(artifact_store.path(namespace, filename))
+        artifact_writer.write(path, data)
+        if kind is not None:
+            recorded.append((kind, size, filename, path))
+        return artifact_delivery.url(prefix, filename, data=data)
+
+    response = {
+        'success': True,
+        'model_type': result['model_type'],
+        'skirt_type': result['skirt_type'],
+        'sampler': result['sampler'],
+        'steps': result['steps'],
+        'seed': result['seed'],
+        'cached': design['cached'],
+        'filename': design['filename'],
+        'sizes': [],
+        'patterns': []
+    }
+    if inline:
+        response['image_base64'] = design['image_base64']
+    if persist:
+        response['image_url'] = artifact_delivery.url('/downloads', design['filename'],
+                                                      artifact_store.resolve('downloads', design['filename']))
+
+    for size in result['sizes']:
+        item = {key: value for key, value in size.items() if key != 'png_bytes'}
+        if inline:
+            item['image_base64'] = encode(size['png_bytes'])
+        if persist:
+            item['url'] = publish('tallas', '/tallas', size['filename'], size['png_bytes'], 'size', size['size'])
+        response['sizes'].append(item)
+
+    for pattern in result['patterns']:
+        item = {
+            'size': pattern['size'],
+            'svg_filename': pattern['svg_filename'],
+            'pdf_filename': pattern['pdf_filename']
+        }
+        if inline:
+            item['preview_base64'] = encode(pattern['preview_png'])
+        if persist:
+            if pattern['svg_bytes'] is not None:
+                item['svg_url'] = publish('patterns', '/patterns', pattern['svg_filename'], pattern['svg_bytes'],
+                                          'pattern_svg', pattern['size'])
+            item['pdf_url'] = publish('patterns', '/patterns', pattern['pdf_filename'], pattern['pdf_bytes'],
+                                      'pattern_pdf', pattern['size'])
+            if not inline:
+                preview_filename = f"{os.path.splitext(pattern['pdf_filename'])[0]}.png"
+                item['preview_url'] = publish('patterns', '/patterns', preview_filename, pattern['preview_png'],
+                                              'pattern_preview', pattern['size'])
+        else:
+            item['pdf_base64'] = encode(pattern['pdf_bytes'])
+        response['patterns'].append(item)
+
+    combined = result.get('combined')
+    if combined is not None:
+        response['combined'] = {'pdf_filename': combined['pdf_filename']}
+        if persist:
+            response['combined']['pdf_url'] = publish('patterns', '/patterns', combined['pdf_filename'],
+                                                      combined['pdf_bytes'], 'pattern_pdf', 'all')
+        else:
+            response['combined']['pdf_base64'] = encode(combined['pdf_bytes'])
+
+    if recorded:
+        artifact_index.record(design['filename'], recorded, result['token'])
+        response['sizes_token'] = result['token']
+    return response
+
+# Instancia global del escritor de artefactos
+artifact_writer = ArtifactWriter()
@@ -0,0 +1,69 @@
+import logging
+import base64
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+from PIL import Image
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewEncoder:
+    """
+    Codifica en segundo plano las previews intermedias del muestreo.
+
+    El bucle de muestreo solo entrega el array uint8 y continúa; un hilo aparte lo
+    codifica a PNG base64 y lo publica como evento 'preview' del trabajo. Si el
+    codificador va atrasado, de cada trabajo solo se conserva la preview más
+    reciente.
+    """
+
+    def __init__(self):
+        self._pending = OrderedDict()  # job.id -> (job, step, total_steps, previews)
+        self._cond = threading.Condition()
+        self._thread = None
+        self.encoded = 0
+        self.dropped = 0
+
+    def submit(self, job, step, total_steps, previews):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='preview-encoder', daemon=True)
+                self._thread.start()
+            if job.id in self._pending:
+                self.dropped += 1
+            self._pending[job.id] = (job, step, total_steps, previews)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                _, (job, step, total_steps, previews) = self._pending.popitem(last=False)
+
+            if job.finished:
+                continue
+            try:
+                job.publish('preview', {
+                    'step': step,
+                    'total_steps': total_steps,
+                    'images': [encode_png_base64(preview) for preview in previews]
+                })
+                self.encoded += 1
+            except Exception as e:
+                logger.error(f"Error codificando preview: {e}")
+
+
+@metrics.timed('preview_encode')
+def encode_png_base64(array):
+    """Codifica un array uint8 RGB (H, W, 3) como PNG en base64."""
+    buffered = BytesIO()
+    Image.fromarray(array).save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode('utf-8')
+
+# Instancia global del codificador de previews
+preview_encoder = PreviewEncoder()
@@ -0,0 +1,63 @@
+"""
+Formatos de página y validación de las opciones de impresión de los patrones.
+
+Como size_config, no importa OpenCV ni Cairo: las rutas la usan para validar
+las peticiones sin cargar las dependencias de pattern_service.
+"""
+import os
+
+# Tamaño de cada formato de página (mm, vertical)
+PAGE_SIZES = {
+    'a4': (210, 297),
+    'letter': (215.9, 279.4),
+    'a0': (841, 1189)
+}
+# Margen sin imprimir de cada página (mm)
+PRINT_MARGIN_MM = 10
+
+# Solape entre páginas contiguas (mm); las marcas de registro se dibujan en él
+DEFAULT_OVERLAP_MM = float(os.environ.get('TILE_OVERLAP_MM', 15))
+MAX_OVERLAP_MM = 50
+
+# Escala del patrón respecto a la imagen de la talla (20: patrón a tamaño real)
+DEFAULT_SCALE = 20
+MIN_SCALE = 1
+MAX_SCALE = 50
+
+
+def resolve_print_options(page_size=None, overlap_mm=None, scale=None):
+    """
+    Valida las opciones de impresión de una petición de patrones.
+
+    Args:
+        page_size (str): Formato de página ('a4', 'letter', 'a0') o None para
+            una sola página del tamaño del patrón
+        overlap_mm (float): Solape entre páginas (por defecto TILE_OVERLAP_MM)
+        scale (float): Escala del patrón (por defecto DEFAULT_SCALE)
+
+    Returns:
+        dict: {'page_size', 'overlap_mm', 'scale_factor'}
+
+    Raises:
+        ValueError: Si alguna opción no es válida
+    """
+    if page_size is not None:
+        if not isinstance(page_size, str) or page_size.strip().lower() not in PAGE_SIZES:
+            raise ValueError(f"Formato de página inválido: {page_size}. Opciones: {', '.join(PAGE_SIZES)}")
+        page_size = page_size.strip().lower()
+
+    try:
+        overlap_mm = DEFAULT_OVERLAP_MM if overlap_mm is None else float(overlap_mm)
+        scale = DEFAULT_SCALE if scale is None else float(scale)
+    except (TypeError, ValueError):
+        raise ValueError("El solape y la escala deben ser números")
+    if not 0 <= overlap_mm <= MAX_OVERLAP_MM:
+        raise ValueError(f"Solape fuera de rango (0-{MAX_OVERLAP_MM} mm): {overlap_mm:g}")
+    if not MIN_SCALE <= scale <= MAX_SCALE:
+        raise ValueError(f"Escala fuera de rango ({MIN_SCALE}-{MAX_SCALE}): {scale:g}")
+
+    return {
+        'page_size': page_size,
+        'overlap_mm': overlap_mm,
+        'scale_factor': scale
+    }
@@ -0,0 +1,142 @@
+import os
+import logging
+import hashlib
+import threading
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Directorio persistente de resultados ya generados ('' desactiva la caché)
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(os.path.dirname(__file__), '../cache/results'))
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Calcula el sha256 de un archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Caché persistente de imágenes generadas, direccionada por contenido.
+
+    La clave combina el hash del checkpoint con (model_type, skirt_type, sampler,
+    steps, seed): con la misma semilla el muestreo es determinista, así que una
+    repetición puede devolver el PNG guardado sin ejecutar el UNet. Al incluir el
+    hash del checkpoint, reentrenar un modelo invalida sus entradas; las que dejan
+    de usarse las borra el gestor de almacenamiento por TTL o por cuota. Los
+    hashes se memorizan por (ruta, mtime, tamaño) para no releer cientos de MB en
+    cada petición.
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._hashes = {}  # ruta -> ((mtime, tamaño), sha256)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @property
+    def enabled(self):
+        return bool(self.cache_dir)
+
+    def checkpoint_hash(self, checkpoint_path):
+        """sha256 del checkpoint, o None si no existe."""
+        try:
+            stat = os.stat(checkpoint_path)
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(checkpoint_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        digest = file_sha256(checkpoint_path)
+        with self._lock:
+            self._hashes[checkpoint_path] = (signature, digest)
+        return digest
+
+    def make_key(self, checkpoint_path, model_type, skirt_type, sampler, steps, seed, backend=''):
+        """
+        Clave de la caché, o None si el checkpoint no existe o la caché está desactivada.
+
+        backend identifica las optimizaciones de inferencia activas ('' para fp32),
+        ya que cambian ligeramente los píxeles generados.
+        """
+        if not self.enabled:
+            return None
+        checkpoint = self.checkpoint_hash(checkpoint_path)
+        if checkpoint is None:
+            return None
+        text = f"{checkpoint}|{model_type}|{skirt_type}|{sampler}|{int(steps)}|{int(seed)}"
+        if backend:
+            text += f"|{backend}"
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        # Subdirectorio por los dos primeros caracteres para no llenar un único directorio
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def get(self, key):
+        """
+        Busca un resultado en la caché.
+
+        Returns:
+            bytes: PNG guardado, o None si no está
+        """
+        if key is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                png_bytes = f.read()
+            # Un acierto renueva la entrada para el orden LRU del gestor de almacenamiento,
+            # también si la consulta se hace en un proceso de trabajo
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            metrics.inc('cache_requests_total', cache='result', result='miss')
+            return None
+        with self._lock:
+            self.hits += 1
+        metrics.inc('cache_requests_total', cache='result', result='hit')
+        return png_bytes
+
+    def put(self, key, png_bytes):
+        """Guarda un PNG en la caché con escritura atómica (archivo temporal y rename)."""
+        if key is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(png_bytes)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error guardando resultado en caché: {e}")
+            return
+        with self._lock:
+            self.stores += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores,
+                'checkpoints_hashed': len(self._hashes)
+            }
+
+# Instancia global de la caché de resultados
+result_cache = ResultCache()
@@ -0,0 +1,180 @@
+"""
+Implementación nativa (solo PyTorch) de los schedulers de muestreo.
+
+Reproduce DDPMScheduler, DDIMScheduler y DPMSolverMultistepScheduler de
+diffusers con la configuración que usan los checkpoints (1000 timesteps, betas
+lineales, predicción de epsilon y los valores por defecto de cada scheduler),
+para poder servir los modelos exportados sin instalar diffusers.
+
+Los resultados coinciden bit a bit con diffusers 0.29.2 (la versión de
+requirements.txt) y con cualquier versión desde la 0.26. Las anteriores
+terminan DPM-Solver++ en el timestep 0 en lugar de en sigma 0 y dan imágenes
+distintas con ese sampler.
+"""
+import numpy as np
+import torch
+
+
+class SchedulerOutput:
+    """Salida de step(), con los mismos atributos que la de diffusers."""
+
+    def __init__(self, prev_sample, pred_original_sample=None):
+        self.prev_sample = prev_sample
+        self.pred_original_sample = pred_original_sample
+
+
+def randn_like_batch(shape, generator, device, dtype):
+    """Ruido gaussiano con un generador por imagen (igual que randn_tensor de diffusers)."""
+    if isinstance(generator, list):
+        return torch.cat([
+            torch.randn((1,) + tuple(shape[1:]), generator=g, device=device, dtype=dtype)
+            for g in generator
+        ])
+    return torch.randn(shape, generator=generator, device=device, dtype=dtype)
+
+
+class NativeScheduler:
+    """Base común: betas lineales y alphas acumuladas."""
+
+    def __init__(self, num_train_timesteps=1000, beta_start=0.0001, beta_end=0.02, beta_schedule='linear',
+                 prediction_type='epsilon', **options):
+        if beta_schedule != 'linear' or prediction_type != 'epsilon':
+            raise ValueError("Los schedulers nativos solo soportan betas lineales y predicción de epsilon")
+        self.num_train_timesteps = num_train_timesteps
+        self.betas = torch.linspace(beta_start, beta_end, num_train_timesteps, dtype=torch.float32)
+        self.alphas = 1.0 - self.betas
+        self.alphas_cumprod = torch.cumprod(self.alphas, dim=0)
+        self.one = torch.tensor(1.0)
+        self.options = options
+        self.num_inference_steps = None
+        self.timesteps = None
+
+    def _leading_timesteps(self, num_inference_steps):
+        step_ratio = self.num_train_timesteps // num_inference_steps
+        timesteps = (np.arange(0, num_inference_steps) * step_ratio).round()[::-1].copy().astype(np.int64)
+        return torch.from_numpy(timesteps)
+
+
+class NativeDDPMScheduler(NativeScheduler):
+    """DDPM con varianza 'fixed_small' y recorte de x0 a [-1, 1]."""
+
+    def set_timesteps(self, num_inference_steps):
+        self.num_inference_steps = num_inference_steps
+        self.timesteps = self._leading_timesteps(num_inference_steps)
+
+    def step(self, model_output, timestep, sample, generator=None):
+        t = int(timestep)
+        prev_t = t - self.num_train_timesteps // self.num_inference_steps
+
+        alpha_prod_t = self.alphas_cumprod[t]
+        alpha_prod_t_prev = self.alphas_cumprod[prev_t] if prev_t >= 0 else self.one
+        beta_prod_t = 1 - alpha_prod_t
+        beta_prod_t_prev = 1 - alpha_prod_t_prev
+        current_alpha_t = alpha_prod_t / alpha_prod_t_prev
+        current_beta_t = 1 - current_alpha_t
+
+        pred_original_sample = (sample - beta_prod_t ** 0.5 * model_output) / alpha_prod_t ** 0.5
+        pred_original_sample = pred_original_sample.clamp(-1, 1)
+
+        pred_original_sample_coeff = (alpha_prod_t_prev ** 0.5 * current_beta_t) / beta_prod_t
+        current_sample_coeff = current_alpha_t ** 0.5 * beta_prod_t_prev / beta_prod_t
+        pred_prev_sample = pred_original_sample_coeff * pred_original_sample + current_sample_coeff * sample
+
+        if t > 0:
+            noise = randn_like_batch(model_output.shape, generator, model_output.device, model_output.dtype)
+            variance = torch.clamp((1 - alpha_prod_t_prev) / (1 - alpha_prod_t) * current_beta_t, min=1e-20)
+            pred_prev_sample = pred_prev_sample + variance ** 0.5 * noise
+
+        return SchedulerOutput(pred_prev_sample, pred_original_sample)
+
+
+class NativeDDIMScheduler(NativeScheduler):
+    """DDIM determinista (eta = 0) con recorte de x0 y alpha final igual a 1."""
+
+    def set_timesteps(self, num_inference_steps):
+        self.num_inference_steps = num_inference_steps
+        self.timesteps = self._leading_timesteps(num_inference_steps)
+
+    def step(self, model_output, timestep, sample, generator=None):
+        t = int(timestep)
+        prev_t = t - self.num_train_timesteps // self.num_inference_steps
+
+        alpha_prod_t = self.alphas_cumprod[t]
+        alpha_prod_t_prev = self.alphas_cumprod[prev_t] if prev_t >= 0 else self.one
+        beta_prod_t = 1 - alpha_prod_t
+
+        pred_original_sample = (sample - beta_prod_t ** 0.5 * model_output) / alpha_prod_t ** 0.5
+        pred_original_sample = pred_original_sample.clamp(-1, 1)
+
+        pred_sample_direction = (1 - alpha_prod_t_prev) ** 0.5 * model_output
+        prev_sample = alpha_prod_t_prev ** 0.5 * pred_original_sample + pred_sample_direction
+
+        return SchedulerOutput(prev_sample, pred_original_sample)
+
+
+class NativeDPMSolverMultistepScheduler(NativeScheduler):
+    """DPM-Solver++ multipaso de orden 2 (midpoint), timesteps 'linspace' y sigma final 0."""
+
+    def __init__(self, algorithm_type='dpmsolver++', solver_order=2, **kwargs):
+        super().__init__(**kwargs)
+        if algorithm_type != 'dpmsolver++' or solver_order != 2:
+            raise ValueError("El scheduler nativo solo implementa DPM-Solver++ de orden 2")
+        self.solver_order = solver_order
+
+    def set_timesteps(self, num_inference_steps):
+        self.num_inference_steps = num_inference_steps
+        timesteps = np.linspace(0, self.num_train_timesteps - 1, num_inference_steps + 1).round()[::-1][:-1]
+        timesteps = timesteps.copy().astype(np.int64)
+
+        sigmas = np.array(((1 - self.alphas_cumprod) / self.alphas_cumprod) ** 0.5)
+        sigmas = np.interp(timesteps, np.arange(0, len(sigmas)), sigmas)
+        sigmas = np.concatenate([sigmas, [0.0]]).astype(np.float32)
+
+        self.sigmas = torch.from_numpy(sigmas)
+        self.timesteps = torch.from_numpy(timesteps)
+        self.model_outputs = [None] * self.solver_order
+        self.lower_order_nums = 0
+        self.step_index = 0
+
+    def _alpha_sigma(self, sigma):
+        alpha_t = 1 / (sigma ** 2 + 1) ** 0.5
+        return alpha_t, sigma * alpha_t
+
+    def _lambda(self, sigma):
+        alpha_t, sigma_t = self._alpha_sigma(sigma)
+        return torch.log(alpha_t) - torch.log(sigma_t), alpha_t, sigma_t
+
+    def step(self, model_output, timestep, sample, generator=None):
+        i = self.step_index
+        alpha_s, sigma_s = self._alpha_sigma(self.sigmas[i])
+        x0 = (sample - sigma_s * model_output) / alpha_s
+
+        self.model_outputs = self.model_outputs[1:] + [x0]
+        # Con sigma final 0 el último paso siempre es de primer orden
+        lower_order_final = i == len(self.timesteps) - 1
+
+        lambda_t, alpha_t, sigma_t = self._lambda(self.sigmas[i + 1])
+        lambda_s0, _, sigma_s0 = self._lambda(self.sigmas[i])
+        h = lambda_t - lambda_s0
+
+        if self.lower_order_nums < 1 or lower_order_final:
+            prev_sample = (sigma_t / sigma_s0) * sample - (alpha_t * (torch.exp(-h) - 1.0)) * x0
+        else:
+            lambda_s1, _, _ = self._lambda(self.sigmas[i - 1])
+            m0, m1 = self.model_outputs[-1], self.model_outputs[-2]
+            r0 = (lambda_s0 - lambda_s1) / h
+            d0, d1 = m0, (1.0 / r0) * (m0 - m1)
+            prev_sample = ((sigma_t / sigma_s0) * sample - (alpha_t * (torch.exp(-h) - 1.0)) * d0
+                           - 0.5 * (alpha_t * (torch.exp(-h) - 1.0)) * d1)
+
+        if self.lower_order_nums < self.solver_order:
+            self.lower_order_nums += 1
+        self.step_index += 1
+        return SchedulerOutput(prev_sample.to(model_output.dtype))
+
+
+NATIVE_SCHEDULERS = {
+    'DDPMScheduler': NativeDDPMScheduler,
+    'DDIMScheduler': NativeDDIMScheduler,
+    'DPMSolverMultistepScheduler': NativeDPMSolverMultistepScheduler
+}
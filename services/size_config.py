@@ -0,0 +1,88 @@
+"""
+Tabla de tallas y validación de las peticiones de tallas.
+
+No importa OpenCV ni NumPy: las rutas la usan para validar las tallas pedidas
+sin cargar las dependencias de size_service.
+"""
+import os
+
+# Contorno de cadera (cm) de cada talla. La imagen generada (128 px de ancho)
+# corresponde a la talla base; cada cm de cadera equivale a PIXELS_PER_CM
+# píxeles de ancho (S y L: ±8 cm -> ±8 px)
+SIZE_TABLE = {
+    'xs': {'name': 'Talla XS', 'hip_cm': 84},
+    's': {'name': 'Talla S', 'hip_cm': 92},
+    'm': {'name': 'Talla M', 'hip_cm': 100},
+    'l': {'name': 'Talla L', 'hip_cm': 108},
+    'xl': {'name': 'Talla XL', 'hip_cm': 116},
+    'xxl': {'name': 'Talla XXL', 'hip_cm': 124}
+}
+BASE_SIZE = 'm'
+BASE_WIDTH = 128
+PIXELS_PER_CM = 1.0
+
+# Contornos de cadera admitidos para tallas a medida (cm)
+MIN_HIP_CM = 60
+MAX_HIP_CM = 160
+
+# Tallas que se generan si la petición no indica otras
+DEFAULT_SIZES = [s.strip().lower() for s in os.environ.get('GRADING_SIZES', 's,m,l').split(',') if s.strip()]
+
+
+def resolve_size(size):
+    """
+    Describe una talla de la tabla ('xs' ... 'xxl') o a medida (contorno de cadera en cm).
+
+    Args:
+        size (str | int | float): Código de talla o contorno de cadera en cm
+
+    Returns:
+        dict: {'code', 'name', 'hip_cm', 'delta_px'} donde delta_px es la
+        diferencia de ancho respecto a la talla base
+
+    Raises:
+        ValueError: Si la talla no existe o el contorno está fuera de rango
+    """
+    base_hip = SIZE_TABLE[BASE_SIZE]['hip_cm']
+
+    if isinstance(size, str) and size.strip().lower() in SIZE_TABLE:
+        code = size.strip().lower()
+        hip_cm = SIZE_TABLE[code]['hip_cm']
+        name = SIZE_TABLE[code]['name']
+    else:
+        try:
+            hip_cm = float(size)
+        except (TypeError, ValueError):
+            raise ValueError(f"Talla inválida: {size}")
+        if isinstance(size, bool) or not MIN_HIP_CM <= hip_cm <= MAX_HIP_CM:
+            raise ValueError(f"Contorno de cadera fuera de rango ({MIN_HIP_CM}-{MAX_HIP_CM} cm): {size}")
+        code = f"{hip_cm:g}cm".replace('.', '_')
+        name = f"Cadera {hip_cm:g} cm"
+
+    return {
+        'code': code,
+        'name': name,
+        'hip_cm': hip_cm,
+        'delta_px': int(round((hip_cm - base_hip) * PIXELS_PER_CM))
+    }
+
+
+def resolve_sizes(sizes=None):
+    """
+    Valida una lista de tallas (por defecto DEFAULT_SIZES) y elimina repetidas.
+
+    Returns:
+        list: Descripciones de resolve_size en el orden pedido
+    """
+    if sizes is None:
+        sizes = DEFAULT_SIZES
+    if isinstance(sizes, (str, int, float)):
+        sizes = [sizes]
+    if not isinstance(sizes, (list, tuple)) or not sizes:
+        raise ValueError("La lista de tallas está vacía o no es válida")
+
+    resolved = {}
+    for size in sizes:
+        info = resolve_size(size)
+        resolved.setdefault(info['code'], info)
+    return list(resolved.values())
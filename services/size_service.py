@@ -1,14 +1,22 @@
 import os
+import logging
 import cv2
 import numpy as np
 import base64
 from PIL import Image
 from io import BytesIO
-import time
+import uuid
 
-def process_sizes(original_filename, skirt_type):
+from services.artifact_index import artifact_index
+from services.artifact_store import artifact_store
+from services.metrics import metrics
+from services.size_config import SIZE_TABLE, BASE_SIZE, BASE_WIDTH, resolve_size, resolve_sizes
+
+logger = logging.getLogger(__name__)
+
+def process_sizes(original_filename, skirt_type, sizes=None, encode_base64=True):
     """
-    Procesa una imagen original para generar 3 tallas diferentes:
+    Procesa una imagen original para generar sus tallas. Por defecto (GRADING_SIZES):
     - Talla S: Reducir 8 píxeles horizontalmente por la mitad
     - Talla M: Imagen original 
     - Talla L: Aumentar 8 píxeles horizontalmente por la mitad
@@ -16,109 +24,163 @@ def process_sizes(original_filename, skirt_type):
     Args:
         original_filename (str): Nombre del archivo original
         skirt_type (str): Tipo de falda
+        sizes (list): Tallas de SIZE_TABLE ('xs' ... 'xxl') o contornos de cadera en cm
+        encode_base64 (bool): Incluir cada talla en base64 (size_<talla>_base64)
     
     Returns:
-        dict: Diccionario con las imágenes procesadas en base64 y rutas
+        dict: Diccionario con las imágenes procesadas en base64 y rutas, y el
+            identificador ('token') con el que se registraron en el índice de artefactos
     """
     
     try:
-        # Configurar directorios
-        downloads_dir = os.path.join('static', 'downloads')
-        tallas_dir = os.path.join('static', 'tallas')
-        
-        # Crear directorio de tallas si no existe
-        if not os.path.exists(tallas_dir):
-            os.makedirs(tallas_dir)
-        
         # Ruta de imagen original
-        original_path = os.path.join(downloads_dir, original_filename)
+        original_path = artifact_store.resolve('downloads', original_filename)
         
-        if not os.path.exists(original_path):
-            print(f"Error: No se encontró el archivo {original_path}")
+        if original_path is None:
+            logger.error(f"Error: No se encontró el archivo {original_filename}")
             return None
         
         # Cargar imagen original con OpenCV (128x192 píxeles)
         img_original = cv2.imread(original_path)
         if img_original is None:
-            print(f"Error: No se pudo cargar la imagen {original_path}")
+            logger.error(f"Error: No se pudo cargar la imagen {original_path}")
             return None
         
         height, width = img_original.shape[:2]
-        print(f"Imagen original: {width}x{height} píxeles")
+        logger.info(f"Imagen original: {width}x{height} píxeles")
         
-        # Generar timestamp para nombres únicos
-        timestamp = int(time.time())
+        # Un identificador aleatorio por petición: nombres únicos entre peticiones simultáneas
+        token = uuid.uuid4().hex[:12]
         
-        # TALLA S: Reducir 8 píxeles por la mitad (120x192)
-        size_s_img = generate_size_s(img_original)
-        size_s_filename = f"size_s_{skirt_type}_{timestamp}.png"
-        size_s_path = os.path.join(tallas_dir, size_s_filename)
-        cv2.imwrite(size_s_path, size_s_img)
-        
-        # TALLA M: Imagen original (128x192)
-        size_m_img = img_original.copy()
-        size_m_filename = f"size_m_{skirt_type}_{timestamp}.png"
-        size_m_path = os.path.join(tallas_dir, size_m_filename)
-        cv2.imwrite(size_m_path, size_m_img)
+        result = {'sizes': []}
+        size_paths = {}
+        for size in encode_sizes(img_original, sizes):
+            code = size['size']
+            size_filename = f"size_{code}_{skirt_type}_{token}.png"
+            size_path = artifact_store.write('tallas', size_filename, size['png_bytes'])
+            
+            # El mismo PNG que se guarda se envía en base64, sin volver a codificarlo
+            if encode_base64:
+                result[f'size_{code}_base64'] = base64.b64encode(size['png_bytes']).decode('utf-8')
+            result[f'size_{code}_filename'] = size_filename
+            result[f'size_{code}_path'] = f'/tallas/{size_filename}'
+            result['sizes'].append({
+                'size': code,
+                'name': size['name'],
+                'hip_contour': size['hip_contour'],
+                'width': size['width'],
+                'filename': size_filename,
+                'path': f'/tallas/{size_filename}'
+            })
+            size_paths[code] = os.path.abspath(size_path)
         
-        # TALLA L: Aumentar 8 píxeles por la mitad (136x192)
-        size_l_img = generate_size_l(img_original)
-        size_l_filename = f"size_l_{skirt_type}_{timestamp}.png"
-        size_l_path = os.path.join(tallas_dir, size_l_filename)
-        cv2.imwrite(size_l_path, size_l_img)
+        # Las tallas quedan ligadas a su diseño base para la generación de patrones
+        artifact_index.record(original_filename, [
+            ('size', size['size'], size['filename'], size_paths[size['size']])
+            for size in result['sizes']
+        ], token)
+        result['token'] = token
         
-        # Convertir a base64
-        size_s_base64 = image_to_base64(size_s_img)
-        size_m_base64 = image_to_base64(size_m_img)
-        size_l_base64 = image_to_base64(size_l_img)
-        
-        return {
-            'size_s_base64': size_s_base64,
-            'size_s_filename': size_s_filename,
-            'size_s_path': f'/static/tallas/{size_s_filename}',
-            
-            'size_m_base64': size_m_base64,
-            'size_m_filename': size_m_filename,
-            'size_m_path': f'/static/tallas/{size_m_filename}',
-            
-            'size_l_base64': size_l_base64,
-            'size_l_filename': size_l_filename,
-            'size_l_path': f'/static/tallas/{size_l_filename}'
-        }
+        return result
         
     except Exception as e:
-        print(f"Error procesando tallas: {e}")
+        logger.error(f"Error procesando tallas: {e}")
         return None
 
-def generate_size_s(img_original):
+@metrics.timed('sizing')
+def encode_sizes(img_original, sizes=None):
     """
-    Genera talla S reduciendo 8 píxeles horizontalmente por la mitad.
-    Mantiene la continuidad de los bordes superior e inferior.
+    Genera las tallas de una imagen y codifica cada una a PNG una sola vez.
     
     Args:
-        img_original: Imagen OpenCV (128x192)
+        img_original: Imagen OpenCV (BGR) de la talla base
+        sizes (list): Tallas de SIZE_TABLE o contornos de cadera en cm (por defecto GRADING_SIZES)
     
     Returns:
-        np.array: Imagen procesada (120x192)
+        list: Por talla, {'size', 'name', 'hip_contour', 'width', 'image': array BGR, 'png_bytes'}
     """
-    height, width = img_original.shape[:2]
-    mid_point = width // 2  # punto 64
+    size_infos = resolve_sizes(sizes)
+    graded = grade_sizes(img_original, [info['delta_px'] for info in size_infos])
+    
+    encoded = []
+    for info, size_img in zip(size_infos, graded):
+        ok, png = cv2.imencode('.png', size_img)
+        if not ok:
+            raise ValueError(f"No se pudo codificar la talla {info['code']}")
+        encoded.append({
+            'size': info['code'],
+            'name': info['name'],
+            'hip_contour': f"{info['hip_cm']:g} cm",
+            'width': size_img.shape[1],
+            'image': size_img,
+            'png_bytes': png.tobytes()
+        })
+    return encoded
+
+def grade_sizes(img_original, deltas):
+    """
+    Genera todas las tallas de una imagen en una sola llamada.
     
-    # Dividir la imagen en dos mitades
-    left_half = img_original[:, :mid_point]  # 0:64
-    right_half = img_original[:, mid_point:]  # 64:128
+    Las mitades de la imagen se recortan una vez y cada talla solo necesita
+    dos cv2.resize y un suavizado vectorizado; las tallas iguales se calculan
+    una sola vez.
     
-    # Reducir cada mitad en 4 píxeles (total 8 píxeles)
-    left_reduced = cv2.resize(left_half, (mid_point - 4, height), interpolation=cv2.INTER_LINEAR)
-    right_reduced = cv2.resize(right_half, (mid_point - 4, height), interpolation=cv2.INTER_LINEAR)
+    Args:
+        img_original: Imagen OpenCV de la talla base
+        deltas (list): Diferencia de ancho en píxeles de cada talla respecto a la base
+    
+    Returns:
+        list: Imágenes de cada talla, en el orden de deltas
+    """
+    height, width = img_original.shape[:2]
+    mid_point = width // 2
     
-    # Unir las mitades
-    size_s_img = np.concatenate([left_reduced, right_reduced], axis=1)
+    # Dividir la imagen en dos mitades
+    left_half = img_original[:, :mid_point]
+    right_half = img_original[:, mid_point:]
+    
+    graded = {}
+    for delta in deltas:
+        if delta in graded:
+            continue
+        if delta == 0:
+            graded[delta] = img_original.copy()
+            continue
+        
+        # Repartir la diferencia entre las dos mitades (S: -4 y -4, L: +4 y +4)
+        left_delta = delta // 2
+        right_delta = delta - left_delta
+        left_resized = cv2.resize(left_half, (mid_point + left_delta, height), interpolation=cv2.INTER_LINEAR)
+        right_resized = cv2.resize(right_half, (width - mid_point + right_delta, height),
+                                   interpolation=cv2.INTER_LINEAR)
+        size_img = np.concatenate([left_resized, right_resized], axis=1)
+        
+        if delta < 0:
+            # Suavizar la unión en el centro para mantener continuidad
+            graded[delta] = smooth_center_join(size_img)
+        else:
+            # Clonar píxeles en los bordes para mantener continuidad
+            graded[delta] = clone_edge_pixels(size_img)
+    
+    # Cada talla repetida recibe su propia copia
+    results, returned = [], set()
+    for delta in deltas:
+        results.append(graded[delta].copy() if delta in returned else graded[delta])
+        returned.add(delta)
+    return results
+
+def generate_size_s(img_original):
+    """
+    Genera talla S reduciendo 8 píxeles horizontalmente por la mitad.
+    Mantiene la continuidad de los bordes superior e inferior.
     
-    # Suavizar la unión en el centro para mantener continuidad
-    size_s_img = smooth_center_join(size_s_img)
+    Args:
+        img_original: Imagen OpenCV (128x192)
     
-    return size_s_img
+    Returns:
+        np.array: Imagen procesada (120x192)
+    """
+    return grade_sizes(img_original, [resolve_size('s')['delta_px']])[0]
 
 def generate_size_l(img_original):
     """
@@ -131,31 +193,15 @@ def generate_size_l(img_original):
     Returns:
         np.array: Imagen procesada (136x192)
     """
-    height, width = img_original.shape[:2]
-    mid_point = width // 2  # punto 64
-    
-    # Dividir la imagen en dos mitades
-    left_half = img_original[:, :mid_point]  # 0:64
-    right_half = img_original[:, mid_point:]  # 64:128
-    
-    # Expandir cada mitad en 4 píxeles (total 8 píxeles)
-    left_expanded = cv2.resize(left_half, (mid_point + 4, height), interpolation=cv2.INTER_LINEAR)
-    right_expanded = cv2.resize(right_half, (mid_point + 4, height), interpolation=cv2.INTER_LINEAR)
-    
-    # Unir las mitades
-    size_l_img = np.concatenate([left_expanded, right_expanded], axis=1)
-    
-    # Clonar píxeles en los bordes para mantener continuidad
-    size_l_img = clone_edge_pixels(size_l_img)
-    
-    return size_l_img
+    return grade_sizes(img_original, [resolve_size('l')['delta_px']])[0]
 
-def smooth_center_join(img):
+def smooth_center_join(img, blend_width=4):
     """
-    Suaviza la unión en el centro de la imagen para talla S.
+    Suaviza la unión en el centro de la imagen para las tallas reducidas.
     
     Args:
         img: Imagen OpenCV
+        blend_width (int): Píxeles a cada lado del centro
     
     Returns:
         np.array: Imagen con unión suavizada
@@ -163,26 +209,23 @@ def smooth_center_join(img):
     height, width = img.shape[:2]
     center = width // 2
     
-    # Crear una máscara de suavizado en el centro
-    blend_width = 4  # píxeles a cada lado del centro
-    
     if center - blend_width >= 0 and center + blend_width < width:
-        for i in range(height):
-            # Obtener valores de los píxeles adyacentes al centro
-            left_pixels = img[i, center - blend_width:center]
-            right_pixels = img[i, center:center + blend_width]
-            
-            # Crear transición suave
-            for j in range(blend_width):
-                alpha = j / blend_width
-                img[i, center - blend_width + j] = (1 - alpha) * left_pixels[j] + alpha * left_pixels[-1]
-                img[i, center + j] = (1 - alpha) * right_pixels[0] + alpha * right_pixels[j]
+        # Pesos de la transición, con una dimensión por canal para operar sobre todas las filas
+        alpha = (np.arange(blend_width) / blend_width).reshape((1, blend_width) + (1,) * (img.ndim - 2))
+        left_pixels = img[:, center - blend_width:center]
+        right_pixels = img[:, center:center + blend_width]
+        
+        # Crear transición suave hacia el píxel más cercano al centro de cada lado
+        left_blend = (1 - alpha) * left_pixels + alpha * left_pixels[:, -1:]
+        right_blend = (1 - alpha) * right_pixels[:, :1] + alpha * right_pixels
+        img[:, center - blend_width:center] = left_blend
+        img[:, center:center + blend_width] = right_blend
     
     return img
 
 def clone_edge_pixels(img):
     """
-    Clona píxeles en los bordes para mantener continuidad en talla L.
+    Clona píxeles en los bordes para mantener continuidad en las tallas ampliadas.
     
     Args:
         img: Imagen OpenCV
@@ -196,25 +239,20 @@ def clone_edge_pixels(img):
     clone_rows = 2
     
     # Clonar borde superior
-    for i in range(clone_rows):
-        img[i] = np.mean([img[i], img[clone_rows]], axis=0).astype(np.uint8)
+    img[:clone_rows] = ((img[:clone_rows].astype(np.float64) + img[clone_rows]) / 2).astype(np.uint8)
     
     # Clonar borde inferior
-    for i in range(height - clone_rows, height):
-        img[i] = np.mean([img[i], img[height - clone_rows - 1]], axis=0).astype(np.uint8)
+    img[height - clone_rows:] = ((img[height - clone_rows:].astype(np.float64)
+                                  + img[height - clone_rows - 1]) / 2).astype(np.uint8)
     
-    # Suavizar bordes laterales
+    # Suavizar bordes laterales. Cada columna depende de la ya suavizada a su
+    # lado, así que se recorren las columnas (dos por borde) y se opera sobre
+    # todas las filas a la vez. La suma es en uint8, como en la versión original.
     smooth_width = 3
-    for i in range(height):
-        # Borde izquierdo
-        for j in range(smooth_width):
-            if j > 0:
-                img[i, j] = (img[i, j] + img[i, j-1]) // 2
-        
-        # Borde derecho
-        for j in range(width - smooth_width, width):
-            if j < width - 1:
-                img[i, j] = (img[i, j] + img[i, j+1]) // 2
+    for j in range(1, smooth_width):
+        img[:, j] = (img[:, j] + img[:, j - 1]) // 2
+    for j in range(width - smooth_width, width - 1):
+        img[:, j] = (img[:, j] + img[:, j + 1]) // 2
     
     return img
 
@@ -243,7 +281,7 @@ def image_to_base64(img):
         return img_base64
         
     except Exception as e:
-        print(f"Error convirtiendo imagen a base64: {e}")
+        logger.error(f"Error convirtiendo imagen a base64: {e}")
         return None
 
 def get_size_info(size_type):
@@ -251,27 +289,16 @@ def get_size_info(size_type):
     Obtiene información de tallas.
     
     Args:
-        size_type (str): 's', 'm', o 'l'
+        size_type (str): Talla de SIZE_TABLE ('xs', 's', 'm', 'l', 'xl', 'xxl')
     
     Returns:
         dict: Información de la talla
     """
-    size_info = {
-        's': {
-            'name': 'Talla S',
-            'hip_contour': '92 cm',
-            'width': 120
-        },
-        'm': {
-            'name': 'Talla M', 
-            'hip_contour': '100 cm',
-            'width': 128
-        },
-        'l': {
-            'name': 'Talla L',
-            'hip_contour': '108 cm', 
-            'width': 136
-        }
-    }
+    size_type = size_type.lower() if size_type.lower() in SIZE_TABLE else BASE_SIZE
+    info = resolve_size(size_type)
     
-    return size_info.get(size_type.lower(), size_info['m'])
\ No newline at end of file
+    return {
+        'name': info['name'],
+        'hip_contour': f"{info['hip_cm']:g} cm",
+        'width': BASE_WIDTH + info['delta_px']
+    }
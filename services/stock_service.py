@@ -0,0 +1,209 @@
+import os
+import logging
+import time
+import threading
+from collections import deque
+
+from services.generation_config import (
+    DESIGN_MODELS, PATTERN_MODELS, DEFAULT_SAMPLER, DEFAULT_STEPS, get_model_path
+)
+from services.inference_scheduler import inference_scheduler
+from services.artifact_store import artifact_store
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Stock objetivo por defecto para cada (model_type, skirt_type) con checkpoint disponible
+STOCK_DEFAULT_TARGET = int(os.environ.get('STOCK_DEFAULT_TARGET', 0))
+# Objetivos concretos: "pattern:patrones_varios_disenos=4,design:recta=2"
+STOCK_TARGETS = os.environ.get('STOCK_TARGETS', '')
+# Segundos sin peticiones de usuarios antes de reponer stock
+STOCK_IDLE_SECONDS = float(os.environ.get('STOCK_IDLE_SECONDS', 2))
+# Imágenes generadas por cada lote de reposición
+STOCK_REFILL_BATCH = int(os.environ.get('STOCK_REFILL_BATCH', 1))
+# Segundos de espera tras un fallo de reposición de un modelo
+STOCK_RETRY_SECONDS = float(os.environ.get('STOCK_RETRY_SECONDS', 300))
+
+
+def parse_stock_targets(text=STOCK_TARGETS, default_target=STOCK_DEFAULT_TARGET):
+    """
+    Calcula el stock objetivo de cada modelo disponible.
+
+    Returns:
+        dict: {(model_type, skirt_type): objetivo} solo con objetivos mayores que 0
+    """
+    targets = {}
+    for model_type, models in (('design', DESIGN_MODELS), ('pattern', PATTERN_MODELS)):
+        for skirt_type in models:
+            if os.path.exists(get_model_path(model_type, skirt_type)):
+                targets[(model_type, skirt_type)] = default_target
+
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        key, value = item.split('=')
+        model_type, skirt_type = key.strip().split(':')
+        targets[(model_type, skirt_type)] = int(value)
+
+    return {key: target for key, target in targets.items() if target > 0}
+
+
+class StockPool:
+    """
+    Stock de diseños pre-generados por (model_type, skirt_type).
+
+    Las peticiones sin parámetros (sampler y pasos por defecto, una imagen, sin
+    semilla) se sirven desde el stock al instante. Un hilo de fondo repone el
+    stock con el sampler por defecto solo mientras el planificador de inferencia
+    está ocioso.
+    """
+
+    def __init__(self, targets=None, idle_seconds=STOCK_IDLE_SECONDS, refill_batch=STOCK_REFILL_BATCH):
+        self.targets = parse_stock_targets() if targets is None else targets
+        self.idle_seconds = idle_seconds
+        self.refill_batch = max(1, refill_batch)
+        self._stock = {key: deque() for key in self.targets}
+        self._retry_at = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.served = 0
+        self.misses = 0
+        self.refilled = 0
+        self.refill_errors = 0
+        self.refill_seconds = 0.0
+        self._refill_times = deque(maxlen=100)
+
+    def start(self):
+        """Arranca el hilo de reposición si hay algún objetivo configurado."""
+        with self._lock:
+            if self._thread is not None or not self.targets:
+                return
+            self._thread = threading.Thread(target=self._refill_loop, name='stock-refill', daemon=True)
+            self._thread.start()
+        logger.info(f"Stock de diseños activo: {len(self.targets)} modelos")
+
+    def matches(self, params):
+        """Indica si una petición de generación puede servirse desde el stock."""
+        return (params.get('sampler') == DEFAULT_SAMPLER and params.get('steps') == DEFAULT_STEPS
+                and params.get('num_images', 1) == 1 and not params.get('preview_every')
+                and params.get('seed') is None)
+
+    def take(self, model_type, skirt_type):
+        """
+        Toma un diseño del stock.
+
+        Returns:
+            dict: Resultado con el mismo formato que generate_image, o None si no hay stock
+        """
+        with self._lock:
+            stock = self._stock.get((model_type, skirt_type))
+            image = None
+            while stock and image is None:
+                candidate = stock.popleft()
+                # El archivo pudo borrarse desde que se generó
+                if os.path.exists(candidate['output_path']):
+                    image = candidate
+            if image is None:
+                self.misses += 1
+            else:
+                self.served += 1
+        metrics.inc('cache_requests_total', cache='stock', result='miss' if image is None else 'hit')
+        self._wakeup.set()
+
+        if image is None:
+            return None
+        return {
+            'image_path': image['image_path'],
+            'image_base64': image['image_base64'],
+            'images': [{key: image[key] for key in ('filename', 'image_path', 'image_base64', 'seed')}],
+            'seed': image['seed'],
+            'sampler': image['sampler'],
+            'steps': image['steps'],
+            'from_stock': True
+        }
+
+    def _next_key(self):
+        """Modelo con mayor déficit relativo de stock (o None si todo está lleno)."""
+        now = time.monotonic()
+        with self._lock:
+            best, best_ratio = None, 0.0
+            for key, target in self.targets.items():
+                if self._retry_at.get(key, 0) > now:
+                    continue
+                ratio = 1.0 - len(self._stock[key]) / target
+                if ratio > best_ratio:
+                    best, best_ratio = key, ratio
+            if best is None:
+                return None, 0
+            return best, min(self.refill_batch, self.targets[best] - len(self._stock[best]))
+
+    def _refill_loop(self):
+        while True:
+            key, count = self._next_key()
+            if key is None:
+                self._wakeup.wait(timeout=30)
+                self._wakeup.clear()
+                continue
+
+            if not inference_scheduler.is_idle(self.idle_seconds):
+                time.sleep(max(0.5, self.idle_seconds / 2))
+                continue
+
+            self._refill(key, count)
+
+    def _refill(self, key, count):
+        model_type, skirt_type = key
+        started = time.monotonic()
+        try:
+            result = inference_scheduler.submit(model_type, skirt_type, DEFAULT_SAMPLER, DEFAULT_STEPS, count,
+                                                background=True)
+        except Exception as e:
+            result = None
+            logger.error(f"Error reponiendo stock de {model_type} - {skirt_type}: {e}")
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            if not result:
+                self.refill_errors += 1
+                self._retry_at[key] = time.monotonic() + STOCK_RETRY_SECONDS
+                return
+            for image in result['images']:
+                self._stock[key].append(dict(
+                    image,
+                    output_path=artifact_store.path('downloads', image['filename']),
+                    sampler=result['sampler'],
+                    steps=result['steps']
+                ))
+                self._refill_times.append(time.monotonic())
+            self.refilled += len(result['images'])
+            self.refill_seconds += elapsed
+
+    def filenames(self):
+        """Archivos de los diseños en stock (no deben borrarse mientras esperan a servirse)."""
+        with self._lock:
+            return [image['filename'] for stock in self._stock.values() for image in stock]
+
+    def stats(self):
+        """Niveles de stock por modelo y ritmo de reposición."""
+        with self._lock:
+            now = time.monotonic()
+            rate = 0.0
+            if len(self._refill_times) > 1:
+                window = now - self._refill_times[0]
+                rate = len(self._refill_times) / window * 60 if window > 0 else 0.0
+            return {
+                'levels': {f"{model_type}:{skirt_type}": {'stock': len(self._stock[(model_type, skirt_type)]),
+                                                          'target': target}
+                           for (model_type, skirt_type), target in self.targets.items()},
+                'served': self.served,
+                'misses': self.misses,
+                'refilled': self.refilled,
+                'refill_errors': self.refill_errors,
+                'refill_per_minute': rate,
+                'avg_refill_seconds': self.refill_seconds / self.refilled if self.refilled else 0.0,
+                'running': self._thread is not None
+            }
+
+# Instancia global del stock
+stock_pool = StockPool()
@@ -0,0 +1,298 @@
+import os
+import logging
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from services.artifact_index import artifact_index
+from services.artifact_store import ARTIFACT_STORE_ROOTS
+from services.artifact_delivery import artifact_delivery, GZIP_CACHE_DIR
+from services.result_cache import RESULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Límites por defecto de cada directorio de artefactos (0: sin límite)
+STORAGE_MAX_MB = float(os.environ.get('STORAGE_MAX_MB', 1024))
+STORAGE_MAX_FILES = int(os.environ.get('STORAGE_MAX_FILES', 20000))
+STORAGE_TTL_HOURS = float(os.environ.get('STORAGE_TTL_HOURS', 168))
+# Límites concretos: "patterns:max_mb=2048,gzip:ttl_hours=24"
+STORAGE_LIMITS = os.environ.get('STORAGE_LIMITS', '')
+# Segundos entre barridos del hilo de fondo (0: sin barrido automático)
+STORAGE_SWEEP_SECONDS = float(os.environ.get('STORAGE_SWEEP_SECONDS', 300))
+# Antigüedad mínima (segundos) de un archivo para poder borrarlo: protege las
+# escrituras en curso y los archivos recién devueltos al cliente
+STORAGE_MIN_AGE_SECONDS = float(os.environ.get('STORAGE_MIN_AGE_SECONDS', 300))
+# Al superar una cuota se borra hasta quedar en esta fracción del límite
+STORAGE_LOW_WATER = 0.9
+
+# Directorios gestionados: los espacios del almacén de artefactos, las copias gzip
+# y la caché de resultados (si está activada)
+STORAGE_DIRS = dict(ARTIFACT_STORE_ROOTS, gzip=GZIP_CACHE_DIR)
+if RESULT_CACHE_DIR:
+    STORAGE_DIRS['results'] = RESULT_CACHE_DIR
+LIMIT_FIELDS = ('max_mb', 'max_files', 'ttl_hours')
+
+
+def parse_storage_limits(text=STORAGE_LIMITS, directories=STORAGE_DIRS):
+    """
+    Calcula los límites de cada directorio gestionado.
+
+    Returns:
+        dict: {nombre: {'max_bytes', 'max_files', 'ttl_seconds'}} (0: sin límite)
+    """
+    limits = {name: {'max_mb': STORAGE_MAX_MB, 'max_files': STORAGE_MAX_FILES, 'ttl_hours': STORAGE_TTL_HOURS}
+              for name in directories}
+
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        key, value = item.split('=')
+        name, field = key.strip().split(':')
+        if name not in limits or field not in LIMIT_FIELDS:
+            raise ValueError(f"Límite de almacenamiento desconocido: {key.strip()}")
+        limits[name][field] = float(value)
+
+    return {name: {'max_bytes': int(limit['max_mb'] * 1024 * 1024),
+                   'max_files': int(limit['max_files']),
+                   'ttl_seconds': limit['ttl_hours'] * 3600}
+            for name, limit in limits.items()}
+
+
+def scan_files(directory):
+    """Archivos de un directorio y sus subdirectorios: [(ruta, tamaño, mtime), ...]."""
+    files = []
+    pending = [directory]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((entry.path, stat.st_size, stat.st_mtime))
+            except FileNotFoundError:
+                continue
+    return files
+
+
+class StorageManager:
+    """
+    Cuotas y caducidad de los artefactos generados en disco.
+
+    Un hilo de fondo barre periódicamente cada directorio gestionado y borra,
+    primero, los archivos sin usar desde hace más de su TTL y, después, si el
+    directorio supera su cuota de bytes o de archivos, los usados hace más
+    tiempo (LRU) hasta bajar de STORAGE_LOW_WATER de la cuota. El último uso
+    de un archivo es su última descarga (touch) o, si no se ha descargado, su
+    fecha de modificación.
+
+    No se borran los archivos de trabajos en curso (hold y protectores), los
+    de diseños fijados en el índice de artefactos (con todos sus derivados) ni
+    los más recientes que STORAGE_MIN_AGE_SECONDS. Los barridos no bloquean
+    las peticiones: solo toman el cerrojo para leer el estado en memoria.
+    """
+
+    def __init__(self, directories=STORAGE_DIRS, limits=None, sweep_seconds=STORAGE_SWEEP_SECONDS,
+                 min_age_seconds=STORAGE_MIN_AGE_SECONDS):
+        self.directories = dict(directories)
+        self.limits = parse_storage_limits(directories=self.directories) if limits is None else limits
+        self.sweep_seconds = sweep_seconds
+        self.min_age_seconds = min_age_seconds
+        self._last_access = {}
+        self._held = Counter()
+        self._protectors = []
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._thread = None
+        self._usage = {name: {'files': 0, 'bytes': 0} for name in self.directories}
+        self._evicted = {name: Counter() for name in self.directories}
+        self.sweeps = 0
+        self.last_sweep_at = None
+        self.last_sweep_seconds = 0.0
+        self.errors = 0
+
+    def start(self):
+        """Arranca el hilo de barrido si está configurado."""
+        with self._lock:
+            if self._thread is not None or self.sweep_seconds <= 0:
+                return
+            self._thread = threading.Thread(target=self._sweep_loop, name='storage-sweeper', daemon=True)
+            self._thread.start()
+        logger.info(f"Gestor de almacenamiento activo: barrido cada {self.sweep_seconds:g} s")
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"Error en el barrido de almacenamiento: {e}")
+            time.sleep(self.sweep_seconds)
+
+    def add_protector(self, protector):
+        """Registra una función que devuelve nombres de archivo que no deben borrarse."""
+        with self._lock:
+            self._protectors.append(protector)
+
+    @contextmanager
+    def hold(self, *filenames):
+        """Protege unos archivos (y, si son diseños, sus derivados) mientras dura el bloque."""
+        filenames = [filename for filename in filenames if filename]
+        with self._lock:
+            self._held.update(filenames)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held.subtract(filenames)
+                self._held += Counter()
+
+    def touch(self, path):
+        """Registra un uso (descarga) de un archivo para el orden LRU."""
+        with self._lock:
+            self._last_access[os.path.abspath(path)] = time.time()
+
+    def protected_filenames(self):
+        """Nombres de archivo que el barrido no puede borrar."""
+        with self._lock:
+            roots = set(self._held)
+            protectors = list(self._protectors)
+        for protector in protectors:
+            roots.update(protector())
+        roots.update(artifact_index.pinned())
+
+        protected = set()
+        for filename in roots:
+            protected.update(artifact_index.filenames_for(filename))
+        return protected
+
+    def sweep(self):
+        """
+        Barre todos los directorios gestionados.
+
+        Returns:
+            dict: Archivos borrados por directorio
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            return {}
+        try:
+            started = time.monotonic()
+            protected = self.protected_filenames()
+            evicted = {name: self._sweep_directory(name, protected) for name in self.directories}
+            
+            # Olvida los usos de archivos que ya no existen (borrados por otros medios)
+            with self._lock:
+                accessed = list(self._last_access)
+            missing = [path for path in accessed if not os.path.exists(path)]
+            with self._lock:
+                for path in missing:
+                    self._last_access.pop(path, None)
+                self.sweeps += 1
+                self.last_sweep_at = time.time()
+                self.last_sweep_seconds = time.monotonic() - started
+            return evicted
+        finally:
+            self._sweep_lock.release()
+
+    def _sweep_directory(self, name, protected):
+        limits = self.limits[name]
+        now = time.time()
+        with self._lock:
+            last_access = dict(self._last_access)
+
+        files = []
+        for path, size, mtime in scan_files(self.directories[name]):
+            last_used = max(mtime, last_access.get(os.path.abspath(path), 0))
+            files.append((last_used, path, size, mtime))
+        files.sort()
+        total_files = len(files)
+        total_bytes = sum(size for _, _, size, _ in files)
+
+        def evictable(path, mtime):
+            return now - mtime >= self.min_age_seconds and os.path.basename(path) not in protected
+
+        evicted = Counter()
+        kept = []
+        for last_used, path, size, mtime in files:
+            if limits['ttl_seconds'] and now - last_used > limits['ttl_seconds'] and evictable(path, mtime):
+                if self._evict(path):
+                    evicted['ttl'] += 1
+                    evicted['bytes'] += size
+                    total_files -= 1
+                    total_bytes -= size
+                    continue
+            kept.append((path, size, mtime))
+
+        over_bytes = limits['max_bytes'] and total_bytes > limits['max_bytes']
+        over_files = limits['max_files'] and total_files > limits['max_files']
+        if over_bytes or over_files:
+            target_bytes = limits['max_bytes'] * STORAGE_LOW_WATER
+            target_files = limits['max_files'] * STORAGE_LOW_WATER
+            # kept sigue ordenado por último uso: los primeros son los menos recientes
+            for path, size, mtime in kept:
+                if ((not limits['max_bytes'] or total_bytes <= target_bytes)
+                        and (not limits['max_files'] or total_files <= target_files)):
+                    break
+                if evictable(path, mtime) and self._evict(path):
+                    evicted['quota'] += 1
+                    evicted['bytes'] += size
+                    total_files -= 1
+                    total_bytes -= size
+
+        with self._lock:
+            self._usage[name] = {'files': total_files, 'bytes': total_bytes}
+            self._evicted[name].update(evicted)
+        if evicted['ttl'] or evicted['quota']:
+            logger.info(f"Almacenamiento {name}: borrados {evicted['ttl']} archivos caducados y "
+                        f"{evicted['quota']} por cuota ({evicted['bytes'] / 1024 / 1024:.1f} MB)")
+        return evicted['ttl'] + evicted['quota']
+
+    def _evict(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"No se pudo borrar {path}: {e}")
+            with self._lock:
+                self.errors += 1
+            return False
+        artifact_index.forget(os.path.basename(path))
+        artifact_delivery.forget(path)
+        with self._lock:
+            self._last_access.pop(os.path.abspath(path), None)
+        return True
+
+    def stats(self):
+        """Uso de disco, cuotas y archivos borrados por directorio (según el último barrido)."""
+        with self._lock:
+            return {
+                'directories': {
+                    name: {
+                        'files': self._usage[name]['files'],
+                        'bytes': self._usage[name]['bytes'],
+                        'max_files': self.limits[name]['max_files'],
+                        'max_bytes': self.limits[name]['max_bytes'],
+                        'ttl_seconds': self.limits[name]['ttl_seconds'],
+                        'evicted_ttl': self._evicted[name]['ttl'],
+                        'evicted_quota': self._evicted[name]['quota'],
+                        'evicted_bytes': self._evicted[name]['bytes']
+                    }
+                    for name in self.directories
+                },
+                'held': len(self._held),
+                'sweeps': self.sweeps,
+                'last_sweep_at': self.last_sweep_at,
+                'last_sweep_seconds': self.last_sweep_seconds,
+                'errors': self.errors,
+                'running': self._thread is not None
+            }
+
+# Instancia global del gestor de almacenamiento
+storage_manager = StorageManager()
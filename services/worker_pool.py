@@ -0,0 +1,313 @@
+import os
+import logging
+import base64
+import atexit
+import itertools
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from services.metrics import configure_logging, call_forwarding, merge_result
+
+logger = logging.getLogger(__name__)
+
+# Modo de ejecución de la inferencia y el post-procesado: 'thread' (en el proceso
+# web) o 'process' (en procesos de trabajo dedicados)
+EXECUTION_MODE = os.environ.get('EXECUTION_MODE', 'thread')
+# Número de procesos de trabajo
+WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES', 2))
+# Hilos de PyTorch por proceso (intra-op: dentro de un operador; inter-op: entre operadores)
+TORCH_INTRA_OP_THREADS = int(os.environ.get('TORCH_INTRA_OP_THREADS', 0))
+TORCH_INTER_OP_THREADS = int(os.environ.get('TORCH_INTER_OP_THREADS', 0))
+# Segundos que call_each espera a que todos los procesos de trabajo queden libres
+WORKER_BARRIER_TIMEOUT = 600
+# Fijación de núcleos: '' (desactivada), 'auto' (reparte los núcleos disponibles en
+# bloques contiguos, uno por proceso) o listas explícitas separadas por ';' ("0-3;4-7")
+WORKER_CPU_AFFINITY = os.environ.get('WORKER_CPU_AFFINITY', '')
+
+# Estado propio de cada proceso de trabajo
+_in_worker = False
+_worker_events = None
+_worker_cancelled = None
+
+
+def parse_cpu_list(text):
+    """Convierte "0-3,8" en [0, 1, 2, 3, 8]."""
+    cpus = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def affinity_sets(workers, affinity=WORKER_CPU_AFFINITY):
+    """
+    Calcula el conjunto de núcleos de cada proceso de trabajo.
+
+    Returns:
+        list: Una lista de núcleos por proceso, o None si no hay fijación
+    """
+    if not affinity or not hasattr(os, 'sched_getaffinity'):
+        return None
+    if affinity == 'auto':
+        cpus = sorted(os.sched_getaffinity(0))
+        per_worker = max(1, len(cpus) // workers)
+        sets = []
+        for i in range(workers):
+            start = (i * per_worker) % len(cpus)
+            sets.append(cpus[start:start + per_worker])
+        return sets
+    sets = [parse_cpu_list(part) for part in affinity.split(';') if part.strip()]
+    return [sets[i % len(sets)] for i in range(workers)]
+
+
+def _init_worker(slots, cpu_sets, intra_threads, inter_threads, events, cancelled):
+    """Inicializa un proceso de trabajo: hilos de PyTorch y núcleos asignados."""
+    global _in_worker, _worker_events, _worker_cancelled
+    configure_logging()
+    _in_worker = True
+    _worker_events = events
+    _worker_cancelled = cancelled
+
+    slot = slots.get()
+    if cpu_sets:
+        os.sched_setaffinity(0, cpu_sets[slot])
+        if not intra_threads:
+            intra_threads = len(cpu_sets[slot])
+
+    import torch
+    if intra_threads:
+        torch.set_num_threads(intra_threads)
+    if inter_threads:
+        torch.set_num_interop_threads(inter_threads)
+    logger.info(f"Proceso de trabajo {slot} (pid {os.getpid()}): {torch.get_num_threads()} hilos"
+                + (f", núcleos {cpu_sets[slot]}" if cpu_sets else ""))
+
+
+def in_worker_process():
+    """Si el código se ejecuta dentro de un proceso de trabajo del pool."""
+    return _in_worker
+
+
+def _resolve(target):
+    """Resuelve "modulo:atributo.metodo" a un objeto invocable."""
+    module_name, attr_path = target.split(':')
+    obj = importlib.import_module(module_name)
+    for attr in attr_path.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _call_in_worker(task_id, target, args, kwargs, callback_names):
+    from services.generation_config import GenerationCancelled
+    func = _resolve(target)
+
+    def make_forwarder(name):
+        def forward(*callback_args):
+            if task_id in _worker_cancelled:
+                raise GenerationCancelled()
+            _worker_events.put((task_id, name, callback_args))
+        return forward
+
+    for name in callback_names:
+        kwargs[name] = make_forwarder(name)
+    # Las métricas del proceso de trabajo vuelven con el resultado
+    return call_forwarding(func, *args, **kwargs)
+
+
+def _call_at_barrier(barrier, target, args, kwargs):
+    # Cada proceso ejecuta una tarea a la vez: si todas esperan en la barrera,
+    # están repartidas en procesos distintos
+    barrier.wait(WORKER_BARRIER_TIMEOUT)
+    return _resolve(target)(*args, **kwargs)
+
+
+class WorkerPool:
+    """
+    Pool de procesos dedicados a la inferencia y al post-procesado.
+
+    Los resultados de generación viajan como bytes PNG y se codifican a base64 en
+    el proceso web. Los callbacks de cada tarea (progreso, previews) se reenvían
+    desde los procesos de trabajo por una cola compartida; cancelar una tarea la
+    marca en un diccionario compartido que el proceso de trabajo consulta en cada
+    llamada a un callback.
+    """
+
+    def __init__(self, workers=WORKER_PROCESSES, intra_threads=TORCH_INTRA_OP_THREADS,
+                 inter_threads=TORCH_INTER_OP_THREADS, affinity=WORKER_CPU_AFFINITY):
+        self.workers = max(1, workers)
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+        self.cpu_sets = affinity_sets(self.workers, affinity)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._task_ids = itertools.count(1)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._executor is not None:
+                return
+            context = multiprocessing.get_context('spawn')
+            self._manager = context.Manager()
+            self._events = self._manager.Queue()
+            self._cancelled = self._manager.dict()
+            slots = self._manager.Queue()
+            for slot in range(self.workers):
+                slots.put(slot)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(slots, self.cpu_sets, self.intra_threads, self.inter_threads,
+                          self._events, self._cancelled)
+            )
+            threading.Thread(target=self._dispatch_events, name='worker-pool-events', daemon=True).start()
+
+    def _dispatch_events(self):
+        from services.generation_config import GenerationCancelled
+        while True:
+            try:
+                task_id, name, callback_args = self._events.get()
+            except (EOFError, OSError):
+                return
+            callback = self._callbacks.get(task_id, {}).get(name)
+            if callback is None:
+                continue
+            try:
+                callback(*callback_args)
+            except GenerationCancelled:
+                self._cancelled[task_id] = True
+            except Exception as e:
+                # Cualquier excepción del callback (p. ej. JobCancelled) cancela la tarea
+                logger.warning(f"Cancelando tarea {task_id}: {e!r}")
+                self._cancelled[task_id] = True
+
+    def call(self, target, *args, **kwargs):
+        """
+        Ejecuta target ("modulo:funcion") en un proceso de trabajo y espera el resultado.
+
+        Los argumentos con nombre terminado en '_callback' (progress_callback,
+        preview_callback) no se envían al proceso de trabajo: allí se sustituyen por
+        funciones que reenvían sus llamadas a los callbacks de este proceso.
+        """
+        self._ensure_started()
+        task_id = next(self._task_ids)
+        callbacks = {name: kwargs.pop(name) for name in list(kwargs)
+                     if name.endswith('_callback') and kwargs[name] is not None}
+        kwargs = {name: value for name, value in kwargs.items() if not name.endswith('_callback')}
+        if callbacks:
+            self._callbacks[task_id] = callbacks
+        with self._lock:
+            self.submitted += 1
+        try:
+            future = self._executor.submit(_call_in_worker, task_id, target, args, kwargs, list(callbacks))
+            result = merge_result(future.result())
+            with self._lock:
+                self.completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            self._callbacks.pop(task_id, None)
+            self._cancelled.pop(task_id, None)
+
+    def call_each(self, target, *args, **kwargs):
+        """
+        Ejecuta target ("modulo:funcion") una vez en cada proceso de trabajo.
+
+        Returns:
+            list: Un resultado por proceso
+
+        Raises:
+            threading.BrokenBarrierError: Si algún proceso no queda libre en WORKER_BARRIER_TIMEOUT segundos
+        """
+        self._ensure_started()
+        barrier = self._manager.Barrier(self.workers)
+        results = [None] * self.workers
+        errors = []
+
+        def run(i):
+            try:
+                results[i] = self.call('services.worker_pool:_call_at_barrier', barrier, target, args, kwargs)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def generate_image(self, model_type, skirt_type, sampler=None, steps=None, num_images=1, progress_callback=None,
+                       preview_callback=None, preview_every=0, seeds=None, persist=True, return_arrays=False):
+        """Misma interfaz que diffusion_service.generate_image, ejecutada en un proceso de trabajo."""
+        result = self.call('services.diffusion_service:generate_image', model_type, skirt_type, sampler, steps,
+                           num_images, progress_callback=progress_callback, encode_base64=False,
+                           preview_callback=preview_callback, preview_every=preview_every, seeds=seeds,
+                           persist=persist, return_arrays=return_arrays)
+        if not result:
+            return result
+        for image in result['images']:
+            image['image_base64'] = base64.b64encode(image.pop('png_bytes')).decode('utf-8')
+        result['image_base64'] = result['images'][0]['image_base64']
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._manager.shutdown()
+                self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': EXECUTION_MODE,
+                'workers': self.workers,
+                'started': self._executor is not None,
+                'intra_op_threads': self.intra_threads,
+                'inter_op_threads': self.inter_threads,
+                'cpu_sets': self.cpu_sets,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'in_flight': self.submitted - self.completed - self.failed
+            }
+
+
+def execute(target, *args, **kwargs):
+    """
+    Ejecuta target ("modulo:funcion") según EXECUTION_MODE: en el hilo actual o
+    en el pool de procesos.
+    """
+    if EXECUTION_MODE == 'process':
+        return worker_pool.call(target, *args, **kwargs)
+    return _resolve(target)(*args, **kwargs)
+
+
+def generation_runner():
+    """Función de generación que debe usar el planificador de inferencia."""
+    if EXECUTION_MODE == 'process':
+        return worker_pool.generate_image
+    from services.diffusion_service import generate_image
+    return generate_image
+
+# Instancia global del pool
+worker_pool = WorkerPool()
+atexit.register(worker_pool.shutdown)
@@ -0,0 +1,138 @@
+import os
+import time
+
+import pytest
+
+import services.storage_manager as storage_module
+from services.artifact_index import ArtifactIndex
+from services.storage_manager import StorageManager
+
+
+def make_file(directory, name, size=100, age=3600):
+    """Crea un archivo de size bytes modificado hace age segundos."""
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def remaining(directory):
+    return sorted(os.listdir(directory))
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = ArtifactIndex(':memory:')
+    monkeypatch.setattr(storage_module, 'artifact_index', index)
+    return index
+
+
+@pytest.fixture
+def make_manager(tmp_path, index):
+    def make(max_bytes=0, max_files=0, ttl_seconds=0, min_age_seconds=0):
+        limits = {'tallas': {'max_bytes': max_bytes, 'max_files': max_files, 'ttl_seconds': ttl_seconds}}
+        return StorageManager(directories={'tallas': str(tmp_path)}, limits=limits, sweep_seconds=0,
+                              min_age_seconds=min_age_seconds)
+    return make
+
+
+def test_ttl_evicts_unused_files(tmp_path, make_manager):
+    make_file(tmp_path, 'old.png', age=7200)
+    make_file(tmp_path, 'new.png', age=60)
+    manager = make_manager(ttl_seconds=3600)
+
+    assert manager.sweep() == {'tallas': 1}
+    assert remaining(tmp_path) == ['new.png']
+    stats = manager.stats()['directories']['tallas']
+    assert (stats['evicted_ttl'], stats['evicted_quota'], stats['files']) == (1, 0, 1)
+
+
+def test_quota_evicts_least_recently_used_down_to_low_water(tmp_path, make_manager):
+    for i, age in enumerate((500, 400, 300, 200, 100)):
+        make_file(tmp_path, f'{i}.png', age=age)
+    manager = make_manager(max_files=4)
+
+    # 5 archivos con cuota de 4: se borra hasta quedar en el 90 % (3 archivos)
+    manager.sweep()
+    assert remaining(tmp_path) == ['2.png', '3.png', '4.png']
+    assert manager.stats()['directories']['tallas']['evicted_quota'] == 2
+
+
+def test_ttl_runs_before_quota(tmp_path, make_manager):
+    make_file(tmp_path, 'expired.png', size=100, age=7200)
+    make_file(tmp_path, 'a.png', size=100, age=300)
+    make_file(tmp_path, 'b.png', size=100, age=200)
+    manager = make_manager(max_bytes=250, ttl_seconds=3600)
+
+    # Al borrar el caducado el directorio ya cumple la cuota: no se borra nada más
+    manager.sweep()
+    assert remaining(tmp_path) == ['a.png', 'b.png']
+    stats = manager.stats()['directories']['tallas']
+    assert (stats['evicted_ttl'], stats['evicted_quota'], stats['bytes']) == (1, 0, 200)
+
+
+def test_touch_moves_file_to_the_end_of_the_lru_order(tmp_path, make_manager):
+    oldest = make_file(tmp_path, 'oldest.png', age=500)
+    make_file(tmp_path, 'a.png', age=400)
+    make_file(tmp_path, 'b.png', age=300)
+    make_file(tmp_path, 'c.png', age=100)
+    manager = make_manager(max_files=3)
+
+    # El archivo descargado pasa a ser el usado más recientemente
+    manager.touch(oldest)
+    manager.sweep()
+    assert remaining(tmp_path) == ['c.png', 'oldest.png']
+
+
+def test_min_age_protects_recent_files(tmp_path, make_manager):
+    make_file(tmp_path, 'old.png', age=600)
+    make_file(tmp_path, 'recent_a.png', age=10)
+    make_file(tmp_path, 'recent_b.png', age=5)
+    manager = make_manager(max_files=1, min_age_seconds=60)
+
+    # Sigue por encima de la cuota, pero los archivos recientes no se borran
+    manager.sweep()
+    assert remaining(tmp_path) == ['recent_a.png', 'recent_b.png']
+
+
+def test_hold_protects_design_and_derived_artifacts(tmp_path, make_manager, index):
+    make_file(tmp_path, 'design.png', age=7200)
+    size_path = make_file(tmp_path, 'size_s_recta_abc.png', age=7200)
+    make_file(tmp_path, 'other.png', age=7200)
+    index.record('design.png', [('size', 's', 'size_s_recta_abc.png', size_path)], 'abc')
+    manager = make_manager(ttl_seconds=3600)
+
+    with manager.hold('design.png'):
+        manager.sweep()
+        assert remaining(tmp_path) == ['design.png', 'size_s_recta_abc.png']
+
+    # Al salir del bloque ya se pueden borrar
+    manager.sweep()
+    assert remaining(tmp_path) == []
+
+
+def test_pinned_designs_are_not_evicted(tmp_path, make_manager, index):
+    make_file(tmp_path, 'pinned.png', age=7200)
+    size_path = make_file(tmp_path, 'size_m_recta_abc.png', age=7200)
+    make_file(tmp_path, 'unpinned.png', age=7200)
+    index.record('pinned.png', [('size', 'm', 'size_m_recta_abc.png', size_path)], 'abc')
+    index.pin('pinned.png')
+    manager = make_manager(ttl_seconds=3600, max_files=1)
+
+    manager.sweep()
+    assert remaining(tmp_path) == ['pinned.png', 'size_m_recta_abc.png']
+
+    index.unpin('pinned.png')
+    manager.sweep()
+    assert remaining(tmp_path) == []
+
+
+def test_evicted_files_are_forgotten_by_the_index(tmp_path, make_manager, index):
+    size_path = make_file(tmp_path, 'size_l_recta_abc.png', age=7200)
+    index.record('design.png', [('size', 'l', 'size_l_recta_abc.png', size_path)], 'abc')
+    manager = make_manager(ttl_seconds=3600)
+
+    manager.sweep()
+    assert index.sizes_for('design.png') == []